@@ -2,18 +2,30 @@
 """
 Main program that calculates the characteristics of the rainy and dry seasons
 """
+import os
 import sys
 import numpy as np
 from scipy.stats import norm
 import netCDF4 as nc
-import math
-from datetime import timedelta, date
 # importing local functions
 sys.path.append('/home/rodrigo/python_programs/functions/') #Edit this path
-from rainyseason_onset import rainyseason_onset
-from rainyseason_B17_onset import rainyseason_B17_onset
-from rainyseason_demise import rainyseason_demise
-from rainyseason_B17_demise import rainyseason_B17_demise
+from rainyseason_calendar import rainyseason_calendar
+from rainyseason_pack import rainyseason_pack, rainyseason_valid, rainyseason_tiles, rainyseason_tile_points
+from rainyseason_pipeline import rainyseason_pipeline, rainyseason_member, rainyseason_normals, rainyseason_uncertainty
+from rainyseason_output import rainyseason_create, rainyseason_write, rainyseason_fields, rainyseason_files, rainyseason_patch
+from rainyseason_sweep import rainyseason_sweep, rainyseason_combinations, rainyseason_sweep_params
+from rainyseason_zarr import rainyseason_zarr_create, rainyseason_zarr_tile, rainyseason_zarr_member, rainyseason_zarr_consolidate
+from rainyseason_read import rainyseason_read, rainyseason_subset
+from rainyseason_stations import rainyseason_stations_read, rainyseason_stations, rainyseason_stations_write
+from rainyseason_stream import rainyseason_stream
+from rainyseason_daily import rainyseason_daily_subset
+from rainyseason_preview import rainyseason_preview, rainyseason_preview_tag
+from rainyseason_shard import rainyseason_shard_parse, rainyseason_shard_tag, rainyseason_shard_points, rainyseason_shard_coverage
+from rainyseason_plan import rainyseason_plan, rainyseason_plan_print, rainyseason_plan_check, rainyseason_metadata, GB
+from rainyseason_summary import rainyseason_summary, rainyseason_summary_sums, rainyseason_summary_add, rainyseason_summary_write
+from rainyseason_seasonindex import rainyseason_seasonindex, rainyseason_seasonindex_save
+from rainyseason_delta import rainyseason_fingerprint, rainyseason_delta_config, rainyseason_delta_read, rainyseason_delta_save, rainyseason_delta_points
+from rainyseason_progress import rainyseason_progress, rainyseason_reporters, rainyseason_stage, rainyseason_step, rainyseason_stage_end
 """
 Program that calculates the characteristics of the rainy and dry seasons:
 onset and demise dates; duration; and accumualted precipitation
@@ -38,6 +50,108 @@ Input:
   dper   : minimum percentage [0.,100.] of missing data that can be tolerated
   pathout: path of the directory to where the output will be saved
   prefix : The first part of the name of output files.
+  precision: 'f8' (default) computes and stores everything in double precision.
+           'f4' keeps the input, the anomalies and all intermediate arrays in single
+           precision, which roughly halves memory use and bandwidth. Accumulations
+           (means, cumulative sums and totals) are always carried out in double
+           precision. See rainyseason_compare.py for the tolerances against 'f8'.
+  members: Batch mode. List of datasets (or ensemble members) on the same grid and
+           calendar. Each element is either the name of a NetCDF file or a tuple
+           (file name, index) that selects one member of a file with an ensemble
+           dimension (member,time,lat,lon). The calendar is created once and the
+           members are processed back-to-back (or by 'nworkers' processes). The
+           output files get a "member" dimension. Leave empty to process 'prec'.
+  varname: name of the precipitation variable in the files of 'members'
+  nworkers: number of processes used in batch mode and by the tiles of the Zarr output
+           (1 = back-to-back)
+  backend: format of the output. 'netcdf' (default) or 'zarr' (one Zarr store for each
+           product, requires the zarr package). With 'zarr' the grid is processed in tiles
+           and each tile (or each member in batch mode) is written by the process that
+           calculated it. Not used with normals, nboot or sweep (always NetCDF).
+  tile   : (number of latitudes, number of longitudes) of the tiles and of the chunks of
+           the Zarr stores
+  normals: list of reference periods [(first year, last year), ...] for the climatology
+           (e.g. sliding 30-year normals). The onset and demise dates are calculated
+           relative to the climatology of each period and the output files get a
+           "normal" dimension. Leave empty to use the whole time series.
+  nboot  : number of bootstrap resamples of the years used to estimate percentiles of the
+           climatological onset, demise and duration and of their trends (0 = no bootstrap)
+  boffsets: perturbations [days] of the starting date used by the bootstrap ([0] = none)
+  bperc  : percentiles [0.,100.] saved by the bootstrap
+  sweep  : parameter sweep. Dictionary of lists of values of 'npass', 'dper', 'qc1'
+           (1.5 x IQR), 'qc2' (3 x IQR) and 'mthres' (0.33). All combinations are
+           calculated sharing the stages that do not depend on each parameter and
+           are saved with a "param" dimension (see rainyseason_sweep.py).
+  subset : region and period read from NetCDF files (see rainyseason_subset in
+           rainyseason_read.py). Only that hyperslab is read, and lats, lons, nlat, nlon,
+           yr0 and ntot are taken from the subset. It is also used to read the files of
+           'members'. None reads the whole files.
+  stations: Station mode. Name of a file of station records (CSV, Parquet or NetCDF, see
+           rainyseason_stations.py). Each station keeps its own period of record; stations
+           that share the same years and calendar are processed together. The results are
+           saved as a table (one row per station and year) instead of gridded files and
+           the gridded input variables (prec, nlat, nlon, ...) are not used.
+  progress: list of progress reporters: 'console', the name of a log file or the name of
+           a JSON lines file (ending in .jsonl). They report the valid points processed per
+           second by each stage and the estimated time to completion (see
+           rainyseason_progress.py). Empty for no progress reports.
+  pinterval: minimum number of seconds between two progress reports of a stage
+  stream : Tiled streaming (optional). Name of a NetCDF file that is read one tile at a time
+           (variable varname, region and period of subset; the whole file if subset is None)
+           instead of 'prec', which is not used. A background thread reads the next tiles
+           while the current tile is calculated and another thread saves the finished tiles
+           (see rainyseason_stream.py), so only a few tiles are in memory. The output is
+           saved as NetCDF files or Zarr stores (backend) of the whole grid.
+  subdaily: Sub-daily input (optional). Dictionary with 'files' (list of NetCDF files of
+           half-hourly, hourly, 3-hourly... data of the variable varname) and optionally
+           'bbox', 'years', 'minfrac' (minimum fraction of valid samples of a day, 0.5),
+           'scale' (mean of the samples to daily total [mm]: samples per day for amounts
+           per step, 24. for rates in mm/h) and 'shift' [h]. The files are read with the
+           tiled streaming, tile by tile and in time order, and summed to daily totals
+           while they are read (see rainyseason_daily.py); no daily file is written.
+  prefetch: number of tiles read ahead (and waiting to be saved) by the tiled streaming
+  shard  : 'i/N' to calculate only shard i (0, ..., N-1) of N shards of the valid points,
+           e.g. one task of a job array (also given as: python rainyseason.py --shard i/N).
+           The valid points are dealt to the shards in turn, so all shards have the same
+           number of valid points. Each shard saves its files with ".shard-i-of-N" after the
+           prefix and a coverage file; merge them with: python rainyseason_shard.py pathout
+           prefix N (see rainyseason_shard.py). Single dataset and NetCDF output only.
+  infile : Name of a NetCDF file (variable varname, region and period of subset; the whole
+           file if subset is None) read by the program instead of 'prec', after the memory
+           plan (budget), so a job that does not fit stops before any data are read.
+  budget : memory budget [GB] (optional). The peak memory of each stage is estimated from
+           ntot, nlat and nlon (from the metadata of infile, stream or subdaily) and the
+           precision, the tile and the number of workers are chosen to fit the budget
+           (see rainyseason_plan.py). The curves of accumulated anomalies are not saved, so
+           this program never calculates them. The plan is printed and the job stops
+           (ValueError) if nothing fits, unless overbudget is True. Give the input as infile (or stream) so that the plan is
+           made before any data are read. To see the plan of a NetCDF file without running
+           the job: python rainyseason_plan.py file.nc varname budget
+  overbudget: True to run the job even if the memory plan does not fit the budget
+  seasonindex: True to also save the season index (seasonindex.prefix.years.nc): the sorted
+           onset and demise dates of each point and its accumulated precipitation, used to
+           answer questions such as "was day D in the wet season at point P?" or "rain since
+           the onset" without reading the precipitation again (see rainyseason_seasonindex.py).
+           Single gridded runs without normals, sweep or bootstrap and with NetCDF output.
+  summary: True to also save the summary file (summary.wet.season.prefix.years.nc) with the
+           mean (circular mean for the dates), standard deviation, trend and number of years
+           of onset, demise, duration and totals at each point. The summaries are accumulated
+           while the results of each tile are produced (see rainyseason_summary.py), so the
+           output files are not read again. Single gridded runs (also tiles, streaming and
+           shards) without normals, sweep or bootstrap.
+  preview: Preview mode (optional). Dictionary with 'factor' (blocks of factor x factor grid
+           points are averaged), 'years' (first year, last year) and/or 'budget' (runtime of
+           the calculation [s]; the smallest factor that fits is chosen). The data (prec, or
+           the stream file, read one band of latitudes at a time) are reduced before the
+           calculation and the output files have ".preview-xfactor" after the prefix and the
+           global attribute preview_factor (see rainyseason_preview.py). Single datasets only.
+  delta  : True for the delta mode: the fingerprints of the input series of the grid points
+           are saved with the outputs (fingerprint.prefix.years.nc). When the files of a
+           previous run with the same settings exist, only the points whose series changed
+           (e.g. a dataset reissued for some regions or periods) are calculated, and the
+           output files are patched in place; unchanged points are skipped (see
+           rainyseason_delta.py). Single gridded runs without normals, sweep, bootstrap,
+           shards, summary or season index, with NetCDF output and without streaming.
 Output:
   A set of NetCDF files containing gridded values
   onset_jday   : onset date in Julian days or Day of Year
@@ -61,8 +175,11 @@ the Input variables described above.
 """
 
 dper=25.
+precision='f8' # 'f8' for double precision or 'f4' for single precision
+pathout='./'
+prefix='CPC_UNI'
 yr0=
-tot=365. # Number of DOY [edit accordingly if working with pentads or any other temporal resolution]
+tot=365 # Number of DOY [edit accordingly if working with pentads or any other temporal resolution]
 ntot=
 nlat=
 nlon=
@@ -77,889 +194,392 @@ prec=np.zeros((ntot,nlat,nlon))
 """Example of how to find the value for missing data. Usually a very large nagative or positive number. For a very large positive number, change .min() to .max() """
 missval=prec.min()   # missing value
 
-#=======================================================================================
-#---------------------------------------------------------------------------------------
-"""                  No Further Editing is Required from this point on               """
-#---------------------------------------------------------------------------------------
-#=======================================================================================
-print("Data read.")
+""" Reading only a region and a period (optional). Example (regions that cross the
+dateline are given with the western longitude larger than the eastern longitude):
+subset=rainyseason_subset('precip.nc',bbox=(-35.,10.,280.,330.),years=(1981,2010))
+prec=rainyseason_read('precip.nc','precip',subset=subset)"""
+subset=None
 
-def julian(dd,mm,yy,noleap=1):
-    """
-    Function that calculates julian days [Day of Year] from day,month, and year imput
-    Imput:
-       yy:     year [integer]
-       mm:     month [integer]
-       dd:     day [integer]
-       noleap = flag to indicate whether or not leap years should be considered.
-       noleap = 0 --> time searies contain Feb 29
-       noleap = 1 --> time series does not contain Feb 29
-   Output:
-       jday:   COrresponding Julian day or Day of Year [1,366]
-    Example:
-    --------
-      >>> jday = julian(1,1,1980) # no leap years
-      >>> jday = julian(1,1,1980,0)
-    """
-    mon=[31,28,31,30,31,30,31,31,30,31,30,31]
-    if noleap==0:
-       if yy % 4 == 0 and yy % 100 != 0 or yy % 400 == 0:
-          mon=[31,29,31,30,31,30,31,31,30,31,30,31]
-    if mm == 1:
-       jday=dd
-    if mm > 1:
-       jday=sum(mon[0:mm-1])+dd
-    return jday
+""" Input file read after the memory plan (optional, instead of 'prec'). Example: infile='precip.nc'; prec=None """
+infile=''
 
-#=======================================================================================
-def dates_daily(y0,m0,d0,mtot,noleap):
-    """
-    Function that calculates arrays of dates (hour, day,month, year)
-
-    Imput:
-       y0:     initial year [integer]
-       m0:     initial month [integer]
-       d0:     initial day [integer]
-       mtot:   total number of elements in the time series [integer]
-       noleap: flag to indicate whether or not leap years should be considered.
-               noleap = 0 --> time searies contain Feb 29
-               noleap = 1 --> time series does not contain Feb 29
-    Output:
-       day:    array with values of days
-       month:  array with values of months
-       year:   array with values of years
-    Example:
-    --------
-      >>> day,month,year=dates_daily(1980,1,1,365,0)
-    """
-    day=np.zeros((mtot))
-    month=np.zeros((mtot))
-    year=np.zeros((mtot))
-    start_date=date(y0,m0,d0)
-    deltad = timedelta(days=1)
-    single_date=start_date
-    dt=0
-    while dt < mtot:
-          day[dt]=single_date.day
-          month[dt]=single_date.month
-          year[dt]=single_date.year
-          if noleap == 0:
-             single_date=single_date+deltad
-          if noleap == 1:
-             if year[dt] % 4 != 0:
-                single_date=single_date+deltad
-             if year[dt] % 4 == 0:
-                if year[dt] % 100 != 0:
-                   if month[dt] != 2:
-                      single_date=single_date+deltad
-                   if month[dt] == 2:
-                      if day[dt] < 28:
-                         single_date=single_date+deltad
-                      if day[dt] == 28:
-                         single_date=single_date+2*deltad
-                if (year[dt] % 100 == 0) & (year[dt] % 400 != 0):
-                   single_date=single_date+deltad
-                if year[dt] % 400 == 0:
-                   if month[dt] != 2:
-                      single_date=single_date+deltad
-                   if month[dt] == 2:
-                      if day[dt] < 28:
-                         single_date=single_date+deltad
-                      if day[dt] == 28:
-                         single_date=single_date+2*deltad
-          dt=dt+1
-    return day, month, year
+""" Batch mode (optional). Example: members=[('ensemble.nc',m) for m in range(50)]"""
+members=[]
+varname='precip'
+nworkers=1
 
-#=======================================================================================
-"""
-Funtion that calculates the Fourier coefficients and the explained variance of the Nth
-first harmonics of a time series
+""" Output format. Example: backend='zarr'; tile=(60,60) """
+backend='netcdf'
+tile=(30,30)
 
-Input:
-   tseries: input time series
-   nmodes : number of harmonics to retain (N)
-   coefa  : Array with N (or 'nmodes') elements
-   coefb  : Array with N (or 'nmodes') elements
-   hvar   : Array with N (or 'nmodes') elements
-   missval: Falg value for missing data
-Output:
-   coefa: Array of A coefficients of the Nth first harmonics
-   coefb: Array of B coefficients of the Nth first harmonics
-   hvar : Array of explained variance of the Nth first harmonics
-"""
-def Harmonics(coeafa,coefb,hvar,tseries,nmodes,missval):
-    mtot=len(tseries)               # retrieving the lenght of the time dimension
-    time=np.arange(1,mtot+1,1.)     # Just a an array of increasing numbers
-    tdata=tseries[:]                # Adjusting the mean annual cycle
-    tdata[tseries==missval]=0.      # Padding missing values with zeros just to be safe
-    svar=sum((tdata[:]-np.mean(tdata))**2)/(mtot-1)
-    nm=nmodes
-    if 2*nm > mtot:
-       nm=mtot/2
-    coefa=np.zeros((nm))
-    coefb=np.zeros((nm))
-    hvar=np.zeros((nm))
-    for tt in range(0,nm):
-        Ak=np.sum(tdata[:]*np.cos(2.*math.pi*(tt+1)*time[:]/float(mtot)))
-        Bk=np.sum(tdata[:]*np.sin(2.*math.pi*(tt+1)*time[:]/float(mtot)))
-        coefa[tt]=Ak*2./float(mtot)
-        coefb[tt]=Bk*2./float(mtot)
-        hvar[tt]=mtot*(coefa[tt]**2+coefb[tt]**2)/(2.*(mtot-1)*svar)
-    return coefa,coefb,hvar
-  
-#================================= Formatting Data ======================================
+""" Reference periods of the climatology (optional). Example: normals=[(1961,1990),(1971,2000),(1981,2010)]"""
+normals=[]
 
-#------------------------------------------------------------------------
-# Creating vectors of dates
-#------------------------------------------------------------------------                 !
-yr0=1979
-day,month,year=dates_daily(yr0,1,1,ntot,0)
+""" Bootstrap (optional). Example: nboot=1000; boffsets=[-10,-5,0,5,10]"""
+nboot=0
+boffsets=[0]
+bperc=[2.5,50.,97.5]
 
-print('data read')
-print('Formating data...')
+""" Parameter sweep (optional). Example: sweep={'npass':[25,50,100],'qc1':[1.5,2.],'qc2':[3.,4.]}"""
+sweep={}
 
-#------------------------------------------------------------------------
-# FInding missing value
-#------------------------------------------------------------------------
-missval=-999.000   # missing value
-#================================= Formatting Data ======================================
-print("Formatting Data...")
+""" Station mode (optional). Example: stations='gauges.csv' """
+stations=''
 
-"""
-Removing Feb 29th. This block averages Feb 28 and 29 in leap years. 
-"""
-id=np.where((month == 2.) & (day == 29.))
-id2=[x-1 for x in id]  # creating a list equal to (id-1) and python is stupid
-prec[id2[0],:,:]=0.5*(prec[id[0],:,:]+prec[id2[0],:,:])
-prec=np.delete(prec,id,axis=0)
-year=np.delete(year,id,axis=0)
-month=np.delete(month,id,axis=0)
-day=np.delete(day,id,axis=0)
-ntot=len(year)
-prec[prec<0.]=missval
+""" Progress reports. Example: progress=['console','rainyseason.log','progress.jsonl']"""
+progress=['console']
+pinterval=30.
 
-#------------------------------------------------------------------------
-# Function that caclulates juilan days
-#------------------------------------------------------------------------                 !
-jday=np.zeros((ntot))
-for tt in range(0,ntot):
-    jday[tt]=julian(int(day[tt]),int(month[tt]),int(year[tt]))
+""" Memory budget [GB] (optional). Example: budget=16."""
+budget=None
+overbudget=False
 
-#---------------------------------------------------------------------------------------
-"""
-Masking Missing values. Sometimes datasets have significant amounts of
-missing data (e.g. land only data, ocean only data, complex topography).
-In such cases it is sometimes useful to mask those regions. Masking can
-prevent code errors and improve code efficiency. The minimum percentage
-of missing data allowed is determined by namelist variable "dper". If a
-grid pint has more missing data then the minimum percentage, that grid
-point will be masked at all times.
-"""
-thres=(ntot-0.01*dper*ntot) # minimum threshold of non-missing data
-mask=np.zeros((nlat,nlon))
-for it in range(0,nlat):
-    for jt in range(0,nlon):
-        id=np.where(prec[:,it,jt]!=missval)
-        if len(id[0]) >= thres:
-           mask[it,jt]=1.
+""" Tiled streaming from a NetCDF file (optional). Example: stream='precip.nc'; tile=(60,60)"""
+stream=''
+prefetch=2
 
-print("Data Formatted.")
+""" Sub-daily input (optional). Example: subdaily={'files':sorted(glob.glob('imerg/*.nc')),'scale':24.} """
+subdaily=None
 
-#=======================================================================================
-"""
-
-Computing input information for the calculation of the characteristics of the rainy
-and dry seasons
-
-"""
-#=======================================================================================
-"""
-Calculating the daily annual mean [mm/day]
-
-"""
-rm=np.zeros((nlat,nlon))
-for it in range(0,nlat):
-    for jt in range(0,nlon):
-        if mask[it,jt] == 1.:  # removing grid points that have more than 25% of missing data
-           tmp=prec[:,it,jt]
-           id=np.where(tmp >= 0.)  # removing missing data
-           if len(id[0]) > 1:      # have to specify id[0] because id is a tuple
-              rm[it,jt]=np.mean(tmp[id[0]])
-
-print("Calculating the mean annual cycle... This might take a while.")
-"""
-This block will calculate the mean annual cycle for the whole time series. It will need
-to be adapted if the period of interest is only a portion of the total time series.
-For example, climatologies of a 30 year period of reference: 1981-2010.
-"""
-
-""" calculating the mean annual cycle for each grid point """
-cycle=np.zeros((tot,nlat,nlon))
-for tt in range(0,tot):
-    id=np.where(jday[:] == jday[tt])
-    for it in range(0,nlat):
-        for jt in range(0,nlon):
-            if mask[it,jt] == 1.:
-               tmp=prec[id[0],it,jt]
-               id2=np.where(tmp >= 0.)
-               if len(id2[0]) > 1:      # have to specify id2[0] because id2 is a tuple
-                  cycle[tt,it,jt]=np.mean(tmp[id2[0]])
-
-
-print("Mean annual cycle calculated.")
+""" Shard of a job array (optional). Example: shard='3/16' """
+shard=None
 
-print("Smoothing the mean annual cycle... This might take a while.")
-"""
-This block will calculate the smoothed mean annual cycle. This is anessential part of
-calculating anomalies (often overlooked).
-
-For details, see: Bombardi RJ and Carvalho LMV (2017). Simple Practices in Climatological Analyses: A Review. Revista Brasileira de Meteorologia. 32 (3), 311-320
+""" Season index for fast queries (optional). Example: seasonindex=True """
+seasonindex=False
 
-This block also calculates the explained variance of the first 3 harmonics of the
-mean annual cycle. This is used to mask regions with zero or multiple rainy seasons
+""" Climatological summaries (optional). Example: summary=True """
+summary=False
 
-"""
-time=None
-time=np.arange(1,tot+1,1.)
-harm1=np.zeros((nlat,nlon))
-harmonic1=np.zeros((tot,nlat,nlon))
-harm2=np.zeros((nlat,nlon))
-harm3=np.zeros((nlat,nlon))
-smoothed=np.zeros((tot,nlat,nlon))
-for it in range(0,nlat):
-    for jt in range(0,nlon):
-        if mask[it,jt] == 1.:
-           coefa=np.zeros((3))
-           coefb=np.zeros((3))
-           hvar=np.zeros((3))
-           tseries=cycle[:,it,jt]
-           coefa,coefb,hvar=Harmonics(coefa,coefb,hvar,tseries,3,missval)
-           harm1[it,jt]=hvar[0]
-           harm2[it,jt]=hvar[1]
-           harm3[it,jt]=hvar[2]
-           harmonic1[:,it,jt]=rm[it,jt]
-           harmonic1[:,it,jt]=harmonic1[:,it,jt]+coefa[0]*np.cos(2.*math.pi*time[:]/float(tot))+coefb[0]*np.sin(2.*math.pi*time[:]/float(tot))
-           smoothed[:,it,jt]=np.mean(cycle[:,it,jt])
-           for pp in range(0,3):
-               smoothed[:,it,jt]=smoothed[:,it,jt]+coefa[pp]*np.cos(2.*math.pi*time[:]*(pp+1)/float(tot))+coefb[pp]*np.sin(2.*math.pi*time[:]*(pp+1)/float(tot))
-
-print("Mean annual cycle smoothed.")
-"""
-Removing regions with zero or more than one rainy season per year
+""" Preview on a coarser grid and/or fewer years (optional). Example: preview={'budget':60.,'years':(2001,2010)} """
+preview=None
 
-"""
-id=np.where(harm2 >= harm1)
-mask[id]=0.
-rm[id]=0.
-id=np.where(harm3 >= harm1)
-mask[id]=0.
-rm[id]=0.
-
-"""
-Calculating the day [day of year] that will be used as starting point (t0) for
-the calculation of the rainy and dry seasons characteristics
-
-"""
-startwet=np.zeros((nlat,nlon))
-for it in range(0,nlat):
-    for jt in range(0,nlon):
-        if mask[it,jt] == 1.:
-           id=np.where(harmonic1[:,it,jt] == harmonic1[:,it,jt].min())
-           startwet[it,jt]=jday[id]
+""" Delta mode: recalculate only the points whose input changed (optional). Example: delta=True """
+delta=False
 
 #=======================================================================================
-"""
-
-Calculating the onset date of the rainy and dry seasons
-
-"""
+#---------------------------------------------------------------------------------------
+"""                  No Further Editing is Required from this point on               """
+#---------------------------------------------------------------------------------------
 #=======================================================================================
-cycle=None
-smoothed=None
-harmonic1=None
-
-nyrs=int(year.max()-year.min())+1
-ap=np.zeros((ntot))
-onset_jday=np.zeros((nyrs,nlat,nlon))
-demise_jday=np.zeros((nyrs,nlat,nlon))
-onset_day=np.zeros((nyrs,nlat,nlon))
-demise_day=np.zeros((nyrs,nlat,nlon))
-onset_month=np.zeros((nyrs,nlat,nlon))
-demise_month=np.zeros((nyrs,nlat,nlon))
-onset_year=np.zeros((nyrs,nlat,nlon))
-demise_year=np.zeros((nyrs,nlat,nlon))
-durwet=np.zeros((nyrs,nlat,nlon))
-durdry=np.zeros((nyrs,nlat,nlon))
-totwet=np.zeros((nyrs,nlat,nlon))
-totdry=np.zeros((nyrs,nlat,nlon))
-wscurve=np.zeros((nyrs,int(tot/2),nlat,nlon))
-dscurve=np.zeros((nyrs,int(tot/2),nlat,nlon))
-
-wjd=np.zeros((nyrs))
-wd=np.zeros((nyrs))
-wm=np.zeros((nyrs))
-wy=np.zeros((nyrs))
-wsc=np.zeros((nyrs,int(tot/2)))
-
-djd=np.zeros((nyrs))
-dd=np.zeros((nyrs))
-dm=np.zeros((nyrs))
-dy=np.zeros((nyrs))
-dsc=np.zeros((nyrs,int(tot/2)))
-
-print('Calculating the onset of the rainy season...')
-
-prec[prec<0.]=0.   # VERY IMPORTANT
+print("Data read.")
 
-npass=50
-for it in range(0,nlat):
-    print(it+1,' of ',nlat)
-    for jt in range(0,nlon):
-        if rm[it,jt] > 0.:
-           sdate=startwet[it,jt]
-           wjd[:]=0.
-           wd[:]=0.
-           wm[:]=0.
-           wy[:]=0.
-           wsc[:]=0.
-           ap[:]=prec[:,it,jt]-rm[it,jt]
-           wjd[:],wd[:],wm[:],wy[:],wsc[:,:]=rainyseason_onset(nyrs,tot,jday[:],day[:],month[:],year[:],sdate,ap[:],wjd[:],wd[:],wm[:],wy[:],wsc[:,:])
-#------------------------------------------------------------------------
-#    Quality control: removing outliers
-#------------------------------------------------------------------------
-# ---- Averagind dates using circular statistics
-           miss=np.where(wjd[:] == 0.)
-           id=np.where(wjd[:] != 0.)
-           if len(id[0]) > 0:
-              tmpx=np.cos(wjd[:]*math.pi/183.)
-              tmpy=np.sin(wjd[:]*math.pi/183.)
-              med=math.atan2(np.median(tmpy[id]),np.median(tmpx[id]))*183./math.pi
-              if med < 0.:
-                 med=med+tot
-# ---- Converting dates close to beginning and end of the year
-              tmpc=wjd[:]-med
-              if len(miss[0]) > 0.:
-                 tmpc[miss]=0.
-              pos=np.where(tmpc[:] > float(tot)*0.5)
-              if len(pos[0]) > 0:
-                 tmpc[pos]=tmpc[pos]-tot
-              neg=np.where(tmpc[:] < float(tot)*(-0.5))
-              if len(neg[0]) > 0:
-                 tmpc[neg]=tmpc[neg]+tot
-# ---- Removing outliers (greater than 3 x IQR)
-              iqr=np.percentile(tmpc[id],75)-np.percentile(tmpc[id],25)
-              outl=np.where(np.abs(tmpc[:]) > iqr*1.5)
-              if len(outl[0]) > 0:
-                 wjd[outl]=0.
-                 wd[outl]=0.
-                 wm[outl]=0.
-                 wy[outl]=0.
-              onset_jday[:,it,jt]=wjd[:]
-              onset_day[:,it,jt]=wd[:]
-              onset_month[:,it,jt]=wm[:]
-              onset_year[:,it,jt]=wy[:]
-              wscurve[:,:,it,jt]=wsc[:,:]
-#------------------------------------------------------------------------
-#    Second pass (Bombardi et al. 2017)
-#------------------------------------------------------------------------
-              outl=np.where(wjd == 0.)
-              if len(outl[0]) > 0:
-                 wjd[:]=0.
-                 wd[:]=0.
-                 wm[:]=0.
-                 wy[:]=0.
-                 wsc[:]=0.
-                 wjd[:],wd[:],wm[:],wy[:]=rainyseason_B17_onset(nyrs,tot,jday[:],day[:],month[:],year[:],sdate,ap[:],npass,wjd[:],wd[:],wm[:],wy[:])
-#                 wjd[:],wd[:],wm[:],wy[:]=rainyseason_harmonic_onset(nyrs,tot,jday[:],day[:],month[:],year[:],sdate,ap[:],wjd[:],wd[:],wm[:],wy[:])
-#------------------------------------------------------------------------
-#    Quality control: removing outliers for the second pass
-#------------------------------------------------------------------------
-                 onset_jday[outl,it,jt]=wjd[outl]
-                 onset_day[outl,it,jt]=wd[outl]
-                 onset_month[outl,it,jt]=wm[outl]
-                 onset_year[outl,it,jt]=wy[outl]
-# ---- Averagind dates using circular statistics
-                 wjd[:]=onset_jday[:,it,jt] #making sure to keep all the correct dates
-                 miss=np.where(wjd[:] == 0.)
-                 id=np.where(wjd[:] != 0.)
-                 if len(id[0]) > 0:
-                    tmpx=np.cos(wjd[:]*math.pi/183.)
-                    tmpy=np.sin(wjd[:]*math.pi/183.)
-                    med=math.atan2(np.median(tmpy[id]),np.median(tmpx[id]))*183./math.pi
-                    if med < 0.:
-                       med=med+tot
-# ---- Converting dates close to beginning and end of the year
-                    tmpc=wjd[:]-med
-                    if len(miss[0]) > 0.:
-                       tmpc[miss]=0.
-                    pos=np.where(tmpc[:] > float(tot)*0.5)
-                    if len(pos[0]) > 0:
-                       tmpc[pos]=tmpc[pos]-tot
-                    neg=np.where(tmpc[:] < float(tot)*(-0.5))
-                    if len(neg[0]) > 0:
-                       tmpc[neg]=tmpc[neg]+tot
-# ---- Removing outliers (greater than 3 x IQR)
-                    iqr=np.percentile(tmpc[id],75)-np.percentile(tmpc[id],25)
-                    outl=np.where(np.abs(tmpc[:]) > iqr*3.)
-                    if len(outl[0]) > 0:
-                       onset_jday[outl,it,jt]=0.
-                       onset_day[outl,it,jt]=0.
-                       onset_month[outl,it,jt]=0.
-                       onset_year[outl,it,jt]=0.
-# print('Calculating the onset of the dry season...')
-##----- Calculating the stats of the onset date of the dry season
-#for it in range(0,nlat):
-#    print(it+1,' of ',nlat)
-#    for jt in range(0,nlon):
-        if rm[it,jt] > 0.:
-           sdate=startwet[it,jt] #It has to be wet because we are calculating it retrospectively
-           djd[:]=0
-           dd[:]=0
-           dm[:]=0
-           dy[:]=0
-           dsc[:]=0
-           ap[:]=prec[:,it,jt]-rm[it,jt]
-#------------------------------------------------------------------------
-#    First pass (Liebman & MArengo, 2001)
+if subdaily is not None:
+   subset=rainyseason_daily_subset(subdaily['files'],subdaily.get('bbox',None),subdaily.get('years',None),subdaily.get('minfrac',0.5),subdaily.get('scale',None),subdaily.get('shift',0.))
+   stream=subset['files'][0][0]
+   print('Sub-daily input: ',len(subset['files']),' files, ',subset['nper'],' samples per day')
+if len(stream) > 0 and len(infile) > 0:
+   raise ValueError('infile is not used with stream or subdaily')
+if len(stream) > 0 and subset is None:
+   subset=rainyseason_subset(stream)
+if len(infile) > 0 and subset is None:
+   subset=rainyseason_subset(infile)
+if subset is not None:
+   lats=subset['lat']
+   lons=subset['lon']
+   nlat=len(lats)
+   nlon=len(lons)
+   yr0=subset['yr0']
+   ntot=subset['ntot']
+
+if '--shard' in sys.argv:
+   shard=sys.argv[sys.argv.index('--shard')+1]
+if shard is not None and (len(stations) > 0 or len(members) > 0 or len(stream) > 0 or backend == 'zarr'):
+   raise ValueError('shard is only used with a single gridded dataset and NetCDF output')
+if shard is not None and seasonindex:
+   raise ValueError('the season index is not saved by shards')
+if summary and (len(stations) > 0 or len(members) > 0 or len(normals) > 0 or len(sweep) > 0 or nboot > 0):
+   raise ValueError('summary is only calculated for single gridded runs without normals, sweep or bootstrap')
+
+if preview is not None:
 #------------------------------------------------------------------------
-           djd[:],dd[:],dm[:],dy[:],dsc[:,:]=rainyseason_demise(nyrs,tot,jday[:],day[:],month[:],year[:],sdate,ap[:],djd[:],dd[:],dm[:],dy[:],dsc[:,:])
+# Preview: the data are coarsened and/or cut to fewer years before the
+# calculation (a stream file is read here, one band of latitudes at a time)
 #------------------------------------------------------------------------
-#    Quality control: removing outliers
+   if len(stations) > 0 or len(members) > 0:
+      raise ValueError('preview is only used with a single dataset')
+   prec,lats,lons,yr0,ntot,factor=rainyseason_preview(prec if len(stream+infile) == 0 else None,stream+infile,varname,subset,lats[0:nlat],lons[0:nlon],yr0,preview,tot,dper,50,np.float32 if precision == 'f4' else np.float64)
+   nlat=len(lats)
+   nlon=len(lons)
+   stream=''
+   infile=''
+   subset=None
+   prefix=prefix+'.preview-x'+str(factor)
+   print('Preview: ',nlat,' x ',nlon,' grid points, ',ntot,' days from ',yr0)
+if delta and (len(stations) > 0 or len(members) > 0 or len(stream) > 0 or backend == 'zarr' or len(normals) > 0 or len(sweep) > 0 or nboot > 0 or shard is not None or summary or seasonindex):
+   raise ValueError('delta is only used with single gridded runs with NetCDF output, without streaming, normals, sweep, bootstrap, shards, summary or season index')
+
+curves=False      # the curves of accumulated anomalies are not saved
+if budget is not None and len(stations) == 0:
 #------------------------------------------------------------------------
-# ---- Averagind dates using circular statistics
-           miss=np.where(djd[:] == 0.)
-           id=np.where(djd[:] != 0.)
-           if len(id[0]) > 0:
-              tmpx=np.cos(djd[:]*math.pi/183.)
-              tmpy=np.sin(djd[:]*math.pi/183.)
-              med=math.atan2(np.median(tmpy[id]),np.median(tmpx[id]))*183./math.pi
-              if med < 0.:
-                 med=med+tot
-# ---- Converting dates close to beginning and end of the year
-              tmpc=djd[:]-med
-              if len(miss[0]) > 0.:
-                 tmpc[miss]=0.
-              pos=np.where(tmpc[:] > float(tot)*0.5)
-              if len(pos[0]) > 0:
-                 tmpc[pos]=tmpc[pos]-tot
-              neg=np.where(tmpc[:] < float(tot)*(-0.5))
-              if len(neg[0]) > 0:
-                 tmpc[neg]=tmpc[neg]+tot
-# ---- Removing outliers (greater than 3 x IQR)
-              iqr=np.percentile(tmpc[id],75)-np.percentile(tmpc[id],25)
-              outl=np.where(np.abs(tmpc[:]) > iqr*1.5)
-              if len(outl[0]) > 0:
-                 djd[outl]=0.
-                 dd[outl]=0.
-                 dm[outl]=0.
-                 dy[outl]=0.
-              demise_jday[:,it,jt]=djd[:]
-              demise_day[:,it,jt]=dd[:]
-              demise_month[:,it,jt]=dm[:]
-              demise_year[:,it,jt]=dy[:]
-              dscurve[:,:,it,jt]=dsc[:,:]
+# Memory plan, from the metadata of the input files (no data are read)
 #------------------------------------------------------------------------
-#    Second pass (Bombardi et al. 2017)
-#------------------------------------------------------------------------
-              outl=np.where(djd == 0.)
-              if len(outl[0]) > 0:
-                 djd[:]=0
-                 dd[:]=0
-                 dm[:]=0
-                 dy[:]=0
-                 dsc[:]=0
-                 djd[:],dd[:],dm[:],dy[:]=rainyseason_B17_demise(nyrs,tot,jday[:],day[:],month[:],year[:],sdate,ap[:],npass,djd[:],dd[:],dm[:],dy[:])
-#                 djd[:],dd[:],dm[:],dy[:]=rainyseason_harmonic_demise(nyrs,tot,jday[:],day[:],month[:],year[:],sdate,ap[:],djd[:],dd[:],dm[:],dy[:])
-#------------------------------------------------------------------------
-#    Quality control: removing outliers for the second pass
+   if len(members) > 0:
+      mode='batch'
+   elif len(stream) > 0:
+      mode='stream'
+   elif backend == 'zarr' and len(normals) == 0 and nboot == 0 and len(sweep) == 0:
+      mode='tiles'
+   else:
+      mode='grid'
+   source=[mm[0] if isinstance(mm,tuple) else mm for mm in members[0:1]]+[ff for ff in [stream,infile] if len(ff) > 0]
+   size=(ntot,nlat,nlon,None)
+   if len(source) > 0:
+      size=rainyseason_metadata(source[0],varname,subset)[0:4]
+   elif prec is not None:
+      print('The input was read before the memory plan: give it as infile to plan before reading')
+   plan=rainyseason_plan(size[0],size[1],size[2],budget*GB,tot,precision,1.,mode,tile,nworkers,curves,size[3],prefetch)
+   rainyseason_plan_print(plan)
+   rainyseason_plan_check(plan,overbudget)
+   precision=plan['precision']
+   curves=plan['curves']
+   nworkers=plan['nworkers']
+   if mode in ['tiles','stream']:
+      tile=plan['tile']
+
+if precision == 'f4':
+   dtype=np.float32
+else:
+   dtype=np.float64
+if len(infile) > 0 and len(members) == 0 and len(stations) == 0:
+   prec=rainyseason_read(infile,varname,None,dtype,subset)
+   print(infile,' read')
+
 #------------------------------------------------------------------------
-                 demise_jday[outl,it,jt]=djd[outl]
-                 demise_day[outl,it,jt]=dd[outl]
-                 demise_month[outl,it,jt]=dm[outl]
-                 demise_year[outl,it,jt]=dy[outl]
-# ---- Averagind dates using circular statistics
-                 djd[:]=demise_jday[:,it,jt]
-                 miss=np.where(djd[:] == 0.)
-                 id=np.where(djd[:] != 0.)
-                 if len(id[0]) > 0:
-                    tmpx=np.cos(djd[:]*math.pi/183.)
-                    tmpy=np.sin(djd[:]*math.pi/183.)
-                    med=math.atan2(np.median(tmpy[id]),np.median(tmpx[id]))*183./math.pi
-                    if med < 0.:
-                       med=med+tot
-# ---- Converting dates close to beginning and end of the year
-                    tmpc=djd[:]-med
-                    if len(miss[0]) > 0.:
-                       tmpc[miss]=0.
-                    pos=np.where(tmpc[:] > float(tot)*0.5)
-                    if len(pos[0]) > 0:
-                       tmpc[pos]=tmpc[pos]-tot
-                    neg=np.where(tmpc[:] < float(tot)*(-0.5))
-                    if len(neg[0]) > 0:
-                       tmpc[neg]=tmpc[neg]+tot
-# ---- Removing outliers (greater than 3 x IQR)
-                    iqr=np.percentile(tmpc[id],75)-np.percentile(tmpc[id],25)
-                    outl=np.where(np.abs(tmpc[:]) > iqr*3.)
-                    if len(outl[0]) > 0:
-                       demise_jday[outl,it,jt]=0.
-                       demise_day[outl,it,jt]=0.
-                       demise_month[outl,it,jt]=0.
-                       demise_year[outl,it,jt]=0.
+# Creating vectors of dates. The calendar is shared by all members
+#------------------------------------------------------------------------                 !
+day,month,year,jday,leap=rainyseason_calendar(yr0,1,1,ntot,0)
+cal=(day,month,year,jday)
+nyrs=int(year.max()-year.min())+1
+npass=50
+
 #------------------------------------------------------------------------
-#    Masking regions where > 33% of the data are missing values 
+# FInding missing value. Missing data are NaN during the calculation (negative
+# values are missing, see rainyseason_pack). missval is only used in the output
 #------------------------------------------------------------------------
-           id=np.where(onset_jday[:,it,jt] == 0.)
-           if len(id[0])/float(nyrs) > 0.33:
-              rm[it,jt]=0.
-              onset_jday[:,it,jt]=0.
-              onset_day[:,it,jt]=0.
-              onset_month[:,it,jt]=0.
-              onset_year[:,it,jt]=0.
-           id=np.where(demise_jday[:,it,jt] == 0.)
-           if len(id[0])/float(nyrs) > 0.33:
-              rm[it,jt]=0.
-              demise_jday[:,it,jt]=0.
-              demise_day[:,it,jt]=0.
-              demise_month[:,it,jt]=0.
-              demise_year[:,it,jt]=0.
-# Rearranging years to account for retrospective calculation of demises
-           if demise_year[1,it,jt] == float(yr0) or demise_year[2,it,jt] == float(yr0+1):
-              demise_year[0:nyrs-1,it,jt]=demise_year[1:nyrs,it,jt]
-              demise_year[nyrs-1,it,jt]=0.
-              demise_month[0:nyrs-1,it,jt]=demise_month[1:nyrs,it,jt]
-              demise_month[nyrs-1,it,jt]=0.
-              demise_day[0:nyrs-1,it,jt]=demise_day[1:nyrs,it,jt]
-              demise_day[nyrs-1,it,jt]=0.
-              demise_jday[0:nyrs-1,it,jt]=demise_jday[1:nyrs,it,jt]
-              demise_jday[nyrs-1,it,jt]=0.
-#=======================================================================================
-"""
-Calculating duration of the wet and dry seasons and the total precipitated during the 
-wet and dry seasons
+missval=-999.000   # missing value
+reporters=rainyseason_reporters(progress)
 
-"""
+if len(stations) > 0:
 #=======================================================================================
-           for yt in range(0,nyrs):
-               if demise_year[yt,it,jt] == onset_year[yt,it,jt] and demise_year[yt,it,jt] != 0.:
-                  if demise_jday[yt,it,jt] < onset_jday[yt,it,jt]:
-                     #print(yt,"1 of 1")
-#This means the dry season happens during the same year
-                     beg=int((demise_year[yt,it,jt]-yr0)*tot+demise_jday[yt,it,jt]-1)
-                     ned=int((onset_year[yt,it,jt]-yr0)*tot+onset_jday[yt,it,jt]-1)
-                     durdry[yt,it,jt]=float(ned-beg)
-# no (-1) because python doesn't use the last element anyway
-                     totdry[yt,it,jt]=np.sum(prec[beg:ned,it,jt])
-                     # still have to calculate wet season properties
-                     if yt < nyrs-1:
-                        if demise_year[yt+1,it,jt] > 0.:
-                           #print(yt,"3 of 1")
-                           beg=int((onset_year[yt,it,jt]-yr0)*tot+onset_jday[yt,it,jt]-1)
-                           ned=int((demise_year[yt+1,it,jt]-yr0)*tot+demise_jday[yt+1,it,jt]-1)
-                           durwet[yt,it,jt]=float(ned-beg)
-                           totwet[yt,it,jt]=np.sum(prec[beg:ned,it,jt])
-                  if onset_jday[yt,it,jt] < demise_jday[yt,it,jt]:
-#This means the wet season happens during the same year
-                     #print(yt,"1 of 1")
-                     beg=int((onset_year[yt,it,jt]-yr0)*tot+onset_jday[yt,it,jt]-1)
-                     ned=int((demise_year[yt,it,jt]-yr0)*tot+demise_jday[yt,it,jt]-1)
-                     durwet[yt,it,jt]=float(ned-beg)
-# no (-1) because python doesn't use the last element anyway
-                     totwet[yt,it,jt]=np.sum(prec[beg:ned,it,jt])
-                     # still have to calculate dry season properties
-                     if yt < nyrs-1:
-                        if onset_year[yt+1,it,jt] > 0.:
-                           #print(yt,"3 of 1")
-                           beg=int((demise_year[yt,it,jt]-yr0)*tot+demise_jday[yt,it,jt]-1)
-                           ned=int((onset_year[yt+1,it,jt]-yr0)*tot+onset_jday[yt+1,it,jt]-1)
-                           durdry[yt,it,jt]=float(ned-beg)
-                           totdry[yt,it,jt]=np.sum(prec[beg:ned,it,jt])
-               if 0. < demise_year[yt,it,jt] < onset_year[yt,it,jt]:
-#this means the onset of the rainy season was found in year+1
-                  #print(yt,"1 of 2")
-                  beg=int((demise_year[yt,it,jt]-yr0)*tot+demise_jday[yt,it,jt]-1)
-                  ned=int((onset_year[yt,it,jt]-yr0)*tot+onset_jday[yt,it,jt]-1)
-                  durdry[yt,it,jt]=float(ned-beg)
-                  totdry[yt,it,jt]=np.sum(prec[beg:ned,it,jt])
-                  if yt < nyrs-1:
-                     if demise_year[yt+1,it,jt] > 0.:
-                        if onset_jday[yt,it,jt] < demise_jday[yt+1,it,jt]:
-                           #print(yt,"3 of 2")
-                           beg=int((onset_year[yt,it,jt]-yr0)*tot+onset_jday[yt,it,jt]-1)
-                           ned=int((demise_year[yt+1,it,jt]-yr0)*tot+demise_jday[yt+1,it,jt]-1)
-                           durwet[yt,it,jt]=float(ned-beg)
-                           totwet[yt,it,jt]=np.sum(prec[beg:ned,it,jt])
-               if 0. < onset_year[yt,it,jt] < demise_year[yt,it,jt]:
-#this means the end of the rainy season was found in year+1
-                  #print(yt,"1 of 3")
-                  beg=int((onset_year[yt,it,jt]-yr0)*tot+onset_jday[yt,it,jt]-1)
-                  ned=int((demise_year[yt,it,jt]-yr0)*tot+demise_jday[yt,it,jt]-1)
-                  durwet[yt,it,jt]=float(ned-beg)
-                  totwet[yt,it,jt]=np.sum(prec[beg:ned,it,jt])
-                  if yt < nyrs-1:
-                     if onset_year[yt+1,it,jt] > 0.:
-                        if demise_jday[yt,it,jt] < onset_jday[yt+1,it,jt]:
-                           #print(yt,"3 of 3")
-                           beg=int((demise_year[yt,it,jt]-yr0)*tot+demise_jday[yt,it,jt]-1)
-                           ned=int((onset_year[yt+1,it,jt]-yr0)*tot+onset_jday[yt+1,it,jt]-1)
-                           durdry[yt,it,jt]=float(ned-beg)
-                           totdry[yt,it,jt]=np.sum(prec[beg:ned,it,jt])
-
+#  Station mode: one table with the results of all stations
 #=======================================================================================
-"""
-Preparing to save the results
-"""
+   records=rainyseason_stations_read(stations,varname,dtype)
+   print(len(records),' stations read')
+   job=rainyseason_progress(len(records),reporters,pinterval)
+   results=list(rainyseason_stations(records,tot,dper,npass,dtype,job))
+   outfile=pathout+"stations."+prefix+".csv"
+   rainyseason_stations_write(outfile,records,results,missval)
+   print('Results saved in ',outfile)
+elif len(stream) > 0:
 #=======================================================================================
-
-print('Saving results...')
-prec=None
-dyr=np.arange(0,nyrs,1.)
-dtime=np.arange(0,int(tot/2),1.)
-yrs=np.arange(yr0,year[ntot-1]+1,1.)
-
-onset_jday[onset_jday==0.]=missval
-onset_day[onset_day==0.]=missval
-onset_month[onset_month==0.]=missval
-onset_year[onset_year==0.]=missval
-
-demise_jday[demise_jday==0.]=missval
-demise_day[demise_day==0.]=missval
-demise_month[demise_month==0.]=missval
-demise_year[demise_year==0.]=missval
-
-totwet[totwet==0.]=missval
-totdry[totdry==0.]=missval
-durdry[durdry==0.]=missval
-durwet[durwet==0.]=missval
-
+#  Tiled streaming: read-ahead, calculation and write-behind of the tiles
+#=======================================================================================
+   if backend == 'zarr':
+      files=rainyseason_zarr_create(pathout,prefix,lats[0:nlat],lons[0:nlon],yr0,nyrs,missval,tile)
+   else:
+      files=rainyseason_create(pathout,prefix,lats[0:nlat],lons[0:nlon],yr0,nyrs,missval)
+   tiles=rainyseason_tiles(nlat,nlon,tile)
+   job=rainyseason_progress(len(tiles),reporters,pinterval,'tiles')
+   summ=rainyseason_summary(nlat,nlon) if summary else None
+   npts=rainyseason_stream(stream,varname,None,subset,tiles,files,backend,nlat,nlon,nyrs,day,month,year,jday,leap,yr0,tot,missval,dper,npass,dtype,prefetch,job,summ)
+   if backend == 'zarr':
+      rainyseason_zarr_consolidate(files)
+   print(npts,' points saved')
+   if summary:
+      outfile=pathout+"summary.wet.season."+prefix+"."+str(yr0)+"-"+str(yr0+nyrs-3)+".nc"
+      print(rainyseason_summary_write(outfile,summ,nlat,nlon,lats[0:nlat],lons[0:nlon],tot,missval),' saved')
+elif len(members) == 0:
+#================================= Formatting Data ======================================
+   print("Formatting Data...")
+   prec=np.asarray(prec,dtype=dtype)
+   pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+   prec=None
+   if shard is not None:
+      ishard,nshard=rainyseason_shard_parse(shard)
+      sel=rainyseason_shard_points(index,ishard,nshard)
+      covered=(prefix,index[sel],len(index))
+      pprec=pprec[sel,:]
+      index=index[sel]
+      prefix=prefix+rainyseason_shard_tag(ishard,nshard)
+      print('Shard ',ishard,' of ',nshard,': ',len(index),' valid points')
+   if delta:
+#------------------------------------------------------------------------
+# Delta mode: only the points whose series changed since the previous run
+#------------------------------------------------------------------------
+      fpfile=pathout+"fingerprint."+prefix+"."+str(yr0)+"-"+str(yr0+nyrs-3)+".nc"
+      config=rainyseason_delta_config(yr0,ntot,lats[0:nlat],lons[0:nlon],tot,dper,npass,precision)
+      fpgrid=np.zeros((nlat*nlon),dtype=np.uint64)
+      fpgrid[index]=rainyseason_fingerprint(pprec)
+      old=None
+      if all([os.path.exists(ff) for ff in rainyseason_files(pathout,prefix,yr0,nyrs)]):
+         old=rainyseason_delta_read(fpfile,config)
+      if old is not None:
+         points,sel=rainyseason_delta_points(old,fpgrid,index)
+         print('Delta: ',len(points),' of ',nlat*nlon,' grid points changed, ',len(sel),' valid points to calculate')
+         pprec=pprec[sel,:]
+         index=index[sel]
+      else:
+         print('Delta: no previous run with the same settings, all points are calculated')
+   print("Data Formatted.")
+#=======================================================================================
+#  Calculating the climatology, the onset and demise dates, the duration and the total
+#  precipitation of the rainy and dry seasons
+#=======================================================================================
+   print('Calculating the onset of the rainy season...')
+   if len(sweep) > 0:
+      sweep.setdefault('npass',[npass])
+      sweep.setdefault('dper',[dper])
+      combos=rainyseason_combinations(sweep)
+      labels=[','.join([name+'='+str(cc[name]) for name in cc.keys()]) for cc in combos]
+      files=rainyseason_create(pathout,prefix,lats[0:nlat],lons[0:nlon],yr0,nyrs,missval,labels,"param")
+      rainyseason_sweep_params(files,combos)
+      for k,cc,idx,res in rainyseason_sweep(pprec,index,day,month,year,jday,leap,yr0,tot,sweep,dtype):
+          rainyseason_write(files,res,idx,nlat,nlon,nyrs,missval,cal,k)
+          print(labels[k],' saved')
+      pprec=None
+   elif backend == 'zarr' and len(normals) == 0 and nboot == 0:
+#========================================================================
+# Tiles: each tile is calculated and saved by one process
+#========================================================================
+      files=rainyseason_zarr_create(pathout,prefix,lats[0:nlat],lons[0:nlon],yr0,nyrs,missval,tile)
+      tiles=[tt for tt in rainyseason_tiles(nlat,nlon,tile) if len(rainyseason_tile_points(index,nlon,tt)) > 0]
+      job=rainyseason_progress(len(index),reporters,pinterval)
+      summ=rainyseason_summary(nlat,nlon) if summary else None
+      if nworkers > 1:
+         from concurrent.futures import ProcessPoolExecutor, as_completed
+         with ProcessPoolExecutor(max_workers=nworkers) as pool:
+              jobs={}
+              for tt in tiles:
+                  pt=rainyseason_tile_points(index,nlon,tt)
+                  future=pool.submit(rainyseason_zarr_tile,files,pprec[pt,:],index[pt],tt,nlat,nlon,nyrs,day,month,year,jday,leap,yr0,tot,missval,dper,npass,dtype,None,summary)
+                  jobs[future]=(tt,len(pt))
+              rainyseason_stage(job,'tiles')
+              done=0
+              for future in as_completed(jobs):
+                  npts=future.result()
+                  if summary:
+                     npts,idx,sums=npts
+                     rainyseason_summary_add(summ,sums,idx)
+                  print('Tile ',jobs[future][0],': ',npts,' points saved')
+                  done=done+jobs[future][1]
+                  rainyseason_step(job,'tiles',done,len(index))
+              rainyseason_stage_end(job,'tiles')
+      else:
+         for tt in tiles:
+             pt=rainyseason_tile_points(index,nlon,tt)
+             npts=rainyseason_zarr_tile(files,pprec[pt,:],index[pt],tt,nlat,nlon,nyrs,day,month,year,jday,leap,yr0,tot,missval,dper,npass,dtype,job,summary)
+             if summary:
+                npts,idx,sums=npts
+                rainyseason_summary_add(summ,sums,idx)
+             print('Tile ',tt,': ',npts,' points saved')
+      pprec=None
+      rainyseason_zarr_consolidate(files)
+      if summary:
+         outfile=pathout+"summary.wet.season."+prefix+"."+str(yr0)+"-"+str(yr0+nyrs-3)+".nc"
+         print(rainyseason_summary_write(outfile,summ,nlat,nlon,lats[0:nlat],lons[0:nlon],tot,missval),' saved')
+   elif len(normals) == 0:
+      if nboot > 0:
+         job=rainyseason_progress(len(index)*(len(boffsets)+(0 not in boffsets)),reporters,pinterval)
+         index,res,boot=rainyseason_uncertainty(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,nboot,boffsets,bperc,0,dtype,job,curves)
+         outfile=pathout+"bootstrap.wet.season."+prefix+"."+str(yr0)+"-"+str(yr0+nyrs-3)+".nc"
+         rainyseason_fields(outfile,[('onset','Wet season onset, climatology [Day of Year]',boot['onset']),
+                                     ('demise','Wet season demise, climatology [Day of Year]',boot['demise']),
+                                     ('durwet','Duration of the wet season, climatology [day]',boot['durwet']),
+                                     ('onset_trend','Trend of the wet season onset [day/year]',boot['onset_trend']),
+                                     ('demise_trend','Trend of the wet season demise [day/year]',boot['demise_trend']),
+                                     ('durwet_trend','Trend of the duration of the wet season [day/year]',boot['durwet_trend'])],
+                            index,nlat,nlon,lats[0:nlat],lons[0:nlon],missval,"percentile",bperc)
+      else:
+         job=rainyseason_progress(len(index),reporters,pinterval)
+         index,res=rainyseason_pipeline(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,dtype,job,curves,seasonindex)
+      pprec=None
 #========================================================================
 # Saving rainy and wet season characteristics
 #========================================================================
-
-outfile = pathout+"onset.wet.season.CPC_UNI."+str(yrs[0])[0:4]+"-"+str(yrs[nyrs-3])[0:4]+".nc"
-from netCDF4 import Dataset
-rootgrp = Dataset(outfile, "w", format="NETCDF4")
-rootgrp.close()
-rootgrp = Dataset(outfile, "a")
-# Creating dimensions
-lon = rootgrp.createDimension("lon", len(lons[0:nlon]))
-lat = rootgrp.createDimension("lat", len(lats[0:nlat]))
-time = rootgrp.createDimension("time",nyrs-2)
-#Creating coordinates
-times = rootgrp.createVariable("time","i4",("time",))
-latitudes = rootgrp.createVariable("lat","f8",("lat",))
-longitudes = rootgrp.createVariable("lon","f8",("lon",))
-# Filling coordinates
-longitudes.units='degrees_east'
-longitudes.long_name='Longitude'
-longitudes[:]=lons[0:nlon]
-latitudes.units='degrees_north'
-latitudes.long_name='Latitude'
-latitudes[:]=lats[0:nlat]
-times.long_name='Time'
-times.units='years since '+str(yrs[0])[0:4]+'-01-01 00:00'
-times[:]=dyr[0:nyrs-2]
-# Creating variables 
-var = rootgrp.createVariable("DOY","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var.long_name = 'Wet season onset [Day of Year]'
-var[:,:,:] = onset_jday[0:nyrs-2,:,:]
-# Creating variables 
-var2 = rootgrp.createVariable("day","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var2.long_name = 'Wet season onset [Day of the month]'
-var2[:,:,:] = onset_day[0:nyrs-2,:,:]
-# Creating variables 
-var3 = rootgrp.createVariable("month","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var3.long_name = 'Wet season onset month'
-var3[:,:,:] = onset_month[0:nyrs-2,:,:]
-# Creating variables 
-var4 = rootgrp.createVariable("year","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var4.long_name = 'Wet season onset year'
-var4[:,:,:] = onset_year[0:nyrs-2,:,:]
-rootgrp.close()
-
-#=============
-#  End of wet season/ Start of dry season
-#=============
-
-outfile = pathout+"demise.wet.season.CPC_UNI."+str(yrs[0])[0:4]+"-"+str(yrs[nyrs-3])[0:4]+".nc"
-from netCDF4 import Dataset
-rootgrp = Dataset(outfile, "w", format="NETCDF4")
-rootgrp.close()
-rootgrp = Dataset(outfile, "a")
-# Creating dimensions
-lon = rootgrp.createDimension("lon", len(lons[0:nlon]))
-lat = rootgrp.createDimension("lat", len(lats[0:nlat]))
-time = rootgrp.createDimension("time",nyrs-2)
-#Creating coordinates
-times = rootgrp.createVariable("time","i4",("time",))
-latitudes = rootgrp.createVariable("lat","f8",("lat",))
-longitudes = rootgrp.createVariable("lon","f8",("lon",))
-# Filling coordinates
-longitudes.units='degrees_east'
-longitudes.long_name='Longitude'
-longitudes[:]=lons[0:nlon]
-latitudes.units='degrees_north'
-latitudes.long_name='Latitude'
-latitudes[:]=lats[0:nlat]
-times.long_name='Time'
-times.units='years since '+str(yrs[0])[0:4]+'-01-01 00:00'
-times[:]=dyr[0:nyrs-2]
-# Creating variables 
-var = rootgrp.createVariable("DOY","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var.long_name = 'Wet season demise [Day of Year]'
-var[:,:,:] = demise_jday[0:nyrs-2,:,:]
-# Creating variables 
-var2 = rootgrp.createVariable("day","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var2.long_name = 'Wet season demise [Day of the month]'
-var2[:,:,:] = demise_day[0:nyrs-2,:,:]
-# Creating variables 
-var3 = rootgrp.createVariable("month","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var3.long_name = 'Wet season demise month'
-var3[:,:,:] = demise_month[0:nyrs-2,:,:]
-# Creating variables 
-var4 = rootgrp.createVariable("year","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var4.long_name = 'Wet season demise year'
-var4[:,:,:] = demise_year[0:nyrs-2,:,:]
-rootgrp.close()
-
-#=============
-#  Total precipitation and duration
-#=============
-
-outfile = pathout+"total.precip.wet.season.CPC_UNI."+str(yrs[0])[0:4]+"-"+str(yrs[nyrs-3])[0:4]+".nc"
-from netCDF4 import Dataset
-rootgrp = Dataset(outfile, "w", format="NETCDF4")
-rootgrp.close()
-rootgrp = Dataset(outfile, "a")
-# Creating dimensions
-lon = rootgrp.createDimension("lon", len(lons[0:nlon]))
-lat = rootgrp.createDimension("lat", len(lats[0:nlat]))
-time = rootgrp.createDimension("time",nyrs-2)
-#Creating coordinates
-times = rootgrp.createVariable("time","i4",("time",))
-latitudes = rootgrp.createVariable("lat","f8",("lat",))
-longitudes = rootgrp.createVariable("lon","f8",("lon",))
-# Filling coordinates
-longitudes.units='degrees_east'
-longitudes.long_name='Longitude'
-longitudes[:]=lons[0:nlon]
-latitudes.units='degrees_north'
-latitudes.long_name='Latitude'
-latitudes[:]=lats[0:nlat]
-times.long_name='Time'
-times.units='years since '+str(yrs[0])[0:4]+'-01-01 00:00'
-times[:]=dyr[0:nyrs-2]
-# Creating variables 
-var = rootgrp.createVariable("totwet","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var.long_name = 'Total precipiation during the wet season [mm]'
-var[:,:,:] = totwet[0:nyrs-2,:,:]
-rootgrp.close()
-
-outfile = pathout+"total.precip.dry.season.CPC_UNI."+str(yrs[0])[0:4]+"-"+str(yrs[nyrs-3])[0:4]+".nc"
-from netCDF4 import Dataset
-rootgrp = Dataset(outfile, "w", format="NETCDF4")
-rootgrp.close()
-rootgrp = Dataset(outfile, "a")
-# Creating dimensions
-lon = rootgrp.createDimension("lon", len(lons[0:nlon]))
-lat = rootgrp.createDimension("lat", len(lats[0:nlat]))
-time = rootgrp.createDimension("time",nyrs-2)
-#Creating coordinates
-times = rootgrp.createVariable("time","i4",("time",))
-latitudes = rootgrp.createVariable("lat","f8",("lat",))
-longitudes = rootgrp.createVariable("lon","f8",("lon",))
-# Filling coordinates
-longitudes.units='degrees_east'
-longitudes.long_name='Longitude'
-longitudes[:]=lons[0:nlon]
-latitudes.units='degrees_north'
-latitudes.long_name='Latitude'
-latitudes[:]=lats[0:nlat]
-times.long_name='Time'
-times.units='years since '+str(yrs[0])[0:4]+'-01-01 00:00'
-times[:]=dyr[0:nyrs-2]
-# Creating variables 
-var = rootgrp.createVariable("totdry","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var.long_name = 'Total precipitation during the dry season [mm]'
-var[:,:,:] = totdry[0:nyrs-2,:,:]
-rootgrp.close()
-
-outfile = pathout+"duration.wet.season.CPC_UNI."+str(yrs[0])[0:4]+"-"+str(yrs[nyrs-3])[0:4]+".nc"
-from netCDF4 import Dataset
-rootgrp = Dataset(outfile, "w", format="NETCDF4")
-rootgrp.close()
-rootgrp = Dataset(outfile, "a")
-# Creating dimensions
-lon = rootgrp.createDimension("lon", len(lons[0:nlon]))
-lat = rootgrp.createDimension("lat", len(lats[0:nlat]))
-time = rootgrp.createDimension("time",nyrs-2)
-#Creating coordinates
-times = rootgrp.createVariable("time","i4",("time",))
-latitudes = rootgrp.createVariable("lat","f8",("lat",))
-longitudes = rootgrp.createVariable("lon","f8",("lon",))
-# Filling coordinates
-longitudes.units='degrees_east'
-longitudes.long_name='Longitude'
-longitudes[:]=lons[0:nlon]
-latitudes.units='degrees_north'
-latitudes.long_name='Latitude'
-latitudes[:]=lats[0:nlat]
-times.long_name='Time'
-times.units='years since '+str(yrs[0])[0:4]+'-01-01 00:00'
-times[:]=dyr[0:nyrs-2]
-# Creating variables 
-var = rootgrp.createVariable("durwet","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var.long_name = 'Duration of the wet weson [day]'
-var[:,:,:] = durwet[0:nyrs-2,:,:]
-rootgrp.close()
-
-outfile = pathout+"duration.dry.season.CPC_UNI."+str(yrs[0])[0:4]+"-"+str(yrs[nyrs-3])[0:4]+".nc"
-from netCDF4 import Dataset
-rootgrp = Dataset(outfile, "w", format="NETCDF4")
-rootgrp.close()
-rootgrp = Dataset(outfile, "a")
-# Creating dimensions
-lon = rootgrp.createDimension("lon", len(lons[0:nlon]))
-lat = rootgrp.createDimension("lat", len(lats[0:nlat]))
-time = rootgrp.createDimension("time",nyrs-2)
-#Creating coordinates
-times = rootgrp.createVariable("time","i4",("time",))
-latitudes = rootgrp.createVariable("lat","f8",("lat",))
-longitudes = rootgrp.createVariable("lon","f8",("lon",))
-# Filling coordinates
-longitudes.units='degrees_east'
-longitudes.long_name='Longitude'
-longitudes[:]=lons[0:nlon]
-latitudes.units='degrees_north'
-latitudes.long_name='Latitude'
-latitudes[:]=lats[0:nlat]
-times.long_name='Time'
-times.units='years since '+str(yrs[0])[0:4]+'-01-01 00:00'
-times[:]=dyr[0:nyrs-2]
-# Creating variables 
-var = rootgrp.createVariable("durdry","f4", ("time","lat","lon",),fill_value=missval)
-# Filling Variable
-var.long_name = 'Duration of the dry season [day]'
-var[:,:,:] = durdry[0:nyrs-2,:,:]
-rootgrp.close()
-
+      print('Saving results...')
+      rainyseason_stage(job,'write')
+      if delta and old is not None:
+         rainyseason_patch(rainyseason_files(pathout,prefix,yr0,nyrs),res,index,points,nlat,nlon,nyrs,missval,cal)
+      else:
+         files=rainyseason_create(pathout,prefix,lats[0:nlat],lons[0:nlon],yr0,nyrs,missval)
+         rainyseason_write(files,res,index,nlat,nlon,nyrs,missval,cal)
+      rainyseason_stage_end(job,'write')
+      if delta:
+         print(rainyseason_delta_save(fpfile,fpgrid,config,lats[0:nlat],lons[0:nlon]),' saved')
+      if summary:
+         summ=rainyseason_summary(nlat,nlon)
+         rainyseason_summary_add(summ,rainyseason_summary_sums(res,cal,nyrs,tot),index)
+         outfile=pathout+"summary.wet.season."+prefix+"."+str(yr0)+"-"+str(yr0+nyrs-3)+".nc"
+         print(rainyseason_summary_write(outfile,summ,nlat,nlon,lats[0:nlat],lons[0:nlon],tot,missval),' saved')
+      if seasonindex and nboot == 0:
+         outfile=pathout+"seasonindex."+prefix+"."+str(yr0)+"-"+str(yr0+nyrs-3)+".nc"
+         rainyseason_seasonindex_save(outfile,rainyseason_seasonindex(res,index,yr0,tot,lats[0:nlat],lons[0:nlon]))
+         print(outfile,' saved')
+   else:
+      labels=[str(y0)+'-'+str(y1) for y0,y1 in normals]
+      files=rainyseason_create(pathout,prefix,lats[0:nlat],lons[0:nlon],yr0,nyrs,missval,labels,"normal")
+      job=rainyseason_progress(len(index)*len(normals),reporters,pinterval)
+      for k,idx,res in rainyseason_normals(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,normals,dtype,job,curves):
+          rainyseason_write(files,res,idx,nlat,nlon,nyrs,missval,cal,k)
+          print('Reference period ',labels[k],' saved')
+      pprec=None
+   if shard is not None:
+#------------------------------------------------------------------------
+# The coverage file is saved last: it marks the shard as complete
+#------------------------------------------------------------------------
+      print(rainyseason_shard_coverage(pathout,covered[0],ishard,nshard,covered[1],covered[2],lats[0:nlat],lons[0:nlon]),' saved')
+else:
+#=======================================================================================
+#  Batch mode: each member is read, processed and saved without restarting
+#=======================================================================================
+   if backend == 'zarr':
+      files=rainyseason_zarr_create(pathout,prefix,lats[0:nlat],lons[0:nlon],yr0,nyrs,missval,tile,members)
+   else:
+      files=rainyseason_create(pathout,prefix,lats[0:nlat],lons[0:nlon],yr0,nyrs,missval,members)
+   args=[]
+   for mm in members:
+       if isinstance(mm,tuple):
+          args.append((mm[0],mm[1]))
+       else:
+          args.append((mm,None))
+   job=rainyseason_progress(len(members),reporters,pinterval,'members')
+   rainyseason_stage(job,'members')
+   if nworkers > 1:
+      from concurrent.futures import ProcessPoolExecutor, as_completed
+      with ProcessPoolExecutor(max_workers=nworkers) as pool:
+           jobs={}
+           for mt in range(0,len(members)):
+               if backend == 'zarr':
+                  future=pool.submit(rainyseason_zarr_member,files,args[mt][0],args[mt][1],mt,varname,nlat,nlon,nyrs,day,month,year,jday,leap,yr0,tot,missval,dper,npass,dtype,subset)
+               else:
+                  future=pool.submit(rainyseason_member,args[mt][0],args[mt][1],varname,day,month,year,jday,leap,yr0,tot,dper,npass,dtype,subset)
+               jobs[future]=mt
+           done=0
+           for future in as_completed(jobs):
+               if backend != 'zarr':
+                  index,res=future.result()
+                  rainyseason_write(files,res,index,nlat,nlon,nyrs,missval,cal,jobs[future])
+               else:
+                  future.result()
+               print(members[jobs[future]],' saved')
+               done=done+1
+               rainyseason_step(job,'members',done,len(members))
+   else:
+      for mt in range(0,len(members)):
+          if backend == 'zarr':
+             rainyseason_zarr_member(files,args[mt][0],args[mt][1],mt,varname,nlat,nlon,nyrs,day,month,year,jday,leap,yr0,tot,missval,dper,npass,dtype,subset)
+          else:
+             index,res=rainyseason_member(args[mt][0],args[mt][1],varname,day,month,year,jday,leap,yr0,tot,dper,npass,dtype,subset)
+             rainyseason_write(files,res,index,nlat,nlon,nyrs,missval,cal,mt)
+          print(members[mt],' saved')
+          rainyseason_step(job,'members',mt+1,len(members))
+   rainyseason_stage_end(job,'members')
+   if backend == 'zarr':
+      rainyseason_zarr_consolidate(files)
+
+if preview is not None:
+   rainyseason_preview_tag(pathout,prefix,factor)
 
 #========================================================================
 #                             End of program
 #========================================================================
-
-
-
-
-
-
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutine that calculates the beginning (or end) dates of the rainy
+# season for a batch of (point, year) pairs with the method of Bombardi
+# et al. (2017). It gives the same dates as rainyseason_B17_onset and
+# rainyseason_B17_demise, but only for the years that are requested.
+# pprec    --> packed array of precipitation (points,time) [mm/day].
+#              Missing data are NaN and count as zero precipitation
+# rm       --> array (points) of the daily annual mean [mm/day]
+# startwet --> array (points) of the Julian day used as starting point
+# pts      --> array (pairs) of the points of each pair
+# yts      --> array (pairs) of the years of each pair, counted as in the
+#              kernels: from the beginning of the series for the onset and
+#              from the end of the series for the demise
+# jday     --> array of Julian days of the calendar (see rainyseason_calendar)
+# tot      --> total number of points for one year of data (365)
+# npass    --> integer for the number of "passes" for the smoothing of the
+#              time series of accumulated precipitation anomalies
+# reverse  --> False for the onset, True for the demise (the time series
+#              is reversed)
+# dtype    --> numpy dtype of the anomalies (numpy.float64 or numpy.float32)
+# starts   --> table of the first days of the windows (see rainyseason_starts),
+#              created from jday if None
+#
+# The pairs are grouped by the length of their window (all windows have
+# one year of data, except the last one of the series) and each group is
+# smoothed and searched as one array (pairs,days), in blocks of nblock
+# pairs. Returns the array (pairs) of the day indices of the dates: their
+# position in the (forward) time series, -1 where no date was found.
+#========================================================================
+import numpy as np
+from rainyseason_calendar import rainyseason_starts
+def rainyseason_B17_batch(pprec,rm,startwet,pts,yts,jday,tot,npass,reverse=False,dtype=np.float64,nblock=4096,starts=None):
+    mtot=len(jday)
+    npair=len(pts)
+    if starts is None:
+       starts=rainyseason_starts(jday)
+    table=starts['reverse' if reverse else 'forward']
+    out=np.full((npair),-1,dtype=np.int32)
+#------------------------------------------------------------------------
+# First day (tt) of the window of each pair
+#------------------------------------------------------------------------
+    tt=np.full((npair),-1,dtype=np.int64)
+    for sdate in np.unique(startwet[pts]):
+        sel=np.where(startwet[pts] == sdate)[0]
+        first=table.get(float(sdate),np.zeros((0),dtype=np.int64))
+        ok=yts[sel] < len(first)
+        tt[sel[ok]]=first[yts[sel[ok]]]
+    valid=(tt >= 0)
+    nlen=np.where(tt+tot <= mtot-1,tot,mtot-1-tt)
+    for n in np.unique(nlen[valid]):
+        group=np.where(valid & (nlen == n))[0]
+        for b0 in range(0,len(group),nblock):
+            grp=group[b0:b0+nblock]
+            days=tt[grp,np.newaxis]+np.arange(0,n)
+            if reverse:
+               days=mtot-1-days
+            ap=np.nan_to_num(pprec[pts[grp,np.newaxis],days],nan=0.)-rm[pts[grp]][:,np.newaxis]
+            sseries=np.zeros((len(grp),tot))
+            sseries[:,0:n]=np.cumsum(ap,axis=1,dtype=np.float64)
+            ned2=n
+#------------------------------------------------------------------------
+# Last year of the series: the series is completed with its mirror image
+#------------------------------------------------------------------------
+            if n < tot:
+               tmp=sseries[:,0:n][:,::-1]
+               if 2*n > tot:
+                  sseries[:,n:tot]=tmp[:,0:tot-n]
+                  ned2=tot
+               else:
+                  sseries[:,n:2*n]=tmp
+                  ned2=2*n
+#------------------------------------------------------------------------
+# Smoothing the time series of accumulated anomalies
+#------------------------------------------------------------------------
+            ssmooth=sseries.copy()
+            temp=sseries.copy()
+            for nt in range(0,npass):
+                temp[:,0]=0.5*(ssmooth[:,0]+ssmooth[:,1])
+                temp[:,ned2-1]=0.5*(ssmooth[:,ned2-2]+ssmooth[:,ned2-1])
+                temp[:,1:ned2-1]=0.25*ssmooth[:,0:ned2-2]+0.50*ssmooth[:,1:ned2-1]+0.25*ssmooth[:,2:ned2]
+                ssmooth,temp=temp,ssmooth
+#------------------------------------------------------------------------
+# First derivative and first day (st) of the pattern - - - + +
+#------------------------------------------------------------------------
+            dsdt=np.zeros((len(grp),ned2))
+            dsdt[:,0]=ssmooth[:,1]-ssmooth[:,0]
+            dsdt[:,ned2-1]=ssmooth[:,ned2-1]-ssmooth[:,ned2-2]
+            dsdt[:,1:ned2-1]=0.5*(ssmooth[:,2:ned2]-ssmooth[:,0:ned2-2])
+            cond=(dsdt[:,0:ned2-4] < 0.) & (dsdt[:,1:ned2-3] < 0.) & (dsdt[:,2:ned2-2] <= 0.) & (dsdt[:,3:ned2-1] > 0.) & (dsdt[:,4:ned2] > 0.)
+            found=np.any(cond,axis=1)
+            beg=np.argmax(cond,axis=1)+2+tt[grp]+1
+            found=found & (beg <= mtot-1)
+            if reverse:
+               beg=mtot-1-beg
+            out[grp[found]]=beg[found]
+    return out
+#========================================================================
+#                             End of subroutine
+#========================================================================
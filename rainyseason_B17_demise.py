@@ -14,6 +14,8 @@
 # precip --> a time series of precipitation anomalies (against mean annual daily)
 # npass  --> integer for the number of "passes" for the smoothing of the
 #            time series of accumulated precipitation anomalies
+# precip may be single precision (float32). The accumulated anomalies are
+# always summed in double precision (float64) to avoid round-off drift.
 #========================================================================
 import sys
 import numpy
@@ -27,7 +29,7 @@ def rainyseason_B17_demise(nyrs,ytot,jday,day,month,year,jstart,precip,npass,sjd
     tmpjday=numpy.zeros((mtot))
     tmpmonth=numpy.zeros((mtot))
     tmpyear=numpy.zeros((mtot))
-    tmpprec=numpy.zeros((mtot))
+    tmpprec=numpy.zeros((mtot),dtype=precip.dtype)
     tmpjday[:]=jday[::-1]
     tmpday[:]=day[::-1]
     tmpmonth[:]=month[::-1]
@@ -52,7 +54,7 @@ def rainyseason_B17_demise(nyrs,ytot,jday,day,month,year,jstart,precip,npass,sjd
            ssmooth[:]=0.
            dsdt[:]=0.
            temp[:]=0.
-           sseries[0:ned2]=numpy.cumsum(tmpprec[beg:beg+ned2])
+           sseries[0:ned2]=numpy.cumsum(tmpprec[beg:beg+ned2],dtype=numpy.float64)
            if ned == mtot-1:  #NEW
               fin=len(sseries[0:ned2])
               tmp=numpy.zeros((fin))
@@ -14,6 +14,8 @@
 # precip --> a time series of precipitation anomalies (against mean annual daily)
 # npass  --> integer for the number of "passes" for the smoothing of the
 #            time series of accumulated precipitation anomalies
+# precip may be single precision (float32). The accumulated anomalies are
+# always summed in double precision (float64) to avoid round-off drift.
 #========================================================================
 import sys
 import numpy
@@ -42,7 +44,7 @@ def rainyseason_B17_onset(nyrs,ytot,jday,day,month,year,jstart,precip,npass,sjda
            ssmooth[:]=0.
            dsdt[:]=0.
            temp[:]=0.
-           sseries[0:ned2]=numpy.cumsum(precip[beg:beg+ned2])
+           sseries[0:ned2]=numpy.cumsum(precip[beg:beg+ned2],dtype=numpy.float64)
            if ned == mtot-1:  #NEW
               fin=len(sseries[0:ned2])
               tmp=numpy.zeros((fin))
@@ -0,0 +1,80 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutine that estimates the uncertainty of the climatological onset
+# and demise dates, of the duration of the rainy season and of their
+# linear trends by resampling years with replacement (bootstrap)
+# onset  --> array (offsets,years,points) of onset dates [Day of Year]
+# demise --> array (offsets,years,points) of demise dates [Day of Year]
+# durwet --> array (offsets,years,points) of durations of the rainy season
+#            Missing values are NaN. The first dimension holds the
+#            results obtained with perturbed starting dates (one element
+#            if the starting date is not perturbed)
+# tot    --> total number of points for one year of data (365)
+# nboot  --> number of resamples
+# perc   --> list of percentiles [0.,100.] to be returned
+# seed   --> seed of the random number generator
+#
+# All resamples are drawn at once as an array of year indices (and of
+# starting date perturbations) with shape (nboot,years). The dates of
+# each resample are gathered from the arrays in memory, so the rainy
+# season is not recalculated for each resample. Resamples are processed
+# in blocks along an extra array dimension to limit memory use.
+#
+# Dates are unwrapped around the circular mean date of each point before
+# they are averaged, so seasons that cross the end of the year are handled.
+# Trends [day/year] are calculated from the same unwrapped dates.
+# Returns a dictionary of arrays (percentiles,points): onset, demise,
+# durwet, onset_trend, demise_trend, durwet_trend (NaN where undefined)
+#========================================================================
+import math
+import warnings
+import numpy as np
+def rainyseason_bootstrap(onset,demise,durwet,tot,nboot,perc=[2.5,50.,97.5],seed=0):
+    noff,nyrs,npts=onset.shape
+    rng=np.random.default_rng(seed)
+    iyr=rng.integers(0,nyrs,size=(nboot,nyrs))
+    ioff=rng.integers(0,noff,size=(nboot,nyrs))
+    nblock=max(1,min(nboot,int(2.e7/max(nyrs*npts,1))))
+    out={}
+    for name,data,circ in [('onset',onset,True),('demise',demise,True),('durwet',durwet,False)]:
+        data=np.asarray(data,dtype=np.float64)
+#------------------------------------------------------------------------
+# Reference (climatological) value of each point, used to unwrap dates
+#------------------------------------------------------------------------
+        ok=~np.isnan(data)
+        if circ:
+           ang=2.*math.pi*data/float(tot)
+           ref=np.arctan2(np.sum(np.where(ok,np.sin(ang),0.),axis=(0,1)),np.sum(np.where(ok,np.cos(ang),0.),axis=(0,1)))*float(tot)/(2.*math.pi)
+        mean=np.zeros((nboot,npts))
+        trend=np.zeros((nboot,npts))
+        for b0 in range(0,nboot,nblock):
+            b1=min(b0+nblock,nboot)
+            vals=data[ioff[b0:b1,:],iyr[b0:b1,:],:]        # (block,years,points)
+            vok=~np.isnan(vals)
+            nv=np.sum(vok,axis=1)
+            if circ:
+               vals=vals-ref[np.newaxis,np.newaxis,:]
+               vals=vals-float(tot)*np.round(vals/float(tot))  # unwrapped around ref
+            vals=np.where(vok,vals,0.)
+            tt=np.where(vok,iyr[b0:b1,:,np.newaxis].astype(np.float64),0.)
+            st=np.sum(tt,axis=1)
+            sv=np.sum(vals,axis=1)
+            stt=np.sum(tt*tt,axis=1)
+            stv=np.sum(tt*vals,axis=1)
+            with np.errstate(divide='ignore',invalid='ignore'):
+                 mean[b0:b1,:]=np.where(nv > 1,sv/nv,np.nan)
+                 den=nv*stt-st*st
+                 trend[b0:b1,:]=np.where((nv > 2) & (den > 0.),(nv*stv-st*sv)/den,np.nan)
+        with warnings.catch_warnings():
+             warnings.simplefilter('ignore',category=RuntimeWarning)   # points without data
+             pm=np.nanpercentile(mean,perc,axis=0)
+             pt=np.nanpercentile(trend,perc,axis=0)
+        if circ:
+           pm=pm+ref[np.newaxis,:]
+           pm=np.mod(pm-1.,float(tot))+1.             # back to [1,tot]
+        out[name]=pm
+        out[name+'_trend']=pt
+    return out
+#========================================================================
+#                             End of subroutine
+#========================================================================
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that create the calendar of the time series: arrays of
+# days, months, years and Julian days (Day of Year)
+# The calendar only depends on the first date and on the length of the
+# time series. It is created once and shared by all datasets (or
+# ensemble members) processed in the same run.
+#========================================================================
+import numpy as np
+from datetime import timedelta, date
+def julian(dd,mm,yy,noleap=1):
+    """
+    Function that calculates julian days [Day of Year] from day,month, and year imput
+    Imput:
+       yy:     year [integer]
+       mm:     month [integer]
+       dd:     day [integer]
+       noleap = flag to indicate whether or not leap years should be considered.
+       noleap = 0 --> time searies contain Feb 29
+       noleap = 1 --> time series does not contain Feb 29
+   Output:
+       jday:   COrresponding Julian day or Day of Year [1,366]
+    Example:
+    --------
+      >>> jday = julian(1,1,1980) # no leap years
+      >>> jday = julian(1,1,1980,0)
+    """
+    mon=[31,28,31,30,31,30,31,31,30,31,30,31]
+    if noleap==0:
+       if yy % 4 == 0 and yy % 100 != 0 or yy % 400 == 0:
+          mon=[31,29,31,30,31,30,31,31,30,31,30,31]
+    if mm == 1:
+       jday=dd
+    if mm > 1:
+       jday=sum(mon[0:mm-1])+dd
+    return jday
+
+#=======================================================================================
+def dates_daily(y0,m0,d0,mtot,noleap):
+    """
+    Function that calculates arrays of dates (hour, day,month, year)
+
+    Imput:
+       y0:     initial year [integer]
+       m0:     initial month [integer]
+       d0:     initial day [integer]
+       mtot:   total number of elements in the time series [integer]
+       noleap: flag to indicate whether or not leap years should be considered.
+               noleap = 0 --> time searies contain Feb 29
+               noleap = 1 --> time series does not contain Feb 29
+    Output:
+       day:    array with values of days
+       month:  array with values of months
+       year:   array with values of years
+    Example:
+    --------
+      >>> day,month,year=dates_daily(1980,1,1,365,0)
+    """
+    day=np.zeros((mtot))
+    month=np.zeros((mtot))
+    year=np.zeros((mtot))
+    start_date=date(y0,m0,d0)
+    deltad = timedelta(days=1)
+    single_date=start_date
+    dt=0
+    while dt < mtot:
+          day[dt]=single_date.day
+          month[dt]=single_date.month
+          year[dt]=single_date.year
+          if noleap == 0:
+             single_date=single_date+deltad
+          if noleap == 1:
+             if year[dt] % 4 != 0:
+                single_date=single_date+deltad
+             if year[dt] % 4 == 0:
+                if year[dt] % 100 != 0:
+                   if month[dt] != 2:
+                      single_date=single_date+deltad
+                   if month[dt] == 2:
+                      if day[dt] < 28:
+                         single_date=single_date+deltad
+                      if day[dt] == 28:
+                         single_date=single_date+2*deltad
+                if (year[dt] % 100 == 0) & (year[dt] % 400 != 0):
+                   single_date=single_date+deltad
+                if year[dt] % 400 == 0:
+                   if month[dt] != 2:
+                      single_date=single_date+deltad
+                   if month[dt] == 2:
+                      if day[dt] < 28:
+                         single_date=single_date+deltad
+                      if day[dt] == 28:
+                         single_date=single_date+2*deltad
+          dt=dt+1
+    return day, month, year
+
+#=======================================================================================
+def rainyseason_calendar(y0,m0,d0,mtot,noleap):
+    """
+    Function that creates the calendar used by the calculation of the characteristics
+    of the rainy season. Feb 29th is removed from the calendar (see rainyseason_format)
+
+    Imput:
+       y0:     initial year [integer]
+       m0:     initial month [integer]
+       d0:     initial day [integer]
+       mtot:   total number of elements in the input time series [integer]
+       noleap: flag to indicate whether or not leap years should be considered.
+               noleap = 0 --> time searies contain Feb 29
+               noleap = 1 --> time series does not contain Feb 29
+    Output:
+       day:    array with values of days (without Feb 29th)
+       month:  array with values of months (without Feb 29th)
+       year:   array with values of years (without Feb 29th)
+       jday:   array with Julian days [1,365]
+       leap:   indices of Feb 29th in the input time series
+    Example:
+    --------
+      >>> day,month,year,jday,leap=rainyseason_calendar(1980,1,1,365,0)
+    """
+    day,month,year=dates_daily(y0,m0,d0,mtot,noleap)
+    leap=np.where((month == 2.) & (day == 29.))[0]
+    year=np.delete(year,leap,axis=0)
+    month=np.delete(month,leap,axis=0)
+    day=np.delete(day,leap,axis=0)
+    ntot=len(year)
+    jday=np.zeros((ntot))
+    for tt in range(0,ntot):
+        jday[tt]=julian(int(day[tt]),int(month[tt]),int(year[tt]))
+    return day, month, year, jday, leap
+
+#=======================================================================================
+def rainyseason_starts(jday):
+    """
+    Function that creates the table of the first days of the windows of the onset and
+    demise kernels: for each Julian day, the positions of that day in the time series
+    (forward) and in the reversed time series (reverse, used for the demise). The
+    positions of the last 5 days are not included (the kernels skip them). The table
+    only depends on the calendar, so it is created once and shared by all grid points.
+
+    Imput:
+       jday:   array with Julian days of the calendar (see rainyseason_calendar)
+    Output:
+       starts: dictionary {'forward': {Julian day: positions}, 'reverse': {...}}
+    Example:
+    --------
+      >>> starts=rainyseason_starts(jday)
+      >>> starts['forward'][152.]     # positions of Jun 1st
+    """
+    mtot=len(jday)
+    starts={}
+    for name,jd in [('forward',jday),('reverse',jday[::-1])]:
+        jd=np.asarray(jd[0:max(mtot-5,0)])
+        order=np.argsort(jd,kind='stable')
+        keys,first=np.unique(jd[order],return_index=True)
+        starts[name]=dict(zip(keys.tolist(),np.split(order.astype(np.int64),first[1:])))
+    return starts
@@ -0,0 +1,286 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that calculate the characteristics of the rainy and dry
+# seasons for a packed array of grid points: onset and demise dates
+# (first pass: Liebmann and Marengo 2001; second pass: Bombardi et al.
+# 2017), quality control, duration and accumulated precipitation
+# pprec    --> packed array of precipitation (points,time) [mm/day].
+#              Missing data are NaN and count as zero precipitation
+# rm       --> array (points) of the daily annual mean [mm/day]. Points
+#              with rm = 0 are skipped
+# startwet --> array (points) of the Julian day used as starting point
+# jday     --> an array of Julian days
+# day      --> an array of days
+# month    --> an array of months
+# year     --> an array of years
+# yr0      --> first year of data
+# tot      --> total number of points for one year of data (365)
+# npass    --> integer for the number of "passes" for the smoothing of the
+#              time series of accumulated precipitation anomalies
+# dtype    --> numpy dtype of the results (numpy.float64 or numpy.float32)
+# qc1      --> dates of the first pass further than qc1 x IQR from the
+#              median date are removed (1.5)
+# qc2      --> dates further than qc2 x IQR from the median date are removed
+#              after the second pass (3.)
+# mthres   --> points with more than this fraction of missing years are
+#              masked (0.33)
+#
+# rainyseason_characteristics returns a dictionary of arrays (years,points):
+# onset, demise (int32 day index of the date: position in the formatted
+# record, which starts on Jan 1st of yr0, i.e. (year-yr0)*tot+jday-1;
+# nodate where there is no date), durwet, durdry, totwet, totdry (NaN
+# where there are no results); and the arrays (points,years,tot/2) of
+# accumulated anomalies: wscurve, dscurve (only with curves=True; they are
+# as large as the packed precipitation); and the precipitation
+# accumulated since the beginning of the record (only with cumulative=True,
+# see rainyseason_seasonindex and rainyseason_cumulative): cumbase
+# (points,years+1) and cumprec (points,time+1). The Day of Year, day, month and
+# year of the dates are only derived from the calendar when the results
+# are saved (see rainyseason_field)
+#
+# The calculation is split in stages so that stages that do not depend on
+# a parameter can be shared by several values of that parameter (see
+# rainyseason_sweep):
+#   rainyseason_firstpass  --> first pass (no parameters)
+#   rainyseason_rejected   --> years that need a second pass (qc1)
+#   rainyseason_secondpass --> second pass (npass)
+#   rainyseason_combine    --> quality control of both passes (qc1, qc2)
+#   rainyseason_durations  --> masking, duration and totals (mthres)
+# progress --> progress of the job (see rainyseason_progress), or None
+# starts   --> table of the first days of the windows of the kernels (see
+#              rainyseason_starts), shared by all points and by both passes.
+#              It is created from jday if None
+#========================================================================
+import math
+import numpy as np
+from rainyseason_calendar import rainyseason_starts
+from rainyseason_onset_batch import rainyseason_onset_batch
+from rainyseason_B17_batch import rainyseason_B17_batch
+from rainyseason_progress import rainyseason_stage, rainyseason_step, rainyseason_stage_end
+dates=['jday','day','month','year']
+nodate=-1
+def rainyseason_characteristics(pprec,rm,startwet,jday,day,month,year,yr0,tot,npass,dtype=np.float64,qc1=1.5,qc2=3.,mthres=0.33,progress=None,curves=True,cumulative=False,starts=None):
+    if starts is None:
+       starts=rainyseason_starts(jday)
+    rainyseason_stage(progress,'firstpass')
+    first=rainyseason_firstpass(pprec,rm,startwet,jday,day,month,year,tot,dtype,progress,curves,starts)
+    rainyseason_stage_end(progress,'firstpass')
+    rainyseason_stage(progress,'secondpass')
+    need_on,need_de=rainyseason_rejected(first,tot,qc1)
+    second=rainyseason_secondpass(pprec,rm,startwet,jday,day,month,year,tot,npass,need_on,need_de,dtype,starts)
+    res=rainyseason_combine(first,second,tot,qc1,qc2)
+    rainyseason_stage_end(progress,'secondpass')
+    rainyseason_stage(progress,'durations')
+    res=rainyseason_durations(pprec,res,yr0,tot,mthres,dtype)
+    rainyseason_stage_end(progress,'durations')
+    if curves:
+       res['wscurve']=first['wscurve']
+       res['dscurve']=first['dscurve']
+    if cumulative:
+       res['cumbase'],res['cumprec']=rainyseason_cumulative(pprec,tot)
+    return res
+
+#------------------------------------------------------------------------
+#    Precipitation accumulated before day index t (missing data count as
+# zero): cumbase[:,t//tot]+cumprec[:,t], for t=0,...,time. cumbase
+# (float64) is the total before Jan 1st of each year of the record and
+# cumprec (float32) the total since that Jan 1st, so the single precision
+# part never holds more than one year of precipitation (its rounding stays
+# below ~1e-7 of an annual total) and the array is half the size of a
+# double precision cumulative sum
+#------------------------------------------------------------------------
+def rainyseason_cumulative(pprec,tot):
+    npts,ntot=pprec.shape
+    cumbase=np.zeros((npts,ntot//tot+1))
+    cumprec=np.zeros((npts,ntot+1),dtype=np.float32)
+    run=np.zeros((npts))
+    for y in range(0,ntot//tot+1):
+        t0=y*tot
+        t1=min(t0+tot,ntot+1)        # positions of the year y
+        cumbase[:,y]=run
+        if t0 < ntot:
+           cs=np.cumsum(np.nan_to_num(pprec[:,t0:min(t0+tot,ntot)],nan=0.),axis=1,dtype=np.float64)
+           cumprec[:,t0+1:t1]=cs[:,0:t1-t0-1]
+           run=run+cs[:,-1]
+    return cumbase, cumprec
+
+#------------------------------------------------------------------------
+#    Quality control: finds the outliers of a series of dates
+# jd  --> array (years) of dates [Day of Year]. Missing dates are NaN
+# fac --> dates further than fac x IQR from the median date are outliers
+# Returns the positions of the outliers (tuple, as numpy.where)
+#------------------------------------------------------------------------
+def rainyseason_qc(jd,tot,fac):
+    miss=np.where(np.isnan(jd[:]))
+    id=np.where(~np.isnan(jd[:]))
+    if len(id[0]) == 0:
+       return np.where(np.zeros(jd.shape,dtype=bool))
+# ---- Averagind dates using circular statistics
+    tmpx=np.cos(jd[:]*math.pi/183.)
+    tmpy=np.sin(jd[:]*math.pi/183.)
+    med=math.atan2(np.median(tmpy[id]),np.median(tmpx[id]))*183./math.pi
+    if med < 0.:
+       med=med+tot
+# ---- Converting dates close to beginning and end of the year
+    tmpc=jd[:]-med
+    if len(miss[0]) > 0.:
+       tmpc[miss]=0.
+    pos=np.where(tmpc[:] > float(tot)*0.5)
+    if len(pos[0]) > 0:
+       tmpc[pos]=tmpc[pos]-tot
+    neg=np.where(tmpc[:] < float(tot)*(-0.5))
+    if len(neg[0]) > 0:
+       tmpc[neg]=tmpc[neg]+tot
+# ---- Removing outliers (greater than fac x IQR)
+    iqr=np.percentile(tmpc[id],75)-np.percentile(tmpc[id],25)
+    return np.where(np.abs(tmpc[:]) > iqr*fac)
+
+#------------------------------------------------------------------------
+#    Day of Year (float, NaN for nodate) of an array of day indices
+#------------------------------------------------------------------------
+def rainyseason_doy(t,tot):
+    return np.where(t >= 0,np.mod(t,tot)+1.,np.nan)
+
+#------------------------------------------------------------------------
+#    First pass (Liebman & MArengo, 2001)
+#------------------------------------------------------------------------
+def rainyseason_firstpass(pprec,rm,startwet,jday,day,month,year,tot,dtype=np.float64,progress=None,curves=True,starts=None):
+    npts=len(rm)
+    nyrs=int(year.max()-year.min())+1
+    if starts is None:
+       starts=rainyseason_starts(jday)
+    first={}
+    for name in ['onset','demise']:
+        first[name]=np.full((nyrs,npts),nodate,dtype=np.int32)
+    if curves:
+       first['wscurve']=np.zeros((npts,nyrs,int(tot/2)),dtype=dtype)
+       first['dscurve']=np.zeros((npts,nyrs,int(tot/2)),dtype=dtype)
+#------------------------------------------------------------------------
+# The points with the same starting date share the windows of the kernel
+#------------------------------------------------------------------------
+    wet=np.where(rm > 0.)[0]
+    done=0
+    for sdate in np.unique(startwet[wet]):
+        grp=wet[startwet[wet] == sdate]
+        for name,curve,direction in [('onset','wscurve','forward'),('demise','dscurve','reverse')]:
+            tt=starts[direction].get(float(sdate),np.zeros((0),dtype=np.int64))
+            beg,sc=rainyseason_onset_batch(pprec,rm,grp,tt,tot,direction == 'reverse',dtype,curves)
+            rows=np.arange(0,len(tt))
+            if direction == 'reverse':
+               rows=nyrs-1-rows     # the demise is calculated backwards in time
+            pos=np.maximum(beg,0)
+            first[name][rows[:,np.newaxis],grp[np.newaxis,:]]=np.where(beg >= 0,(year[pos]-year[0])*tot+jday[pos]-1,nodate).T
+            if curves:
+               has=np.any(beg >= 0,axis=1)
+               first[curve][grp[has],0:len(tt),:]=sc[has]
+        done=done+len(grp)
+        rainyseason_step(progress,'firstpass',done,npts)
+    return first
+
+#------------------------------------------------------------------------
+#    Years that need the second pass: years (of points where the first
+# pass found dates) that are missing or were removed by the quality control.
+# Returns boolean arrays (years,points) for the onset and the demise
+#------------------------------------------------------------------------
+def rainyseason_rejected(first,tot,qc1):
+    need_on=np.zeros(first['onset'].shape,dtype=bool)
+    need_de=np.zeros(first['demise'].shape,dtype=bool)
+    for pt in range(0,need_on.shape[1]):
+        for name,need in [('onset',need_on),('demise',need_de)]:
+            wjd=rainyseason_doy(first[name][:,pt],tot)
+            if np.any(~np.isnan(wjd)):
+               wjd[rainyseason_qc(wjd,tot,qc1)]=np.nan
+               need[:,pt]=np.isnan(wjd)
+    return need_on, need_de
+
+#------------------------------------------------------------------------
+#    Second pass (Bombardi et al. 2017) for the (point, year) pairs that
+# need it. All pairs of the grid are calculated as one batch (see
+# rainyseason_B17_batch); the other years are left missing
+#------------------------------------------------------------------------
+def rainyseason_secondpass(pprec,rm,startwet,jday,day,month,year,tot,npass,need_on,need_de,dtype=np.float64,starts=None):
+    npts=len(rm)
+    nyrs=int(year.max()-year.min())+1
+    second={}
+    for name,need,reverse in [('onset',need_on,False),('demise',need_de,True)]:
+        second[name]=np.full((nyrs,npts),nodate,dtype=np.int32)
+        yts,pts=np.where(need)
+        if reverse:
+           wyt=nyrs-1-yts       # the demise is calculated backwards in time
+        else:
+           wyt=yts
+        second[name][yts,pts]=rainyseason_B17_batch(pprec,rm,startwet,pts,wyt,jday,tot,npass,reverse,dtype,starts=starts)
+    return second
+
+#------------------------------------------------------------------------
+#    Quality control: removing outliers of the first pass, replacing the
+# missing dates with the dates of the second pass and removing the
+# outliers of the second pass
+#------------------------------------------------------------------------
+def rainyseason_combine(first,second,tot,qc1,qc2):
+    res={}
+    for name in ['onset','demise']:
+        res[name]=np.full(first[name].shape,nodate,dtype=np.int32)
+        for pt in range(0,first[name].shape[1]):
+            wjd=rainyseason_doy(first[name][:,pt],tot)
+            if np.any(~np.isnan(wjd)):
+               res[name][:,pt]=first[name][:,pt]
+               res[name][rainyseason_qc(wjd,tot,qc1)[0],pt]=nodate
+               outl=np.where(res[name][:,pt] == nodate)[0]
+               if len(outl) > 0:
+                  res[name][outl,pt]=second[name][outl,pt]
+                  wjd=rainyseason_doy(res[name][:,pt],tot) #making sure to keep all the correct dates
+                  res[name][rainyseason_qc(wjd,tot,qc2)[0],pt]=nodate
+    return res
+
+#------------------------------------------------------------------------
+#    Masking points with too many missing years, rearranging the demise
+# years and calculating the duration of the wet and dry seasons and the
+# total precipitated during the wet and dry seasons. res is updated.
+# The durations are differences of day indices. A season is bounded by
+# the onset and the demise of the same year when they are in the right
+# order, otherwise by the date of the following year.
+#------------------------------------------------------------------------
+def rainyseason_durations(pprec,res,yr0,tot,mthres,dtype=np.float64):
+    nyrs,npts=res['onset'].shape
+#------------------------------------------------------------------------
+#    Masking regions where > 33% of the data are missing values 
+#------------------------------------------------------------------------
+    for name in ['onset','demise']:
+        mask=np.sum(res[name] == nodate,axis=0)/float(nyrs) > mthres
+        res[name][:,mask]=nodate
+# Rearranging years to account for retrospective calculation of demises
+    de=res['demise']
+    shift=((de[1,:] >= 0) & (de[1,:]//tot == 0)) | ((de[2,:] >= 0) & (de[2,:]//tot == 1))
+    de[0:nyrs-1,shift]=de[1:nyrs,shift]
+    de[nyrs-1,shift]=nodate
+    on=res['onset']
+# Dates of the following year (nodate for the last year)
+    on1=np.full((nyrs,npts),nodate,dtype=np.int32)
+    de1=np.full((nyrs,npts),nodate,dtype=np.int32)
+    on1[0:nyrs-1,:]=on[1:nyrs,:]
+    de1[0:nyrs-1,:]=de[1:nyrs,:]
+    both=(on >= 0) & (de >= 0)
+    same=both & (on//tot == de//tot)
+    ahead=both & (de//tot < on//tot)     # onset found in year+1
+    behind=both & (on//tot < de//tot)    # demise found in year+1
+#=======================================================================================
+#   Wet and dry seasons (beginning, end) of each year:
+#   the dry season happens during the same year: (demise, onset), wet season (onset, next demise)
+#   the wet season happens during the same year: (onset, demise), dry season (demise, next onset)
+#=======================================================================================
+    seasons=[('durwet','totwet',on,de,(same & (on < de)) | behind),
+             ('durwet','totwet',on,de1,(de1 >= 0) & ((same & (de < on)) | (ahead & (np.mod(on,tot) < np.mod(de1,tot))))),
+             ('durdry','totdry',de,on,(same & (de < on)) | ahead),
+             ('durdry','totdry',de,on1,(on1 >= 0) & ((same & (on < de)) | (behind & (np.mod(de,tot) < np.mod(on1,tot)))))]
+    for key in ['durwet','durdry','totwet','totdry']:
+        res[key]=np.full((nyrs,npts),np.nan,dtype=dtype)
+    for dur,total,beg,ned,sel in seasons:
+        res[dur][sel]=ned[sel]-beg[sel]
+        for yt,pt in zip(*np.where(sel)):
+# no (-1) because python doesn't use the last element anyway
+            res[total][yt,pt]=np.nansum(pprec[pt,beg[yt,pt]:ned[yt,pt]],dtype=np.float64)
+    return res
+#========================================================================
+#                             End of subroutine
+#========================================================================
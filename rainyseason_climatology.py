@@ -0,0 +1,183 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that calculate the climatological information needed by
+# the calculation of the characteristics of the rainy season
+# pprec   --> packed array of precipitation (points,time) [mm/day].
+#             Missing data are NaN
+# jday    --> an array of Julian days
+# tot     --> total number of points for one year of data (365)
+# dtype   --> numpy dtype of the results (numpy.float64 or numpy.float32)
+#
+# Returns:
+# rm       --> array (points) of the daily annual mean [mm/day]. It is set
+#              to zero for points with zero or more than one rainy season
+# startwet --> array (points) of the Julian day used as starting point (t0)
+#              for the calculation of the rainy and dry seasons
+#========================================================================
+import math
+import numpy as np
+#=======================================================================================
+"""
+Funtion that calculates the Fourier coefficients and the explained variance of the Nth
+first harmonics of a time series
+
+Input:
+   tseries: input time series
+   nmodes : number of harmonics to retain (N)
+   coefa  : Array with N (or 'nmodes') elements
+   coefb  : Array with N (or 'nmodes') elements
+   hvar   : Array with N (or 'nmodes') elements
+Output:
+   coefa: Array of A coefficients of the Nth first harmonics
+   coefb: Array of B coefficients of the Nth first harmonics
+   hvar : Array of explained variance of the Nth first harmonics
+"""
+def Harmonics(coeafa,coefb,hvar,tseries,nmodes):
+    mtot=len(tseries)               # retrieving the lenght of the time dimension
+    time=np.arange(1,mtot+1,1.)     # Just a an array of increasing numbers
+    tdata=np.array(tseries,dtype=np.float64) # Adjusting the mean annual cycle (double precision)
+    tdata[np.isnan(tdata)]=0.    # Padding missing values with zeros just to be safe
+    svar=sum((tdata[:]-np.mean(tdata))**2)/(mtot-1)
+    nm=nmodes
+    if 2*nm > mtot:
+       nm=mtot/2
+    coefa=np.zeros((nm))
+    coefb=np.zeros((nm))
+    hvar=np.zeros((nm))
+    for tt in range(0,nm):
+        Ak=np.sum(tdata[:]*np.cos(2.*math.pi*(tt+1)*time[:]/float(mtot)))
+        Bk=np.sum(tdata[:]*np.sin(2.*math.pi*(tt+1)*time[:]/float(mtot)))
+        coefa[tt]=Ak*2./float(mtot)
+        coefb[tt]=Bk*2./float(mtot)
+        hvar[tt]=mtot*(coefa[tt]**2+coefb[tt]**2)/(2.*(mtot-1)*svar)
+    return coefa,coefb,hvar
+
+def rainyseason_climatology(pprec,jday,tot,dtype=np.float64):
+    npts=pprec.shape[0]
+#    Calculating the daily annual mean [mm/day]
+#
+    rm=np.zeros((npts),dtype=dtype)
+    cnt=np.sum(~np.isnan(pprec),axis=1)   # removing missing data
+    id=np.where(cnt > 1)
+    rm[id]=np.nansum(pprec,axis=1,dtype=np.float64)[id]/cnt[id]
+
+#    This block will calculate the mean annual cycle for the whole time series. For
+#    climatologies of one or more periods of reference (e.g. 1981-2010) see
+#    rainyseason_climatology_windows below.
+
+#    calculating the mean annual cycle for each grid point
+    cycle=np.zeros((npts,tot),dtype=dtype)
+    for tt in range(0,tot):
+        id=np.where(jday[:] == jday[tt])
+        tmp=pprec[:,id[0]]
+        cnt=np.sum(~np.isnan(tmp),axis=1)
+        id2=np.where(cnt > 1)
+        cycle[id2[0],tt]=np.nansum(tmp,axis=1,dtype=np.float64)[id2]/cnt[id2]
+    tmp=None
+
+    rm,startwet=rainyseason_harmonics(rm,cycle,jday,tot,dtype)
+    return rm, startwet
+
+#========================================================================
+#  Subroutine that smooths the mean annual cycle, masks the points with
+# zero or more than one rainy season and finds the starting date
+# rm    --> array (points) of the daily annual mean [mm/day]
+# cycle --> array (points,tot) of the mean annual cycle [mm/day]
+#========================================================================
+def rainyseason_harmonics(rm,cycle,jday,tot,dtype=np.float64):
+    npts=cycle.shape[0]
+#    This block will calculate the smoothed mean annual cycle. This is anessential part of
+#    calculating anomalies (often overlooked).
+#
+#    For details, see: Bombardi RJ and Carvalho LMV (2017). Simple Practices in Climatological Analyses: A Review. Revista Brasileira de Meteorologia. 32 (3), 311-320
+#
+#    This block also calculates the explained variance of the first 3 harmonics of the
+#    mean annual cycle. This is used to mask regions with zero or multiple rainy seasons
+#
+    time=None
+    time=np.arange(1,tot+1,1.)
+    harm1=np.zeros((npts))
+    harmonic1=np.zeros((npts,tot),dtype=dtype)
+    harm2=np.zeros((npts))
+    harm3=np.zeros((npts))
+    smoothed=np.zeros((npts,tot),dtype=dtype)
+    for pt in range(0,npts):
+        coefa=np.zeros((3))
+        coefb=np.zeros((3))
+        hvar=np.zeros((3))
+        tseries=cycle[pt,:]
+        coefa,coefb,hvar=Harmonics(coefa,coefb,hvar,tseries,3)
+        harm1[pt]=hvar[0]
+        harm2[pt]=hvar[1]
+        harm3[pt]=hvar[2]
+        harmonic1[pt,:]=rm[pt]
+        harmonic1[pt,:]=harmonic1[pt,:]+coefa[0]*np.cos(2.*math.pi*time[:]/float(tot))+coefb[0]*np.sin(2.*math.pi*time[:]/float(tot))
+        smoothed[pt,:]=np.mean(cycle[pt,:],dtype=np.float64)
+        for pp in range(0,3):
+            smoothed[pt,:]=smoothed[pt,:]+coefa[pp]*np.cos(2.*math.pi*time[:]*(pp+1)/float(tot))+coefb[pp]*np.sin(2.*math.pi*time[:]*(pp+1)/float(tot))
+
+#    Removing regions with zero or more than one rainy season per year
+#
+    id=np.where(harm2 >= harm1)
+    rm[id]=0.
+    id=np.where(harm3 >= harm1)
+    rm[id]=0.
+
+#    Calculating the day [day of year] that will be used as starting point (t0) for
+#    the calculation of the rainy and dry seasons characteristics
+#
+    startwet=np.zeros((npts))
+    for pt in range(0,npts):
+        id=np.where(harmonic1[pt,:] == harmonic1[pt,:].min())
+        startwet[pt]=jday[id[0][0]]
+    return rm, startwet
+
+#========================================================================
+#  Subroutine that calculates the climatology for several reference
+# periods (e.g. sliding 30-year normals: 1961-1990, 1971-2000, ...)
+# year    --> an array of years
+# windows --> list of reference periods [(first year, last year), ...]
+#
+# Sums and counts of valid data are kept for each day of the year. When
+# moving from one reference period to the next only the years that leave
+# the period are subtracted and the years that enter it are added, so
+# each year of data is visited at most twice, whatever the number of
+# periods. Returns arrays rm and startwet with shape (windows,points).
+#========================================================================
+def rainyseason_climatology_windows(pprec,jday,year,tot,windows,dtype=np.float64):
+    npts=pprec.shape[0]
+    for y0,y1 in windows:
+        if y0 > y1 or y0 < year.min() or y1 > year.max():
+           raise ValueError('Reference period '+str(y0)+'-'+str(y1)+' is outside the data ('+str(int(year.min()))+'-'+str(int(year.max()))+')')
+    ssum=np.zeros((npts,tot))          # sums of valid data for each day of the year
+    scnt=np.zeros((npts,tot))          # number of valid data for each day of the year
+    def update(yy,sign):
+        id=np.where(year == yy)[0]
+        tmp=pprec[:,id]
+        ok=~np.isnan(tmp)
+        doy=jday[id].astype(int)-1     # Feb 29th was removed: days of a year are unique
+        ssum[:,doy]=ssum[:,doy]+sign*np.where(ok,tmp,0.)
+        scnt[:,doy]=scnt[:,doy]+sign*ok
+    rm=np.zeros((len(windows),npts),dtype=dtype)
+    startwet=np.zeros((len(windows),npts))
+    current=set()
+    order=sorted(range(0,len(windows)),key=lambda k: (windows[k][0],windows[k][1]))
+    for k in order:
+        years=set(range(int(windows[k][0]),int(windows[k][1])+1))
+        for yy in sorted(current-years):
+            update(yy,-1.)
+        for yy in sorted(years-current):
+            update(yy,1.)
+        current=years
+        cnt=np.sum(scnt,axis=1)
+        id=np.where(cnt > 1)
+        rmk=np.zeros((npts),dtype=dtype)
+        rmk[id]=np.sum(ssum,axis=1)[id]/cnt[id]
+        cycle=np.zeros((npts,tot),dtype=dtype)
+        id=np.where(scnt > 1)
+        cycle[id]=ssum[id]/scnt[id]
+        rm[k,:],startwet[k,:]=rainyseason_harmonics(rmk,cycle,jday,tot,dtype)
+    return rm, startwet
+#========================================================================
+#                             End of subroutine
+#========================================================================
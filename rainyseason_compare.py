@@ -0,0 +1,91 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutine that compares the characteristics of the rainy season
+# calculated with a test configuration (e.g. precision='f4') against a
+# reference calculated in double precision (precision='f8')
+# ref     --> dictionary of reference arrays {name: array}
+# new     --> dictionary of arrays to be checked {name: array}
+# missval --> value for missing values
+# dfrac   --> maximum fraction [0.,1.] of valid entries of a product that
+#             may differ from the reference
+# rtol    --> relative difference above which accumulated precipitation
+#             (totwet, totdry) is counted as different
+#
+# Tolerances of the single precision mode:
+#  The accumulated anomalies, the means and the totals are summed in
+#  double precision in both modes, so the only differences come from
+#  rounding the input and the anomalies to float32 (~1e-7 relative).
+#  Dates are integers and are expected to be identical except where two
+#  days of the accumulated anomaly curve tie to within that round-off.
+#  Durations follow the dates. Totals are expected to agree to rtol=1e-4
+#  wherever the dates that bound the season agree. A product passes when
+#  at most a fraction dfrac (default 0.01, i.e. 1%) of its valid entries
+#  differ by more than these tolerances.
+#
+# Command line use (compares two sets of output files):
+#  python rainyseason_compare.py path_f8/ path_f4/
+#========================================================================
+import sys
+import glob
+import os
+import numpy
+#------------------------------------------------------------------------
+# Products compared with a relative tolerance (all others must match)
+#------------------------------------------------------------------------
+totals=['totwet','totdry']
+def rainyseason_compare(ref,new,missval,dfrac=0.01,rtol=1.e-4):
+    report={}
+    ok=True
+    for name in ref.keys():
+        if name not in new:
+           continue
+        a=numpy.asarray(ref[name],dtype=numpy.float64)
+        b=numpy.asarray(new[name],dtype=numpy.float64)
+        va=(a != missval)
+        vb=(b != missval)
+        both=va & vb
+        nval=max(int(numpy.sum(va | vb)),1)
+        dif=numpy.zeros(a.shape)
+        dif[both]=numpy.abs(b[both]-a[both])
+        if name in totals:
+           dif[both]=dif[both]/numpy.maximum(numpy.abs(a[both]),1.)
+           diff=(va != vb) | (dif > rtol)
+        else:
+           diff=(va != vb) | (dif > 0.)
+        nbad=int(numpy.sum(diff))
+        report[name]={'valid':nval,'bad':nbad,'frac':nbad/float(nval),'maxdiff':float(dif.max()) if dif.size > 0 else 0.}
+        if nbad/float(nval) > dfrac:
+           ok=False
+    return ok, report
+#========================================================================
+#                             End of subroutine
+#========================================================================
+
+def read_outputs(path):
+    """
+    Reads all output files of a run (files ending in .nc in directory 'path')
+    and returns a dictionary {file:{variable:array}}
+    """
+    import netCDF4 as nc
+    out={}
+    for ff in sorted(glob.glob(os.path.join(path,'*.nc'))):
+        rootgrp=nc.Dataset(ff)
+        out[os.path.basename(ff)]={v:numpy.ma.filled(rootgrp.variables[v][:],-999.) for v in rootgrp.variables if rootgrp.variables[v].ndim == 3}
+        rootgrp.close()
+    return out
+
+if __name__ == "__main__":
+   ref=read_outputs(sys.argv[1])
+   new=read_outputs(sys.argv[2])
+   passed=True
+   for ff in ref.keys():
+       if ff not in new:
+          print(ff,': missing')
+          passed=False
+          continue
+       ok,report=rainyseason_compare(ref[ff],new[ff],-999.)
+       passed=passed and ok
+       for name in report.keys():
+           print(ff,name,report[name])
+   print('PASSED' if passed else 'FAILED')
+   sys.exit(0 if passed else 1)
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that read sub-daily precipitation (e.g. half-hourly or
+# 3-hourly satellite products) from a set of NetCDF files as daily
+# totals, without a daily copy of the data
+# filenames --> list of NetCDF files with the same grid, each one with a
+#               part of the record (time,lat,lon). They are sorted by time
+# bbox      --> region (see rainyseason_subset) or None for the whole globe
+# years     --> (first year, last year) or None for the whole period
+# minfrac   --> minimum fraction of valid samples of a day. Days with
+#               fewer valid samples are missing
+# scale     --> factor from the mean of the valid samples of a day to the
+#               daily total [mm]: the number of samples per day (default)
+#               for amounts per time step [mm], 24. for rates [mm/h]
+# shift     --> hours subtracted from the time stamps before they are
+#               assigned to days (e.g. the length of the time step when
+#               the time stamps mark the end of the accumulation)
+#
+# rainyseason_daily_subset returns a subset (see rainyseason_subset) of
+# the daily record: 'lat', 'lon', 'ilat', 'ilon' of the region, 'yr0'
+# and 'ntot' of the days from Jan 1st of the first year to the last day
+# with samples, and 'files', 'nper', 'minfrac', 'scale' for the daily
+# totals. rainyseason_read reads such a subset (or a tile of it, see
+# rainyseason_subset_tile) with rainyseason_daily_read: the time steps
+# are read in chunks of nchunk steps, in time order, and added to the
+# daily sums and counts of valid samples, so only one chunk of sub-daily
+# data is in memory next to the daily array. Each file is opened once per
+# tile; with a lock (see rainyseason_read) the lock is only held while a
+# file is opened or closed and while a chunk is read, so the sums of one
+# chunk overlap with the other threads of rainyseason_stream. Negative and masked values
+# are not valid. The days use the standard calendar, as
+# rainyseason_calendar.
+#========================================================================
+import contextlib
+import numpy as np
+import netCDF4 as nc
+from rainyseason_read import rainyseason_subset, rainyseason_slab
+def rainyseason_daily_subset(filenames,bbox=None,years=None,minfrac=0.5,scale=None,shift=0.,latname='lat',lonname='lon',timename='time'):
+    subset=rainyseason_subset(filenames[0],bbox,None,latname,lonname,timename,False)
+#------------------------------------------------------------------------
+# Day (days since 1970-01-01) of each time step of each file
+#------------------------------------------------------------------------
+    steps=[]
+    for filename in filenames:
+        rootgrp=nc.Dataset(filename,"r")
+        time=rootgrp.variables[timename]
+        calendar=getattr(time,'calendar','standard')
+        hours=np.asarray(nc.date2num(nc.num2date(time[:],time.units,calendar),'hours since 1970-01-01 00:00:00',calendar),dtype=np.float64)
+        rootgrp.close()
+        steps.append((hours[0] if len(hours) > 0 else np.inf,filename,hours))
+    steps.sort(key=lambda ss: ss[0])
+    allh=np.concatenate([hours for h0,filename,hours in steps])
+    if len(allh) < 2:
+       raise ValueError('Not enough time steps in '+str(filenames))
+    nper=int(round(24./np.median(np.diff(allh))))
+    def yearof(days):
+        return (np.datetime64('1970-01-01','D')+days.astype('timedelta64[D]')).astype('datetime64[Y]').astype(np.int64)+1970
+    days=np.floor((allh-shift)/24.).astype(np.int64)
+    if years is None:
+       years=(int(yearof(days).min()),int(yearof(days).max()))
+    first=int((np.datetime64(str(years[0])+'-01-01','D')-np.datetime64('1970-01-01','D')).astype(np.int64))
+    last=int((np.datetime64(str(years[1]+1)+'-01-01','D')-np.datetime64('1970-01-01','D')).astype(np.int64))-1
+#------------------------------------------------------------------------
+# Time steps of each file in the period, with their day in the record
+#------------------------------------------------------------------------
+    subset['files']=[]
+    lastday=-1
+    for h0,filename,hours in steps:
+        dd=np.floor((hours-shift)/24.).astype(np.int64)
+        it=np.where((dd >= first) & (dd <= last))[0]
+        if len(it) == 0:
+           continue
+        it=np.arange(it.min(),it.max()+1)
+        subset['files'].append((filename,slice(int(it[0]),int(it[-1])+1),dd[it]-first))
+        lastday=max(lastday,int(dd[it].max()-first))
+    if lastday < 0:
+       raise ValueError('No data of '+str(filenames)+' in the years '+str(years))
+    subset['yr0']=int(years[0])
+    subset['ntot']=lastday+1
+    subset['nper']=nper
+    subset['minfrac']=minfrac
+    subset['scale']=float(nper) if scale is None else float(scale)
+    return subset
+
+#========================================================================
+#  Subroutine that reads the daily totals (time,lat,lon) of a subset of
+# sub-daily files (see rainyseason_daily_subset). Missing days are NaN
+#========================================================================
+def rainyseason_daily_read(varname,member=None,dtype=np.float64,subset=None,nchunk=48,lock=None):
+    nl=len(subset['lat'])
+    nx=len(subset['lon'])
+    total=np.zeros((subset['ntot'],nl,nx))
+    count=np.zeros((subset['ntot'],nl,nx),dtype=np.int32)
+    guard=lock if lock is not None else contextlib.nullcontext()
+    for filename,itime,days in subset['files']:
+        with guard:
+             rootgrp=nc.Dataset(filename,"r")
+        try:
+            var=rootgrp.variables[varname]
+            for k0 in range(0,len(days),nchunk):
+                k1=min(k0+nchunk,len(days))
+                with guard:
+                     vals=rainyseason_slab(var,member,subset,slice(itime.start+k0,itime.start+k1))
+                vals=np.ma.filled(np.ma.asarray(vals,dtype=np.float64),np.nan)
+                ok=vals >= 0.
+                uniq,first=np.unique(days[k0:k1],return_index=True)     # the days of the steps are sorted
+                total[uniq]+=np.add.reduceat(np.where(ok,vals,0.),first,axis=0)
+                count[uniq]+=np.add.reduceat(ok.astype(np.int32),first,axis=0)
+        finally:
+            with guard:
+                 rootgrp.close()
+    with np.errstate(divide='ignore',invalid='ignore'):
+         daily=np.where(count >= subset['minfrac']*subset['nper'],total/count*subset['scale'],np.nan)
+    return daily.astype(dtype)
+#========================================================================
+#                             End of subroutine
+#========================================================================
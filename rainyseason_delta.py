@@ -0,0 +1,82 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines of the delta mode: only the grid points whose input series
+# changed since the previous run (e.g. a dataset reissued by its
+# provider for some regions or periods) are calculated again, and the
+# output files of the previous run are patched in place
+# pprec   --> packed array of precipitation (points,time) (see rainyseason_pack)
+# index   --> positions of the packed points in the flattened (lat,lon) grid
+# config  --> string with the settings of the run (see rainyseason_delta_config)
+#
+# The fingerprint of a point is a 64-bit hash (BLAKE2b) of its series in
+# double precision, with all missing data as the same NaN; points without
+# valid data have the fingerprint 0. The results of a point only depend
+# on its own series and on the settings of the run, so a point whose
+# fingerprint did not change keeps its results. The fingerprints of the
+# grid are saved with the outputs (fingerprint.prefix.years.nc), together
+# with the settings: a file from a run with other settings (period, grid,
+# tot, dper, npass, precision) is not used and everything is calculated
+# again. rainyseason_delta_points gives the grid points that changed:
+# points with a new fingerprint, new valid points and points that are no
+# longer valid (their results are removed from the output files).
+#========================================================================
+import os
+import hashlib
+import numpy as np
+from netCDF4 import Dataset
+def rainyseason_fingerprint(pprec):
+    fp=np.zeros((pprec.shape[0]),dtype=np.uint64)
+    for pt in range(0,pprec.shape[0]):
+        row=np.asarray(pprec[pt,:],dtype=np.float64)
+        row=np.where(np.isnan(row),np.nan,row)
+        fp[pt]=int.from_bytes(hashlib.blake2b(row.tobytes(),digest_size=8).digest(),'little')
+    fp[fp == 0]=1     # 0 is kept for the points without valid data
+    return fp
+
+def rainyseason_delta_config(yr0,ntot,lats,lons,tot,dper,npass,precision):
+    grid=hashlib.blake2b(np.asarray(lats,dtype=np.float64).tobytes()+np.asarray(lons,dtype=np.float64).tobytes(),digest_size=8).hexdigest()
+    return 'yr0='+str(yr0)+',ntot='+str(ntot)+',nlat='+str(len(lats))+',nlon='+str(len(lons))+',grid='+grid+ \
+           ',tot='+str(tot)+',dper='+str(dper)+',npass='+str(npass)+',precision='+str(precision)
+
+#========================================================================
+#  Subroutines that read and save the fingerprints of the grid (lat*lon).
+# rainyseason_delta_read returns None if the file does not exist or was
+# saved with other settings
+#========================================================================
+def rainyseason_delta_read(outfile,config):
+    if not os.path.exists(outfile):
+       return None
+    rootgrp=Dataset(outfile,"r")
+    if getattr(rootgrp,'config','') != config:
+       rootgrp.close()
+       return None
+    grid=np.asarray(rootgrp.variables['fingerprint'][:],dtype=np.uint64).ravel()
+    rootgrp.close()
+    return grid
+
+def rainyseason_delta_save(outfile,grid,config,lats,lons):
+    rootgrp=Dataset(outfile,"w",format="NETCDF4")
+    rootgrp.createDimension("lon",len(lons))
+    rootgrp.createDimension("lat",len(lats))
+    latitudes=rootgrp.createVariable("lat","f8",("lat",))
+    longitudes=rootgrp.createVariable("lon","f8",("lon",))
+    latitudes[:]=lats[:]
+    longitudes[:]=lons[:]
+    var=rootgrp.createVariable("fingerprint","u8",("lat","lon",),zlib=True)
+    var.long_name='Fingerprint of the input series (0: no valid data)'
+    var[:]=grid.reshape(len(lats),len(lons))
+    rootgrp.config=config
+    rootgrp.close()
+    return outfile
+
+#========================================================================
+#  Subroutine that compares the fingerprints of the grid with those of the
+# previous run. Returns the grid points that changed and the positions
+# (in the packed arrays) of the valid points that changed
+#========================================================================
+def rainyseason_delta_points(old,grid,index):
+    changed=old != grid
+    return np.where(changed)[0], np.where(changed[index])[0]
+#========================================================================
+#                             End of subroutine
+#========================================================================
@@ -14,6 +14,8 @@
 # precip --> a time series of precipitation anomalies (against mean annual daily)
 # npass  --> integer for the number of "passes" for the smoothing of the
 #            time series of accumulated precipitation anomalies
+# precip may be single precision (float32). The accumulated anomalies are
+# always summed in double precision (float64) to avoid round-off drift.
 #========================================================================
 import sys
 import math
@@ -42,7 +44,7 @@ def rainyseason_onset(nyrs,ytot,jday,day,month,year,jstart,precip,sjday,sday,smo
               ned=mtot-1
               ned2=ned-beg
            sseries[:]=0.
-           sseries[0:ned2]=numpy.cumsum(precip[beg:beg+ned2])
+           sseries[0:ned2]=numpy.cumsum(precip[beg:beg+ned2],dtype=numpy.float64)
            curve[yt,:]=sseries[:]
 #-------------------------------------------------------------------------
 # Calculating onset and demise of the rainy season
@@ -0,0 +1,60 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutine that calculates the beginning (or end) dates of the rainy
+# season of a group of points with the method of Liebmann and Marengo
+# (2001). It gives the same dates and curves as rainyseason_onset and
+# rainyseason_demise, for all the years of the points at once.
+# pprec    --> packed array of precipitation (points,time) [mm/day].
+#              Missing data are NaN and count as zero precipitation
+# rm       --> array (points) of the daily annual mean [mm/day]
+# pts      --> array of the points of the group. All the points of the
+#              group have the same starting date
+# first    --> array of the first days of the windows (see rainyseason_starts):
+#              positions of the starting date in the (reversed for the
+#              demise) time series
+# tot      --> total number of points for one year of data (365)
+# reverse  --> False for the onset, True for the demise (the time series
+#              is reversed)
+# dtype    --> numpy dtype of the anomalies and of the curves
+#
+# The windows of the group are extracted as one array (points,windows,
+# days), in blocks of nblock points, grouped by the length of the window
+# (only the last window of the series is shorter). Returns the array
+# (points,windows) of the day indices of the dates (position in the
+# forward time series, -1 where no date was found) and, with curves=True,
+# the array (points,windows,tot/2) of accumulated anomalies (windows of
+# the reversed time series for the demise, as in rainyseason_demise).
+#========================================================================
+import numpy as np
+def rainyseason_onset_batch(pprec,rm,pts,first,tot,reverse=False,dtype=np.float64,curves=True,nblock=256):
+    mtot=pprec.shape[1]
+    half=int(tot/2)
+    first=np.asarray(first,dtype=np.int64)
+    out=np.full((len(pts),len(first)),-1,dtype=np.int32)
+    curve=np.zeros((len(pts),len(first),half),dtype=dtype) if curves else None
+    ned=np.where(first+half <= mtot-1,first+half,mtot-1)
+    nlen=ned-first
+    for n in np.unique(nlen):
+        win=np.where(nlen == n)[0]
+        for b0 in range(0,len(pts),nblock):
+            grp=pts[b0:b0+nblock]
+            days=first[win,np.newaxis]+np.arange(0,n)
+            if reverse:
+               days=mtot-1-days
+            ap=np.nan_to_num(pprec[grp[:,np.newaxis,np.newaxis],days[np.newaxis,:,:]],nan=0.)-rm[grp][:,np.newaxis,np.newaxis]
+            sseries=np.cumsum(ap,axis=2,dtype=np.float64)
+            if curves:
+               curve[b0:b0+len(grp),win[:,np.newaxis],np.arange(0,n)]=sseries
+#------------------------------------------------------------------------
+# Day after the minimum of the accumulated anomalies
+#------------------------------------------------------------------------
+            beg=np.argmin(sseries,axis=2)+first[win]+1
+            found=beg < ned[win]
+            if reverse:
+               beg=mtot-1-beg
+            blk=out[b0:b0+len(grp),:]
+            blk[:,win]=np.where(found,beg,-1)
+    return out, curve
+#========================================================================
+#                             End of subroutine
+#========================================================================
@@ -0,0 +1,181 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that save the characteristics of the rainy and dry seasons
+# as NetCDF files
+# pathout --> path of the directory to where the output will be saved
+# prefix  --> name of the dataset used in the name of the output files
+# lats    --> array with latitude values
+# lons    --> array with longitude values
+# yr0     --> first year of data
+# nyrs    --> number of years of the results (the last two years are not saved)
+# missval --> value for missing values
+# members --> list of names of the datasets (or ensemble members) of a batch
+#             run. The files get a "member" dimension. None for a single run
+# dimname --> name of the extra dimension (e.g. "member" or "normal")
+# res     --> dictionary of packed results (see rainyseason_characteristics)
+# index   --> positions of the packed points in the flattened (lat,lon) grid
+# member  --> position of the results along the extra dimension
+# tile    --> (lat0,lat1,lon0,lon1) of the results (see rainyseason_tiles).
+#             All points must fall in the tile. None writes the whole grid
+# cal     --> calendar (day, month, year, jday) of the calculation (see
+#             rainyseason_calendar). The dates of the results are day
+#             indices into it (see rainyseason_characteristics)
+#
+# rainyseason_create creates the (empty) files and returns their names
+# (rainyseason_files). rainyseason_write scatters the packed results of
+# one run (or member) to the grid and writes them to the files.
+# rainyseason_patch only rewrites the grid points in points (positions in
+# the flattened grid) of existing files: the points of index get their
+# results and the other points are set to missval. The files are read
+# and written one latitude at a time, only over the longitudes of the
+# points (see rainyseason_delta). Missing results (NaN) are
+# saved as missval. rainyseason_field gives the array of one variable of
+# the products: the Day of Year, day, month and year of the dates are
+# looked up in the calendar one variable at a time.
+#========================================================================
+import numpy
+from netCDF4 import Dataset
+from rainyseason_pack import rainyseason_unpack
+#------------------------------------------------------------------------
+# Output files: (name, [(variable, result, long name), ...])
+#------------------------------------------------------------------------
+products=[("onset.wet.season",[("DOY","onset_jday",'Wet season onset [Day of Year]'),
+                               ("day","onset_day",'Wet season onset [Day of the month]'),
+                               ("month","onset_month",'Wet season onset month'),
+                               ("year","onset_year",'Wet season onset year')]),
+          ("demise.wet.season",[("DOY","demise_jday",'Wet season demise [Day of Year]'),
+                                ("day","demise_day",'Wet season demise [Day of the month]'),
+                                ("month","demise_month",'Wet season demise month'),
+                                ("year","demise_year",'Wet season demise year')]),
+          ("total.precip.wet.season",[("totwet","totwet",'Total precipiation during the wet season [mm]')]),
+          ("total.precip.dry.season",[("totdry","totdry",'Total precipitation during the dry season [mm]')]),
+          ("duration.wet.season",[("durwet","durwet",'Duration of the wet weson [day]')]),
+          ("duration.dry.season",[("durdry","durdry",'Duration of the dry season [day]')])]
+
+def rainyseason_files(pathout,prefix,yr0,nyrs):
+    return [pathout+name+"."+prefix+"."+str(int(yr0))+"-"+str(int(yr0)+nyrs-3)+".nc" for name,variables in products]
+
+def rainyseason_create(pathout,prefix,lats,lons,yr0,nyrs,missval,members=None,dimname="member"):
+    files=[]
+    for outfile,(name,variables) in zip(rainyseason_files(pathout,prefix,yr0,nyrs),products):
+        rootgrp = Dataset(outfile, "w", format="NETCDF4")
+        # Creating dimensions
+        dims=("time","lat","lon",)
+        if members is not None:
+           rootgrp.createDimension(dimname,len(members))
+           dims=(dimname,)+dims
+        rootgrp.createDimension("lon", len(lons))
+        rootgrp.createDimension("lat", len(lats))
+        rootgrp.createDimension("time",nyrs-2)
+        #Creating coordinates
+        times = rootgrp.createVariable("time","i4",("time",))
+        latitudes = rootgrp.createVariable("lat","f8",("lat",))
+        longitudes = rootgrp.createVariable("lon","f8",("lon",))
+        # Filling coordinates
+        longitudes.units='degrees_east'
+        longitudes.long_name='Longitude'
+        longitudes[:]=lons[:]
+        latitudes.units='degrees_north'
+        latitudes.long_name='Latitude'
+        latitudes[:]=lats[:]
+        times.long_name='Time'
+        times.units='years since '+str(int(yr0))+'-01-01 00:00'
+        times[:]=numpy.arange(0,nyrs-2,1)
+        if members is not None:
+           mems = rootgrp.createVariable(dimname,"i4",(dimname,))
+           mems.long_name={"member":'Dataset or ensemble member',"normal":'Reference period of the climatology'}.get(dimname,dimname)
+           mems.members=', '.join([str(mm) for mm in members])
+           mems[:]=numpy.arange(0,len(members),1)
+        # Creating variables
+        for vname,key,long_name in variables:
+            var = rootgrp.createVariable(vname,"f4",dims,fill_value=missval)
+            var.long_name = long_name
+        rootgrp.close()
+        files.append(outfile)
+    return files
+
+def rainyseason_field(res,key,cal):
+    if key in res:
+       return res[key]
+    name,dd=key.rsplit('_',1)
+    day,month,year,jday=cal
+    table={'jday':jday,'day':day,'month':month,'year':year}[dd]
+    t=res[name]
+    data=numpy.full(t.shape,numpy.nan)
+    data[t >= 0]=table[t[t >= 0]]
+    return data
+
+def rainyseason_write(files,res,index,nlat,nlon,nyrs,missval,cal,member=None,tile=None):
+    if tile is None:
+       tile=(0,nlat,0,nlon)
+    i0,i1,j0,j1=tile
+    local=(index//nlon-i0)*(j1-j0)+(index % nlon-j0)
+    for outfile,(name,variables) in zip(files,products):
+        rootgrp = Dataset(outfile, "a")
+        for vname,key,long_name in variables:
+            data=rainyseason_unpack(rainyseason_field(res,key,cal)[0:nyrs-2,:],local,i1-i0,j1-j0,numpy.nan)
+            data[numpy.isnan(data)]=missval
+            if member is None:
+               rootgrp.variables[vname][:,i0:i1,j0:j1]=data
+            else:
+               rootgrp.variables[vname][member,:,i0:i1,j0:j1]=data
+        rootgrp.close()
+
+def rainyseason_patch(files,res,index,points,nlat,nlon,nyrs,missval,cal):
+    pos=numpy.full((nlat*nlon),-1,dtype=numpy.int64)
+    pos[index]=numpy.arange(0,len(index))
+    rows=points//nlon
+    for outfile,(name,variables) in zip(files,products):
+        rootgrp = Dataset(outfile, "a")
+        for vname,key,long_name in variables:
+            values=rainyseason_field(res,key,cal)[0:nyrs-2,:]
+            var=rootgrp.variables[vname]
+            for i in numpy.unique(rows):
+                cols=points[rows == i] % nlon
+                j0,j1=cols.min(),cols.max()+1
+                data=numpy.ma.filled(var[:,i,j0:j1],missval)
+                k=pos[i*nlon+cols]
+                new=numpy.full((nyrs-2,len(cols)),numpy.nan)
+                new[:,k >= 0]=values[:,k[k >= 0]]
+                new[numpy.isnan(new)]=missval
+                data[:,cols-j0]=new
+                var[:,i,j0:j1]=data
+        rootgrp.close()
+
+#========================================================================
+#  Subroutine that saves packed fields that are not yearly results (e.g.
+# percentiles of the bootstrap or climatological summaries)
+# outfile --> name of the output file
+# fields  --> list of (variable, long name, packed array (dim,points) or (points))
+# dimname --> name of the leading dimension of the fields (None for 2D fields)
+# coords  --> values of the leading dimension
+# NaN values are saved as missing values.
+#========================================================================
+def rainyseason_fields(outfile,fields,index,nlat,nlon,lats,lons,missval,dimname=None,coords=None):
+    rootgrp = Dataset(outfile, "w", format="NETCDF4")
+    dims=("lat","lon",)
+    if dimname is not None:
+       rootgrp.createDimension(dimname,len(coords))
+       dims=(dimname,)+dims
+       cvar = rootgrp.createVariable(dimname,"f8",(dimname,))
+       cvar[:]=numpy.asarray(coords,dtype=numpy.float64)
+    rootgrp.createDimension("lon", len(lons))
+    rootgrp.createDimension("lat", len(lats))
+    latitudes = rootgrp.createVariable("lat","f8",("lat",))
+    longitudes = rootgrp.createVariable("lon","f8",("lon",))
+    longitudes.units='degrees_east'
+    longitudes.long_name='Longitude'
+    longitudes[:]=lons[:]
+    latitudes.units='degrees_north'
+    latitudes.long_name='Latitude'
+    latitudes[:]=lats[:]
+    for vname,long_name,values in fields:
+        data=rainyseason_unpack(numpy.asarray(values,dtype=numpy.float32),index,nlat,nlon,missval)
+        data[numpy.isnan(data)]=missval
+        var = rootgrp.createVariable(vname,"f4",dims,fill_value=missval)
+        var.long_name = long_name
+        var[:]=data
+    rootgrp.close()
+#========================================================================
+#                             End of subroutine
+#========================================================================
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that gather the valid grid points of a gridded dataset
+# into a packed array, format the packed array (Feb 29th and missing
+# data) and scatter packed results back onto the grid
+# prec   --> array of precipitation (time,lat,lon)
+# mask   --> array (lat,lon). Grid points where mask > 0 are packed
+# values --> array of packed results (...,npoints)
+# index  --> array of the positions of the packed points in the
+#            flattened (lat,lon) grid
+# nlat   --> number of points in latitude
+# nlon   --> number of points in longitude
+# fill   --> value given to the grid points that were not packed
+# leap   --> indices of Feb 29th in the time series (see rainyseason_calendar)
+# dper   --> minimum percentage [0.,100.] of missing data that can be tolerated
+# tile   --> (number of latitudes, number of longitudes) of the tiles
+#
+# Missing data are NaN inside the calculation. Negative values (e.g. the
+# missing value of the dataset) are replaced by NaN when the grid points
+# are packed, so missing values are converted only once.
+# rainyseason_valid returns the mask (lat,lon) of the grid points with at
+# least one valid value (not NaN and not negative).
+# The packed array has shape (npoints,time) so that the time series of
+# each grid point is contiguous in memory.
+# rainyseason_tiles returns the tiles (lat0,lat1,lon0,lon1) that cover the
+# grid and rainyseason_tile_points the positions of the packed points that
+# fall in one tile.
+#========================================================================
+import numpy
+def rainyseason_pack(prec,mask):
+    ntime=prec.shape[0]
+    index=numpy.where(numpy.ravel(mask) > 0.)[0]
+    packed=numpy.ascontiguousarray(numpy.take(prec.reshape(ntime,-1),index,axis=1).T)
+    packed[~(packed >= 0.)]=numpy.nan
+    return packed, index
+
+def rainyseason_valid(prec):
+    nlat=prec.shape[1]
+    valid=numpy.zeros(prec.shape[1:])
+    for it in range(0,nlat):
+        valid[it,:]=numpy.any(prec[:,it,:] >= 0.,axis=0)
+    return valid
+
+def rainyseason_unpack(values,index,nlat,nlon,fill=0.):
+    values=numpy.asarray(values)
+    grid=numpy.full(values.shape[0:-1]+(nlat*nlon,),fill,dtype=values.dtype)
+    grid[...,index]=values
+    return grid.reshape(values.shape[0:-1]+(nlat,nlon))
+
+def rainyseason_tiles(nlat,nlon,tile):
+    tiles=[]
+    for i0 in range(0,nlat,tile[0]):
+        for j0 in range(0,nlon,tile[1]):
+            tiles.append((i0,min(i0+tile[0],nlat),j0,min(j0+tile[1],nlon)))
+    return tiles
+
+def rainyseason_tile_points(index,nlon,tile):
+    ilat=index//nlon
+    ilon=index % nlon
+    return numpy.where((ilat >= tile[0]) & (ilat < tile[1]) & (ilon >= tile[2]) & (ilon < tile[3]))[0]
+
+def rainyseason_format(packed,index,leap,dper):
+#------------------------------------------------------------------------
+# Removing Feb 29th. This block averages Feb 28 and 29 in leap years.
+#------------------------------------------------------------------------
+    packed[:,leap-1]=0.5*(packed[:,leap]+packed[:,leap-1])
+    packed=numpy.delete(packed,leap,axis=1)
+    ntot=packed.shape[1]
+#------------------------------------------------------------------------
+# Masking Missing values. Sometimes datasets have significant amounts of
+# missing data (e.g. land only data, ocean only data, complex topography).
+# In such cases it is sometimes useful to mask those regions. Masking can
+# prevent code errors and improve code efficiency. The minimum percentage
+# of missing data allowed is determined by namelist variable "dper". If a
+# grid pint has more missing data then the minimum percentage, that grid
+# point will be masked at all times.
+#------------------------------------------------------------------------
+    thres=(ntot-0.01*dper*ntot) # minimum threshold of non-missing data
+    mask=numpy.sum(~numpy.isnan(packed),axis=1) >= thres
+    return packed[mask,:], index[mask]
+#========================================================================
+#                             End of subroutine
+#========================================================================
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that run the whole calculation of the characteristics of
+# the rainy and dry seasons for one dataset (or one ensemble member)
+# pprec    --> packed array of precipitation (points,time), including
+#              Feb 29th. Missing data are NaN (see rainyseason_pack)
+# index    --> positions of the packed points in the flattened grid
+# day, month, year, jday, leap --> calendar (see rainyseason_calendar)
+# yr0      --> first year of data
+# tot      --> total number of points for one year of data (365)
+# dper     --> minimum percentage [0.,100.] of missing data that can be tolerated
+# npass    --> number of passes of the smoothing (Bombardi et al. 2017)
+# dtype    --> numpy dtype used for the calculation
+# progress --> progress of the job (see rainyseason_progress), or None
+# curves   --> True to keep the curves of accumulated anomalies (wscurve,
+#              dscurve) in the results (see rainyseason_characteristics)
+# cumulative --> True to add the accumulated precipitation (cumbase, cumprec) to the
+#              results (see rainyseason_seasonindex)
+# starts   --> table of the first days of the windows of the kernels (see
+#              rainyseason_starts). It only depends on the calendar, so it can
+#              be created once and shared by all tiles; created if None
+#
+# Returns the positions of the points that have results (index) and the
+# dictionary of packed results (see rainyseason_characteristics)
+#========================================================================
+import numpy as np
+from rainyseason_pack import rainyseason_pack, rainyseason_valid, rainyseason_format
+from rainyseason_climatology import rainyseason_climatology, rainyseason_climatology_windows
+from rainyseason_characteristics import rainyseason_characteristics
+from rainyseason_calendar import rainyseason_starts
+from rainyseason_read import rainyseason_read
+from rainyseason_bootstrap import rainyseason_bootstrap
+from rainyseason_output import rainyseason_field
+from rainyseason_progress import rainyseason_tile, rainyseason_stage, rainyseason_stage_end
+def rainyseason_pipeline(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,dtype=np.float64,progress=None,curves=True,cumulative=False,starts=None):
+    rainyseason_tile(progress,len(index))
+    rainyseason_stage(progress,'format')
+    pprec,index=rainyseason_format(pprec,index,leap,dper)
+    rainyseason_stage_end(progress,'format')
+#------------------------------------------------------------------------
+# Climatology: daily annual mean, harmonics and starting date
+#------------------------------------------------------------------------
+    rainyseason_stage(progress,'climatology')
+    rm,startwet=rainyseason_climatology(pprec,jday,tot,dtype)
+    rainyseason_stage_end(progress,'climatology')
+    return rainyseason_seasons(pprec,index,rm,startwet,day,month,year,jday,yr0,tot,npass,dtype,progress,curves,cumulative,starts)
+
+#========================================================================
+#  Subroutine that calculates the characteristics of the rainy and dry
+# seasons from a formatted packed array and its climatology
+# rm, startwet --> climatology of the packed points (see rainyseason_climatology)
+#========================================================================
+def rainyseason_seasons(pprec,index,rm,startwet,day,month,year,jday,yr0,tot,npass,dtype=np.float64,progress=None,curves=True,cumulative=False,starts=None):
+#------------------------------------------------------------------------
+# Repacking: only the points that have a single rainy season per year are kept
+#------------------------------------------------------------------------
+    id=np.where(rm > 0.)
+    pprec=pprec[id[0],:]
+    index=index[id]
+    rm=rm[id]
+    startwet=startwet[id]
+    res=rainyseason_characteristics(pprec,rm,startwet,jday,day,month,year,yr0,tot,npass,dtype,progress=progress,curves=curves,cumulative=cumulative,starts=starts)
+    return index, res
+
+#========================================================================
+#  Subroutine that calculates the characteristics of the rainy and dry
+# seasons relative to several reference periods (climatological normals)
+# normals --> list of reference periods [(first year, last year), ...]
+#
+# The climatologies of all periods are calculated incrementally (see
+# rainyseason_climatology_windows). Yields (k, index, res) for each
+# reference period k, in the order given in normals.
+#========================================================================
+def rainyseason_normals(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,normals,dtype=np.float64,progress=None,curves=True):
+    rainyseason_tile(progress,len(index))
+    pprec,index=rainyseason_format(pprec,index,leap,dper)
+    rm,startwet=rainyseason_climatology_windows(pprec,jday,year,tot,normals,dtype)
+    starts=rainyseason_starts(jday)
+    for k in range(0,len(normals)):
+        idx,res=rainyseason_seasons(pprec,index,rm[k,:],startwet[k,:],day,month,year,jday,yr0,tot,npass,dtype,progress,curves,starts=starts)
+        yield k, idx, res
+
+#========================================================================
+#  Subroutine that calculates the characteristics of the rainy and dry
+# seasons and their uncertainty (see rainyseason_bootstrap)
+# nboot   --> number of bootstrap resamples
+# offsets --> list of perturbations [days] of the starting date. The rainy
+#             season is calculated once for each perturbation, reusing the
+#             packed series in memory, and each resampled year takes the
+#             dates of a randomly chosen perturbation. [0] for no perturbation
+# perc    --> list of percentiles [0.,100.]
+# seed    --> seed of the random number generator
+#
+# Returns index, res (unperturbed results) and the dictionary of
+# percentiles (percentiles,points) of the bootstrap
+#========================================================================
+def rainyseason_uncertainty(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,nboot,offsets=[0],perc=[2.5,50.,97.5],seed=0,dtype=np.float64,progress=None,curves=True):
+    rainyseason_tile(progress,len(index))
+    pprec,index=rainyseason_format(pprec,index,leap,dper)
+    rm,startwet=rainyseason_climatology(pprec,jday,tot,dtype)
+    nyrs=int(year.max()-year.min())+1
+    starts=rainyseason_starts(jday)
+    samples={}
+    for off in offsets:
+        sdate=np.mod(startwet-1.+off,float(tot))+1.
+        idx,rk=rainyseason_seasons(pprec,index,rm,sdate,day,month,year,jday,yr0,tot,npass,dtype,progress,curves,starts=starts)
+        if off == 0:
+           res=rk
+        for key in ['onset_jday','demise_jday','durwet']:
+            samples.setdefault(key,[]).append(rainyseason_field(rk,key,(day,month,year,jday))[0:nyrs-2,:])
+    if 0 not in offsets:
+       idx,res=rainyseason_seasons(pprec,index,rm,startwet,day,month,year,jday,yr0,tot,npass,dtype,progress,curves,starts=starts)
+    boot=rainyseason_bootstrap(np.array(samples['onset_jday']),np.array(samples['demise_jday']),np.array(samples['durwet']),tot,nboot,perc,seed)
+    return idx, res, boot
+
+#========================================================================
+#  Subroutine used by the batch mode. It reads one dataset (or one member
+# of an ensemble) and runs the whole calculation. The curves of
+# accumulated anomalies are not calculated.
+# filename --> name of the NetCDF file
+# member   --> index of the ensemble member (None for no ensemble dimension)
+# varname  --> name of the precipitation variable
+# subset   --> region and period to be read (see rainyseason_subset)
+#========================================================================
+def rainyseason_member(filename,member,varname,day,month,year,jday,leap,yr0,tot,dper,npass,dtype=np.float64,subset=None):
+    prec=rainyseason_read(filename,varname,member,dtype,subset)
+    pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+    prec=None
+    index,res=rainyseason_pipeline(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,dtype,curves=False)
+    return index, res
+#========================================================================
+#                             End of subroutine
+#========================================================================
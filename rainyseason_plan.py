@@ -0,0 +1,225 @@
+#!/usr/bin/python
+#========================================================================
+#  Memory planner: estimates the peak memory of each stage of the
+# calculation from the size of the input only (no data are read) and
+# chooses the precision, the tiles, the number of workers and whether the
+# curves of accumulated anomalies (wscurve, dscurve) are calculated so
+# that the job fits in a memory budget
+# ntot     --> number of days of the input (including Feb 29th)
+# nlat     --> number of latitudes
+# nlon     --> number of longitudes
+# tot      --> total number of points for one year of data (365)
+# itemsize --> bytes per value of the calculation (8 for 'f8', 4 for 'f4')
+# fvalid   --> fraction of grid points with valid data (1. when unknown)
+# mode     --> 'grid'  : the whole grid is calculated by the main process
+#              'tiles' : the grid is calculated in tiles (backend='zarr')
+#              'batch' : each member is read and calculated by one worker
+#              'stream': the tiles are read from a file, calculated and
+#                        saved one at a time (see rainyseason_stream)
+# tile     --> (number of latitudes, number of longitudes) of the tiles
+# nworkers --> number of processes
+# curves   --> True if wscurve and dscurve are calculated (mode grid)
+# fileitem --> bytes per value of the variable in the NetCDF file (None if
+#              the input is not read with rainyseason_read)
+# prefetch --> number of tiles that can wait in each queue (mode stream)
+# frej     --> fraction of (point, year) pairs that need the second pass
+#              (about 0.1 for gridded datasets, up to 1 with many missing
+#              years). It sets the size of the blocks of the second pass
+#
+# The estimates follow the arrays that are alive at the same time in each
+# stage: the input (time,lat,lon), the packed array (points,time), its
+# formatted copy without Feb 29th, the temporaries of the climatology, the
+# dates of the first pass (2 int32 arrays (years,points) of day indices),
+# the curves (2 arrays (points,years,tot/2), as large as the packed array),
+# the blocks of the second pass (see rainyseason_B17_batch), the results
+# (2 int32 arrays of dates and 4 arrays (years,points)) and the grids of
+# rainyseason_write (with one date variable looked up at a time). In mode
+# stream, prefetch packed tiles and prefetch results wait in the queues
+# while the reader reads the next tile and the writer saves a tile, at the
+# same time as the calculation of the current tile. They are upper
+# bounds of the arrays of numpy; the memory of the interpreter and of the
+# libraries (about 100-200 MB per process) is not included.
+#========================================================================
+import sys
+import math
+GB=1024.**3
+def rainyseason_memory(ntot,nlat,nlon,tot=365,itemsize=8,fvalid=1.,mode='grid',tile=None,nworkers=1,curves=True,fileitem=None,frej=0.15,nblock=4096,prefetch=2):
+    nyrs=int(ntot/365.2425)+1
+    ncell=nlat*nlon
+    npts=int(math.ceil(fvalid*ncell))
+    grid=float(ntot)*ncell
+    if fileitem is None:
+       read=grid*itemsize
+    else:
+       read=grid*(fileitem+1+2*itemsize)
+    packed=float(npts)*ntot*itemsize
+    pack=grid*itemsize+float(npts)*ntot*(2*itemsize+1)
+    if mode == 'tiles':
+       ntile=int(math.ceil(fvalid*min(tile[0],nlat)*min(tile[1],nlon)))
+       stages=rainyseason_memory_pipeline(ntile,ntot,nyrs,tot,itemsize,curves,frej,nblock)
+       if nworkers > 1:
+          base=2.*packed
+          workers=min(nworkers,int(math.ceil(float(ncell)/(tile[0]*tile[1]))))
+          out=[('read',read),('pack',pack)]
+          out=out+[(name,base+workers*(float(ntile)*ntot*itemsize+mm)) for name,mm in stages]
+       else:
+          out=[('read',read),('pack',pack)]
+          out=out+[(name,packed+float(ntile)*ntot*itemsize+mm) for name,mm in stages]
+    elif mode == 'stream':
+       cells=min(tile[0],nlat)*min(tile[1],nlon)
+       ntile=int(math.ceil(fvalid*cells))
+       tgrid=float(ntot)*cells
+       if fileitem is None:
+          tread=tgrid*itemsize
+       else:
+          tread=tgrid*(fileitem+1+2*itemsize)
+       tpacked=float(ntile)*ntot*itemsize
+       tpack=tgrid*itemsize+float(ntile)*ntot*(2*itemsize+1)
+       tres=nyrs*ntile*(8.+4.*itemsize)
+       queued=prefetch*(tpacked+tres)
+       busy=max(tread,tpack)+tres+2.*nyrs*cells*8     # reader and writer at work
+       stages=rainyseason_memory_pipeline(ntile,ntot,nyrs,tot,itemsize,False,frej,nblock)
+       out=[('read',queued+tread),('pack',queued+tpack)]
+       out=out+[(name,queued+busy+tpacked+mm) for name,mm in stages]
+    elif mode == 'batch':
+       stages=rainyseason_memory_pipeline(npts,ntot,nyrs,tot,itemsize,False,frej,nblock)
+       member=[('read',read),('pack',pack)]+[(name,packed+mm) for name,mm in stages]
+       out=[(name,nworkers*mm+nyrs*npts*(8.+4.*itemsize)+2.*nyrs*ncell*8) for name,mm in member]
+    else:
+       stages=rainyseason_memory_pipeline(npts,ntot,nyrs,tot,itemsize,curves,frej,nblock)
+       out=[('read',read),('pack',pack)]+[(name,packed+mm) for name,mm in stages]
+       res=nyrs*npts*(8.+4.*itemsize+8.)
+       if curves:
+          res=res+2.*npts*nyrs*int(tot/2)*itemsize
+       out.append(('write',res+2.*nyrs*ncell*8))
+    return out
+
+#------------------------------------------------------------------------
+# Memory [bytes] used by rainyseason_pipeline for n points, besides its
+# input (the packed array of the caller)
+#------------------------------------------------------------------------
+def rainyseason_memory_pipeline(n,ntot,nyrs,tot,itemsize,curves,frej,nblock):
+    n=float(n)
+    formatted=n*ntot*itemsize
+    first=8.*nyrs*n
+    if curves:
+       first=first+2.*n*nyrs*int(tot/2)*itemsize
+    block=min(nblock,math.ceil(2.*frej*nyrs*n))*tot*(6*8+itemsize)
+    res=nyrs*n*(8.+4.*itemsize)
+    return [('format',2.*formatted+n*ntot),
+            ('climatology',formatted+n*ntot*(1+itemsize)+n*(tot+nyrs)*itemsize),
+            ('firstpass',formatted+first),
+            ('secondpass',formatted+first+2.*nyrs*n+5.*nyrs*n*8+8.*nyrs*n+block+res),
+            ('durations',formatted+first+res+6.*nyrs*n*8)]
+
+#========================================================================
+#  Subroutine that chooses the options that fit in the budget. The options
+# are tried in this order: the curves are dropped (they are not saved),
+# then smaller tiles (mode 'tiles') or fewer workers (mode 'batch') are
+# used (modes 'tiles' and 'stream'), and then single precision. Tiles and workers do not change the
+# results; single precision does (see rainyseason_compare).
+# budget --> memory budget [bytes]
+# Returns the plan (dictionary): fits, precision, tile, nworkers, curves,
+# stages [(stage, bytes)], peak [bytes] and notes
+#========================================================================
+def rainyseason_plan(ntot,nlat,nlon,budget,tot=365,precision='f8',fvalid=1.,mode='grid',tile=None,nworkers=1,curves=True,fileitem=None,prefetch=2):
+    precs=[precision]+(['f4'] if precision == 'f8' else [])
+    curs=[curves]+([False] if curves else [])
+    if mode != 'grid':
+       curs=[False]       # the tiles and the members never keep the curves
+    tiles=[tile]
+    if mode in ['tiles','stream']:
+       tt=(min(tile[0],nlat),min(tile[1],nlon))
+       tiles=[tt]
+       while tt != (1,1):
+           tt=(max(tt[0]//2,1),tt[1]) if tt[0] >= tt[1] else (tt[0],max(tt[1]//2,1))
+           tiles.append(tt)
+    workers=[nworkers]
+    if mode == 'batch':
+       workers=list(range(nworkers,0,-1))
+    plan=None
+    for prec in precs:
+        for tt in tiles:
+            for nw in workers:
+                for cur in curs:
+                    stages=rainyseason_memory(ntot,nlat,nlon,tot,4 if prec == 'f4' else 8,fvalid,mode,tt,nw,cur,fileitem,prefetch=prefetch)
+                    peak=max([mm for name,mm in stages])
+                    plan={'fits':peak <= budget,'precision':prec,'tile':tt,'nworkers':nw,'curves':cur,
+                          'stages':stages,'peak':peak,'budget':budget,'mode':mode,'notes':[]}
+                    if plan['fits']:
+                       return plan
+#------------------------------------------------------------------------
+# Nothing fits: the smallest configuration is returned with advice
+#------------------------------------------------------------------------
+    read=dict(plan['stages'])['read']
+    if read > budget:
+       plan['notes'].append('the input alone needs %.2f GB: read a smaller region or period (see rainyseason_subset)' % (read/GB))
+    if mode == 'grid':
+       tiled=rainyseason_plan(ntot,nlat,nlon,budget,tot,precision,fvalid,'tiles',(nlat,nlon),1,curves,fileitem)
+       if tiled['fits']:
+          plan['notes'].append("tiled output (backend='zarr', tile="+str(tiled['tile'])+", precision='"+tiled['precision']+"') fits")
+    return plan
+
+#------------------------------------------------------------------------
+# Stops the job (ValueError) if the plan does not fit, unless overbudget
+#------------------------------------------------------------------------
+def rainyseason_plan_check(plan,overbudget=False):
+    if not plan['fits'] and not overbudget:
+       raise ValueError('the job does not fit in the memory budget of %.3g GB (peak %.3g GB); set overbudget=True to run it anyway' % (plan['budget']/GB,plan['peak']/GB))
+    return plan
+
+def rainyseason_plan_print(plan):
+    print('Memory plan (%s): budget %.2f GB, peak %.2f GB, %s' % (plan['mode'],plan['budget']/GB,plan['peak']/GB,'fits' if plan['fits'] else 'DOES NOT FIT'))
+    options="  precision='%s' curves=%s" % (plan['precision'],plan['curves'])
+    if plan['mode'] in ['tiles','stream']:
+       options=options+' tile='+str(plan['tile'])
+    if plan['mode'] in ['tiles','batch']:
+       options=options+' nworkers='+str(plan['nworkers'])
+    print(options)
+    for name,mm in plan['stages']:
+        print('  %-12s %9.3f GB' % (name,mm/GB))
+    for note in plan['notes']:
+        print('  note: '+note)
+
+#========================================================================
+#  Subroutine that reads the size of the input from the metadata of a
+# NetCDF file (no data are read)
+# subset --> region and period to be read (see rainyseason_subset)
+# Returns ntot, nlat, nlon, bytes per value and number of members (0 if
+# there is no ensemble dimension)
+#========================================================================
+def rainyseason_metadata(filename,varname,subset=None):
+    import netCDF4 as nc
+    rootgrp=nc.Dataset(filename,"r")
+    var=rootgrp.variables[varname]
+    shape=var.shape
+    fileitem=var.dtype.itemsize
+    rootgrp.close()
+    nmem=shape[0] if len(shape) == 4 else 0
+    ntot,nlat,nlon=shape[-3:]
+    if subset is not None:
+       ntot=subset['ntot']
+       nlat=len(subset['lat'])
+       nlon=len(subset['lon'])
+    return ntot, nlat, nlon, fileitem, nmem
+#========================================================================
+#                             End of subroutine
+#========================================================================
+
+#------------------------------------------------------------------------
+# Dry run: prints the plan of a NetCDF file before any data are read
+#  python rainyseason_plan.py file.nc varname budget[GB] [mode] [nworkers] [tile] [fvalid]
+#  e.g. python rainyseason_plan.py precip.nc precip 16 tiles 4 60x60 0.3
+#       python rainyseason_plan.py precip.nc precip 2 stream 1 60x60
+#------------------------------------------------------------------------
+if __name__ == "__main__":
+   ntot,nlat,nlon,fileitem,nmem=rainyseason_metadata(sys.argv[1],sys.argv[2])
+   budget=float(sys.argv[3])*GB
+   mode=sys.argv[4] if len(sys.argv) > 4 else 'grid'
+   nworkers=int(sys.argv[5]) if len(sys.argv) > 5 else 1
+   tile=tuple([int(tt) for tt in sys.argv[6].split('x')]) if len(sys.argv) > 6 else (30,30)
+   fvalid=float(sys.argv[7]) if len(sys.argv) > 7 else 1.
+   print(sys.argv[1],': ',ntot,' days, ',nlat,' x ',nlon,' grid points',(', '+str(nmem)+' members') if nmem > 0 else '')
+   plan=rainyseason_plan(ntot,nlat,nlon,budget,365,'f8',fvalid,mode,tile if mode in ['tiles','stream'] else None,nworkers,True,fileitem)
+   rainyseason_plan_print(plan)
+   sys.exit(0 if plan['fits'] else 1)
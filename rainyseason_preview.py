@@ -0,0 +1,176 @@
+#!/usr/bin/python
+#========================================================================
+#  Preview mode: the whole calculation on a coarser grid and/or on fewer
+# years, to check a dataset in seconds or minutes before the full run
+# preview  --> dictionary of options:
+#              'factor' : coarsening factor (blocks of factor x factor grid
+#                         points are averaged). 1 keeps the grid
+#              'years'  : (first year, last year) of the preview
+#              'budget' : runtime budget [s] of the calculation. The
+#                         smallest factor that fits is chosen (replaces
+#                         'factor')
+#              'rate'   : calculation time [s] of one valid grid point
+#                         used with 'budget' (measured if not given)
+# prec     --> array of precipitation (time,lat,lon), or None to read the
+#              file (filename) one band of latitudes at a time
+# filename --> name of the NetCDF file ('' when prec is given)
+# varname  --> name of the precipitation variable
+# subset   --> region and period of the file (see rainyseason_subset)
+# lats     --> array with latitude values
+# lons     --> array with longitude values
+# yr0      --> first year of data
+#
+# The blocks are averaged over the valid values (negative values and NaN
+# are missing); a block without valid values is missing. The coordinates
+# of a block are the means of the coordinates of its grid points. Blocks
+# at the northern and eastern edges may be smaller than factor x factor.
+# The years are taken from Jan 1st of the first year to Dec 31st of the
+# last year, so the series stays continuous.
+#
+# The runtime of the calculation is estimated from the time taken by
+# rainyseason_pipeline for a sample of valid grid points (nsample, spread
+# over the grid) times the number of valid blocks of each factor. Reading
+# and saving the data are not included in the budget.
+#
+# rainyseason_preview returns prec (time,lat,lon) of the preview, lats,
+# lons, yr0, ntot and the factor used. rainyseason_preview_tag saves the
+# factor as the global attribute preview_factor of the output files.
+#========================================================================
+import glob
+import time
+import warnings
+import numpy as np
+from netCDF4 import Dataset
+from rainyseason_read import rainyseason_read, rainyseason_subset, rainyseason_subset_tile
+from rainyseason_calendar import rainyseason_calendar, dates_daily
+from rainyseason_pack import rainyseason_pack
+from rainyseason_pipeline import rainyseason_pipeline
+def rainyseason_preview(prec,filename,varname,subset,lats,lons,yr0,preview,tot=365,dper=25.,npass=50,dtype=np.float64,nsample=16):
+    years=preview.get('years',None)
+#------------------------------------------------------------------------
+# Years of the preview
+#------------------------------------------------------------------------
+    if len(filename) > 0:
+       if subset is None:
+          subset=rainyseason_subset(filename)
+       if years is not None and 'files' in subset:
+          raise ValueError('the years of sub-daily files are chosen in rainyseason_daily_subset')
+       if years is not None:
+          period=rainyseason_subset(filename,None,years)
+          subset=dict(subset,itime=period['itime'],yr0=period['yr0'],ntot=period['ntot'])
+       yr0=subset['yr0']
+    elif years is not None:
+       day,month,year=dates_daily(yr0,1,1,prec.shape[0],0)
+       itime=np.where((year >= years[0]) & (year <= years[1]))[0]
+       if len(itime) == 0:
+          raise ValueError('No data in the years '+str(years))
+       prec=prec[itime.min():itime.max()+1,:,:]
+       yr0=int(year[itime.min()])
+    nlat,nlon=len(lats),len(lons)
+#------------------------------------------------------------------------
+# Coarsening factor
+#------------------------------------------------------------------------
+    factor=int(preview.get('factor',1))
+    if preview.get('budget',None) is not None:
+       factor,estimate=rainyseason_preview_factor(prec,filename,varname,subset,nlat,nlon,yr0,preview['budget'],tot,dper,npass,dtype,nsample,preview.get('rate',None))
+       print('Preview: factor ',factor,', estimated calculation time %.1f s' % estimate)
+    clats=rainyseason_coarsen_coords(lats,factor)
+    clons=rainyseason_coarsen_coords(lons,factor)
+#------------------------------------------------------------------------
+# Coarsening, one band of latitudes at a time
+#------------------------------------------------------------------------
+    out=None
+    for b,i0 in enumerate(range(0,nlat,factor)):
+        i1=min(i0+factor,nlat)
+        if len(filename) > 0:
+           band=rainyseason_read(filename,varname,None,dtype,rainyseason_subset_tile(subset,(i0,i1,0,nlon)))
+        else:
+           band=np.asarray(prec[:,i0:i1,:],dtype=dtype)
+        if out is None:
+           out=np.full((band.shape[0],len(clats),len(clons)),np.nan,dtype=dtype)
+        out[:,b,:]=rainyseason_coarsen(band,factor)
+    return out, clats, clons, yr0, out.shape[0], factor
+
+#------------------------------------------------------------------------
+# Mean over the valid values of blocks of factor longitudes of a band of
+# latitudes (time,lat,lon) --> (time,blocks)
+#------------------------------------------------------------------------
+def rainyseason_coarsen(band,factor):
+    ntime,nl,nlon=band.shape
+    nx=-(-nlon//factor)
+    pad=np.full((ntime,nl,nx*factor),np.nan,dtype=band.dtype)
+    pad[:,:,0:nlon]=np.where(band >= 0.,band,np.nan)
+    with warnings.catch_warnings():
+         warnings.simplefilter('ignore',category=RuntimeWarning)   # blocks without valid values
+         return np.nanmean(pad.reshape(ntime,nl,nx,factor),axis=(1,3))
+
+def rainyseason_coarsen_coords(coords,factor):
+    coords=np.asarray(coords,dtype=np.float64)
+    return np.array([coords[i0:i0+factor].mean() for i0 in range(0,len(coords),factor)])
+
+#========================================================================
+#  Subroutine that chooses the smallest coarsening factor whose estimated
+# calculation time fits the budget [s]. Returns the factor and the
+# estimated time [s]
+# rate --> calculation time [s] of one valid grid point (None to measure it)
+#========================================================================
+def rainyseason_preview_factor(prec,filename,varname,subset,nlat,nlon,yr0,budget,tot=365,dper=25.,npass=50,dtype=np.float64,nsample=16,rate=None):
+#------------------------------------------------------------------------
+# Sample of grid points spread over the grid: fraction of valid points
+# and time per valid point
+#------------------------------------------------------------------------
+    ns=int(np.ceil(np.sqrt(4*nsample)))
+    ii=np.unique(np.linspace(0,nlat-1,ns).astype(int))
+    jj=np.unique(np.linspace(0,nlon-1,ns).astype(int))
+    series=[]
+    ncand=0
+    for i in ii:
+        for j in jj:
+            ncand=ncand+1
+            if len(filename) > 0:
+               ss=rainyseason_read(filename,varname,None,dtype,rainyseason_subset_tile(subset,(i,i+1,j,j+1)))[:,0,0]
+            else:
+               ss=np.asarray(prec[:,i,j],dtype=dtype)
+            if np.any(ss >= 0.):
+               series.append(ss)
+    fvalid=len(series)/float(ncand)
+    if len(series) == 0:
+       return 1, 0.
+    if rate is None:
+       series=np.array(series[0:nsample]).T
+       day,month,year,jday,leap=rainyseason_calendar(yr0,1,1,series.shape[0],0)
+       pprec,index=rainyseason_pack(series[:,np.newaxis,:],np.ones((1,series.shape[1])))
+       t0=time.time()
+       rainyseason_pipeline(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,dtype,curves=False)
+       rate=(time.time()-t0)/series.shape[1]
+#------------------------------------------------------------------------
+# Smallest factor that fits
+#------------------------------------------------------------------------
+    factor=1
+    while True:
+        estimate=rate*fvalid*(-(-nlat//factor))*(-(-nlon//factor))
+        if estimate <= budget or (factor >= nlat and factor >= nlon):
+           return factor, estimate
+        factor=factor+1
+
+#========================================================================
+#  Subroutine that saves the factor of the preview as the global attribute
+# preview_factor of the output files (NetCDF files and Zarr stores) of
+# prefix in pathout. Returns the names of the files
+#========================================================================
+def rainyseason_preview_tag(pathout,prefix,factor):
+    files=sorted(glob.glob(glob.escape(pathout)+'*.'+glob.escape(prefix)+'.*.nc'))
+    for outfile in files:
+        rootgrp=Dataset(outfile,"a")
+        rootgrp.preview_factor=int(factor)
+        rootgrp.close()
+    stores=sorted(glob.glob(glob.escape(pathout)+'*.'+glob.escape(prefix)+'.*.zarr'))
+    if len(stores) > 0:
+       import zarr
+       for store in stores:
+           zarr.open_group(store,mode="r+").attrs['preview_factor']=int(factor)
+           zarr.consolidate_metadata(store)
+    return files+stores
+#========================================================================
+#                             End of subroutine
+#========================================================================
@@ -0,0 +1,139 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that report the progress of the calculation: processed
+# valid points per second for each stage and estimated time to completion
+# total     --> number of valid points of the job (or number of members,
+#               tiles or stations, see unit)
+# reporters --> list of functions that receive each progress record:
+#               rainyseason_console()          prints one line per record
+#               rainyseason_logfile(filename)  appends one line per record
+#               rainyseason_jsonlines(filename) appends one JSON object per record
+# interval  --> minimum number of seconds between two records of a stage
+# unit      --> name of the unit of work
+#
+# rainyseason_tile sets the number of valid points of the part of the job
+# (tile, member, group of stations) that is being calculated. A stage
+# (format, climatology, firstpass, secondpass, durations, write, or tiles
+# and members when several workers are used) is opened with
+# rainyseason_stage, advanced with rainyseason_step (k of n items of the
+# stage done) and closed with rainyseason_stage_end, which reports the end
+# of the stage unless its last step (k = n) was already reported. All stages count the
+# valid points of the part, including the points that are dropped by an
+# earlier stage, so every stage goes through the total of the job. The
+# rate of a stage is the number of points that went through the stage
+# divided by the time spent in it. The estimated time to completion is the
+# sum over the stages of the remaining points (total minus the points that
+# went through the stage) divided by the rate of the stage. Stages not yet
+# started do not count, so the estimate grows as new stages start and is
+# only reliable once every stage has been seen at least once.
+#
+# All subroutines accept progress=None (no reporting). With parallel
+# workers, the workers do not report: the main process reports one step
+# of the stage "tiles" (or "members") when each job finishes.
+#
+# Progress record (dictionary): stage, points (points through the stage
+# so far), npts (points of the current part), rate [points/s],
+# done, total, unit, elapsed [s] and eta [s] (None if unknown).
+#========================================================================
+import json
+import time
+import datetime
+def rainyseason_progress(total,reporters,interval=10.,unit='points'):
+    if len(reporters) == 0:
+       return None
+    return {'total':int(total),'unit':unit,'reporters':reporters,'interval':interval,'t0':time.time(),'npts':int(total),'stages':{}}
+
+def rainyseason_tile(progress,npts):
+    if progress is None:
+       return
+    progress['npts']=int(npts)
+
+def rainyseason_stage(progress,stage):
+    if progress is None:
+       return
+    st=progress['stages'].setdefault(stage,{'points':0,'seconds':0.,'start':0.,'last':0.,'complete':False})
+    st['start']=time.time()
+    st['last']=st['start']
+    st['complete']=False
+
+def rainyseason_step(progress,stage,k,n,force=False):
+    if progress is None:
+       return
+    st=progress['stages'][stage]
+    now=time.time()
+    if not force and now-st['last'] < progress['interval']:
+       return
+    st['last']=now
+    st['complete']=k >= n
+    points=st['points']+(int(progress['npts']*k/n) if n > 0 else progress['npts'])
+    seconds=st['seconds']+now-st['start']
+    record={'stage':stage,'points':points,'npts':progress['npts'],
+            'rate':points/seconds if seconds > 0. else None,
+            'done':min(points,progress['total']),'total':progress['total'],'unit':progress['unit'],
+            'elapsed':now-progress['t0'],'eta':rainyseason_eta(progress,stage,points,seconds)}
+    for report in progress['reporters']:
+        report(record)
+
+def rainyseason_stage_end(progress,stage):
+    if progress is None:
+       return
+    st=progress['stages'][stage]
+    if not st['complete']:         # the last step may already have been reported
+       rainyseason_step(progress,stage,1,1,True)
+    st['points']=st['points']+progress['npts']
+    st['seconds']=st['seconds']+time.time()-st['start']
+
+def rainyseason_eta(progress,stage,points,seconds):
+    eta=0.
+    for name,st in progress['stages'].items():
+        pp,ss=(points,seconds) if name == stage else (st['points'],st['seconds'])
+        if pp == 0:
+           if name == stage:
+              return None
+           continue
+        eta=eta+max(progress['total']-pp,0)*ss/pp
+    return eta
+
+#========================================================================
+#  Reporters
+#========================================================================
+def rainyseason_format_record(record):
+    rate='-' if record['rate'] is None else '%.1f' % record['rate']
+    eta='-' if record['eta'] is None else str(datetime.timedelta(seconds=int(record['eta'])))
+    return '%-12s %d of %d %s, %s %s/s, elapsed %s, ETA %s' % (record['stage'],record['done'],record['total'],record['unit'],
+           rate,record['unit'],str(datetime.timedelta(seconds=int(record['elapsed']))),eta)
+
+def rainyseason_console():
+    def report(record):
+        print(rainyseason_format_record(record),flush=True)
+    return report
+
+def rainyseason_logfile(filename):
+    def report(record):
+        with open(filename,'a') as ff:
+             ff.write(time.strftime('%Y-%m-%d %H:%M:%S')+' '+rainyseason_format_record(record)+'\n')
+    return report
+
+def rainyseason_jsonlines(filename):
+    def report(record):
+        with open(filename,'a') as ff:
+             ff.write(json.dumps(dict(record,time=time.time()))+'\n')
+    return report
+
+#------------------------------------------------------------------------
+# Reporters from the user options: 'console', a log file (any other name)
+# or a JSON lines file (name ending in .jsonl)
+#------------------------------------------------------------------------
+def rainyseason_reporters(names):
+    reporters=[]
+    for name in names:
+        if name == 'console':
+           reporters.append(rainyseason_console())
+        elif name.endswith('.jsonl'):
+           reporters.append(rainyseason_jsonlines(name))
+        else:
+           reporters.append(rainyseason_logfile(name))
+    return reporters
+#========================================================================
+#                             End of subroutine
+#========================================================================
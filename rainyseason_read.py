@@ -0,0 +1,157 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutine that reads a precipitation dataset from a NetCDF file
+# filename --> name of the NetCDF file
+# varname  --> name of the precipitation variable (time,lat,lon) or, for
+#              files with an ensemble dimension, (member,time,lat,lon)
+# member   --> index of the ensemble member to be read (None if the
+#              variable has no ensemble dimension)
+# dtype    --> numpy dtype of the returned array
+# subset   --> region and period to be read (see rainyseason_subset).
+#              None reads the whole file. A subset of sub-daily files
+#              (see rainyseason_daily_subset) is read as daily totals
+# lock     --> lock held while the NetCDF library is called (the library
+#              is not thread safe, see rainyseason_stream), or None
+#
+# Returns the array of precipitation (time,lat,lon). Missing (masked)
+# data are NaN
+#========================================================================
+import contextlib
+import numpy
+import netCDF4 as nc
+def rainyseason_read(filename,varname,member=None,dtype=numpy.float64,subset=None,lock=None):
+    if subset is not None and 'files' in subset:
+       from rainyseason_daily import rainyseason_daily_read
+       return rainyseason_daily_read(varname,member,dtype,subset,lock=lock)
+    with (lock if lock is not None else contextlib.nullcontext()):
+         rootgrp=nc.Dataset(filename,"r")
+         prec=rainyseason_slab(rootgrp.variables[varname],member,subset)
+         rootgrp.close()
+    return numpy.ma.filled(numpy.ma.asarray(prec,dtype=dtype),numpy.nan)
+
+#------------------------------------------------------------------------
+# Hyperslab of the subset (the whole variable if subset is None) of an
+# open variable, as a masked array. itime replaces the time steps of the
+# subset. A region that crosses the edge of the longitudes of the file
+# (e.g. the dateline) is read as two pieces that are joined along longitude
+#------------------------------------------------------------------------
+def rainyseason_slab(var,member,subset,itime=None):
+    if subset is None:
+       if member is None:
+          return var[:,:,:]
+       return var[member,:,:,:]
+    if itime is None:
+       itime=subset['itime']
+    pieces=[]
+    for ilon in subset['ilon']:
+        if member is None:
+           pieces.append(var[itime,subset['ilat'],ilon])
+        else:
+           pieces.append(var[member,itime,subset['ilat'],ilon])
+    return numpy.ma.concatenate(pieces,axis=2)
+
+#========================================================================
+#  Subroutine that finds the hyperslab of a NetCDF file that covers a
+# region and a period
+# filename --> name of the NetCDF file
+# bbox     --> (southern lat, northern lat, western lon, eastern lon) or
+#              None for the whole globe. The region crosses the dateline
+#              when the western longitude is larger than the eastern
+#              longitude (e.g. (-10.,10.,170.,-170.)). Longitudes can be
+#              given in [-180,180] or in [0,360] for any file
+# years    --> (first year, last year) or None for the whole period
+# latname, lonname, timename --> names of the coordinate variables
+# jan1     --> True to start the period on the first Jan 1st, so the calendar
+#              (rainyseason_calendar(yr0,1,1,...)) matches the data. The days
+#              after the last Dec 31st are kept (a short final year).
+#              ValueError if there is no Jan 1st. False keeps all the time
+#              steps of the period (e.g. sub-daily files, see rainyseason_daily)
+#
+# Returns a dictionary with the coordinates of the subset ('lat', 'lon',
+# 'yr0', 'ntot') and the indices used by rainyseason_read ('ilat',
+# 'ilon', 'itime'). The longitudes of a region that crosses the dateline
+# increase monotonically (e.g. 170 ... 190).
+#========================================================================
+def rainyseason_subset(filename,bbox=None,years=None,latname='lat',lonname='lon',timename='time',jan1=True):
+    rootgrp=nc.Dataset(filename,"r")
+    lats=numpy.asarray(rootgrp.variables[latname][:],dtype=numpy.float64)
+    lons=numpy.asarray(rootgrp.variables[lonname][:],dtype=numpy.float64)
+    time=rootgrp.variables[timename]
+    dates=nc.num2date(time[:],time.units,getattr(time,'calendar','standard'))
+    rootgrp.close()
+    subset={}
+#------------------------------------------------------------------------
+# Latitudes
+#------------------------------------------------------------------------
+    if bbox is None:
+       ilat=numpy.arange(0,len(lats))
+    else:
+       ilat=numpy.where((lats >= min(bbox[0],bbox[1])) & (lats <= max(bbox[0],bbox[1])))[0]
+    if len(ilat) == 0:
+       raise ValueError('No latitudes of '+filename+' in the region '+str(bbox))
+    subset['ilat']=slice(ilat.min(),ilat.max()+1)
+    subset['lat']=lats[subset['ilat']]
+#------------------------------------------------------------------------
+# Longitudes: distances east of the western edge of the region
+#------------------------------------------------------------------------
+    if bbox is None:
+       subset['ilon']=[slice(0,len(lons))]
+       subset['lon']=lons
+    else:
+       west=numpy.mod(bbox[2],360.)
+       width=numpy.mod(bbox[3]-bbox[2],360.)
+       if width == 0. and bbox[3] != bbox[2]:
+          width=360.
+       east=numpy.mod(lons-west,360.)
+       ilon=numpy.where(east <= width)[0]
+       if len(ilon) == 0:
+          raise ValueError('No longitudes of '+filename+' in the region '+str(bbox))
+       ilon=ilon[numpy.argsort(east[ilon],kind='stable')]
+       cuts=numpy.where(numpy.diff(ilon) != 1)[0]+1
+       subset['ilon']=[slice(run[0],run[-1]+1) for run in numpy.split(ilon,cuts)]
+       subset['lon']=bbox[2]+east[ilon]
+#------------------------------------------------------------------------
+# Period: from Jan 1st of the first year
+#------------------------------------------------------------------------
+    year=numpy.array([dd.year for dd in dates])
+    if years is None:
+       itime=numpy.arange(0,len(dates))
+    else:
+       itime=numpy.where((year >= years[0]) & (year <= years[1]))[0]
+    if len(itime) == 0:
+       raise ValueError('No data of '+filename+' in the years '+str(years))
+    if jan1:
+       first=[tt for tt in range(0,len(itime)) if dates[itime[tt]].month == 1 and dates[itime[tt]].day == 1]
+       if len(first) == 0:
+          raise ValueError('No Jan 1st in the data of '+filename+' in the years '+str(years))
+       if first[0] > 0:
+          print('Period of '+filename+' starts on the first Jan 1st: ',dates[itime[first[0]]])
+       itime=itime[first[0]:]
+    subset['itime']=slice(itime.min(),itime.max()+1)
+    subset['yr0']=int(year[itime.min()])
+    subset['ntot']=int(len(itime))
+    return subset
+
+#========================================================================
+#  Subroutine that restricts a subset to one tile (i0,i1,j0,j1) of its
+# grid (see rainyseason_tiles), so that the tile can be read alone
+#========================================================================
+def rainyseason_subset_tile(subset,tile):
+    i0,i1,j0,j1=tile
+    out=dict(subset)
+    out['ilat']=slice(subset['ilat'].start+i0,subset['ilat'].start+i1)
+    out['lat']=subset['lat'][i0:i1]
+    out['lon']=subset['lon'][j0:j1]
+    out['ilon']=[]
+    k0=0
+    for piece in subset['ilon']:
+        k1=k0+piece.stop-piece.start
+        a=max(j0,k0)
+        b=min(j1,k1)
+        if a < b:
+           out['ilon'].append(slice(piece.start+a-k0,piece.start+b-k0))
+        k0=k1
+    return out
+#========================================================================
+#                             End of subroutine
+#========================================================================
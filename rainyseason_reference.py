@@ -0,0 +1,319 @@
+#!/usr/bin/python
+#========================================================================
+#  Reference engine and equivalence harness
+#
+#  rainyseason_reference calculates the characteristics of the rainy and
+# dry seasons one point at a time with the original scalar kernels
+# (rainyseason_onset, rainyseason_demise, rainyseason_B17_onset,
+# rainyseason_B17_demise and Harmonics) and the original per-point
+# formatting, quality control, masking and duration logic. It is slow on
+# purpose: it is the definition of the expected results. The scalar
+# kernels must be kept unchanged; faster implementations go in other
+# functions. The reference does not use the formatting and quality control
+# of the engine (rainyseason_format, rainyseason_qc): it has its own
+# copies of the original loops (reference_format, reference_qc).
+#
+#  rainyseason_equivalence runs the reference and an alternative engine
+# on the same inputs and compares every product with rainyseason_compare:
+# dates and durations must match exactly and totals within rtol. A case
+# fails if a product has no valid values in both results (nothing would
+# be compared).
+# engine --> function with the arguments and results of rainyseason_pipeline:
+#            index,res=engine(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,dtype)
+#            The dates of res may be day indices (see rainyseason_field)
+# cases  --> list of inputs (see rainyseason_cases): dictionaries with the
+#            name, the first year and the precipitation (time,points)
+#            including Feb 29th. Missing data are negative or NaN
+#
+#  rainyseason_cases creates synthetic inputs with the edge cases of the
+# method: seasons within the year and across the end of the year, a
+# short final year, leap years, missing data (all missing, too many
+# missing, missing years, the missing value -999.), two rainy seasons
+# and dry points. Every case has points with one rainy season, so all
+# products are compared.
+#
+# Command line use (the exit code is 1 if any product differs, so it can
+# be used as a gate for a new engine):
+#  python rainyseason_reference.py                       synthetic cases, rainyseason_pipeline
+#  python rainyseason_reference.py module:function       synthetic cases, other engine
+#  python rainyseason_reference.py module:function file.nc varname [f4]
+#                                                        recorded input (NetCDF)
+#========================================================================
+import sys
+import math
+import importlib
+import numpy as np
+from rainyseason_calendar import rainyseason_calendar, dates_daily, julian
+from rainyseason_pack import rainyseason_pack, rainyseason_unpack
+from rainyseason_climatology import Harmonics
+from rainyseason_onset import rainyseason_onset
+from rainyseason_demise import rainyseason_demise
+from rainyseason_B17_onset import rainyseason_B17_onset
+from rainyseason_B17_demise import rainyseason_B17_demise
+from rainyseason_output import products, rainyseason_field
+from rainyseason_compare import rainyseason_compare
+dates=['jday','day','month','year']
+def rainyseason_reference(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,dtype=np.float64):
+    pprec,index=reference_format(pprec,index,leap,dper)
+    rm,startwet=reference_climatology(pprec,jday,tot,dtype)
+    id=np.where(rm > 0.)[0]
+    nyrs=int(year.max()-year.min())+1
+    ntot=len(year)
+    res={}
+    for name in ['onset','demise']:
+        for dd in dates:
+            res[name+'_'+dd]=np.full((nyrs,len(id)),np.nan,dtype=dtype)
+    for name in ['durwet','durdry','totwet','totdry']:
+        res[name]=np.full((nyrs,len(id)),np.nan,dtype=dtype)
+    for k in range(0,len(id)):
+        pt=id[k]
+        prec=np.nan_to_num(pprec[pt,:],nan=0.)
+        ap=np.zeros((ntot),dtype=dtype)
+        ap[:]=prec-rm[pt]
+#------------------------------------------------------------------------
+# First pass, quality control and second pass
+#------------------------------------------------------------------------
+        for name,kernel,kernel2 in [('onset',rainyseason_onset,rainyseason_B17_onset),('demise',rainyseason_demise,rainyseason_B17_demise)]:
+            w=[np.full((nyrs),np.nan) for dd in dates]
+            curve=np.zeros((nyrs,int(tot/2)))
+            w[0],w[1],w[2],w[3],curve=kernel(nyrs,tot,jday,day,month,year,startwet[pt],ap,w[0],w[1],w[2],w[3],curve)
+            w=[np.asarray(ww,dtype=dtype).astype(np.float64) for ww in w]
+            if np.any(~np.isnan(w[0])):
+               outl=reference_qc(w[0].copy(),tot,1.5)
+               for ww in w:
+                   ww[outl]=np.nan
+               miss=np.where(np.isnan(w[0]))
+               if len(miss[0]) > 0:
+                  v=[np.full((nyrs),np.nan) for dd in dates]
+                  v[0],v[1],v[2],v[3]=kernel2(nyrs,tot,jday,day,month,year,startwet[pt],ap,npass,v[0],v[1],v[2],v[3])
+                  for ww,vv in zip(w,v):
+                      ww[miss]=vv[miss]
+                  outl=reference_qc(w[0].copy(),tot,3.)
+                  for ww in w:
+                      ww[outl]=np.nan
+            for dd,ww in zip(dates,w):
+                res[name+'_'+dd][:,k]=ww
+        reference_durations(prec,res,k,yr0,tot,nyrs)
+    return index[id], res
+
+#------------------------------------------------------------------------
+#    Removing Feb 29th (averaged with Feb 28th) and masking the points with
+# more missing data than dper [%], one point at a time. Negative values
+# are missing (NaN)
+#------------------------------------------------------------------------
+def reference_format(pprec,index,leap,dper):
+    ntot=pprec.shape[1]-len(leap)
+    thres=(ntot-0.01*dper*ntot) # minimum threshold of non-missing data
+    keep=[]
+    out=[]
+    for pt in range(0,pprec.shape[0]):
+        tmp=np.array(pprec[pt,:])
+        tmp[~(tmp >= 0.)]=np.nan
+        for tt in leap:
+            tmp[tt-1]=0.5*(tmp[tt]+tmp[tt-1])
+        tmp=np.delete(tmp,leap)
+        if np.sum(~np.isnan(tmp)) >= thres:
+           keep.append(pt)
+           out.append(tmp)
+    if len(out) == 0:
+       return np.zeros((0,ntot),dtype=pprec.dtype), index[0:0]
+    return np.array(out,dtype=pprec.dtype), index[keep]
+
+#------------------------------------------------------------------------
+#    Quality control of the dates (day of year, NaN for no date) of one
+# point: the dates further than fac x IQR from their circular median are
+# outliers. Returns the positions of the outliers
+#------------------------------------------------------------------------
+def reference_qc(jd,tot,fac):
+    miss=np.where(np.isnan(jd[:]))
+    id=np.where(~np.isnan(jd[:]))
+    if len(id[0]) == 0:
+       return np.where(np.zeros(jd.shape,dtype=bool))
+# ---- Averagind dates using circular statistics
+    tmpx=np.cos(jd[:]*math.pi/183.)
+    tmpy=np.sin(jd[:]*math.pi/183.)
+    med=math.atan2(np.median(tmpy[id]),np.median(tmpx[id]))*183./math.pi
+    if med < 0.:
+       med=med+tot
+# ---- Converting dates close to beginning and end of the year
+    tmpc=jd[:]-med
+    if len(miss[0]) > 0.:
+       tmpc[miss]=0.
+    pos=np.where(tmpc[:] > float(tot)*0.5)
+    if len(pos[0]) > 0:
+       tmpc[pos]=tmpc[pos]-tot
+    neg=np.where(tmpc[:] < float(tot)*(-0.5))
+    if len(neg[0]) > 0:
+       tmpc[neg]=tmpc[neg]+tot
+# ---- Removing outliers (greater than fac x IQR)
+    iqr=np.percentile(tmpc[id],75)-np.percentile(tmpc[id],25)
+    return np.where(np.abs(tmpc[:]) > iqr*fac)
+
+#------------------------------------------------------------------------
+#    Daily annual mean, mean annual cycle, masking of the points with zero
+# or more than one rainy season and starting date, one point at a time
+#------------------------------------------------------------------------
+def reference_climatology(pprec,jday,tot,dtype=np.float64):
+    npts=pprec.shape[0]
+    rm=np.zeros((npts),dtype=dtype)
+    startwet=np.zeros((npts))
+    time=np.arange(1,tot+1,1.)
+    for pt in range(0,npts):
+        ok=~np.isnan(pprec[pt,:])
+        if np.sum(ok) > 1:
+           rm[pt]=np.sum(pprec[pt,ok],dtype=np.float64)/np.sum(ok)
+        cycle=np.zeros((tot),dtype=dtype)
+        for tt in range(0,tot):
+            tmp=pprec[pt,jday[:] == jday[tt]]
+            ok=~np.isnan(tmp)
+            if np.sum(ok) > 1:
+               cycle[tt]=np.sum(tmp[ok],dtype=np.float64)/np.sum(ok)
+        coefa,coefb,hvar=Harmonics(np.zeros((3)),np.zeros((3)),np.zeros((3)),cycle,3)
+        harmonic1=np.zeros((tot),dtype=dtype)
+        harmonic1[:]=rm[pt]
+        harmonic1[:]=harmonic1[:]+coefa[0]*np.cos(2.*math.pi*time[:]/float(tot))+coefb[0]*np.sin(2.*math.pi*time[:]/float(tot))
+        if hvar[1] >= hvar[0] or hvar[2] >= hvar[0]:
+           rm[pt]=0.
+        id=np.where(harmonic1 == harmonic1.min())
+        startwet[pt]=jday[id[0][0]]
+    return rm, startwet
+
+#------------------------------------------------------------------------
+#    Masking, rearranging the demise years and duration and totals of the
+# wet and dry seasons of point k (results in res). prec is the series of
+# the point with missing data replaced by zeros
+#------------------------------------------------------------------------
+def reference_durations(prec,res,k,yr0,tot,nyrs):
+    for name in ['onset','demise']:
+        if np.sum(np.isnan(res[name+'_jday'][:,k]))/float(nyrs) > 0.33:
+           for dd in dates:
+               res[name+'_'+dd][:,k]=np.nan
+    if res['demise_year'][1,k] == float(yr0) or res['demise_year'][2,k] == float(yr0+1):
+       for dd in dates:
+           res['demise_'+dd][0:nyrs-1,k]=res['demise_'+dd][1:nyrs,k]
+           res['demise_'+dd][nyrs-1,k]=np.nan
+    oj=res['onset_jday'][:,k]
+    oy=res['onset_year'][:,k]
+    dj=res['demise_jday'][:,k]
+    dy=res['demise_year'][:,k]
+    def season(y0,j0,y1,j1):
+        beg=int((y0-yr0)*tot+j0-1)
+        ned=int((y1-yr0)*tot+j1-1)
+        return float(ned-beg), np.sum(prec[beg:ned],dtype=np.float64)
+    for yt in range(0,nyrs):
+        if dy[yt] == oy[yt]:
+           if dj[yt] < oj[yt]:
+              res['durdry'][yt,k],res['totdry'][yt,k]=season(dy[yt],dj[yt],oy[yt],oj[yt])
+              if yt < nyrs-1 and dy[yt+1] > 0.:
+                 res['durwet'][yt,k],res['totwet'][yt,k]=season(oy[yt],oj[yt],dy[yt+1],dj[yt+1])
+           if oj[yt] < dj[yt]:
+              res['durwet'][yt,k],res['totwet'][yt,k]=season(oy[yt],oj[yt],dy[yt],dj[yt])
+              if yt < nyrs-1 and oy[yt+1] > 0.:
+                 res['durdry'][yt,k],res['totdry'][yt,k]=season(dy[yt],dj[yt],oy[yt+1],oj[yt+1])
+        if 0. < dy[yt] < oy[yt]:
+           res['durdry'][yt,k],res['totdry'][yt,k]=season(dy[yt],dj[yt],oy[yt],oj[yt])
+           if yt < nyrs-1 and dy[yt+1] > 0. and oj[yt] < dj[yt+1]:
+              res['durwet'][yt,k],res['totwet'][yt,k]=season(oy[yt],oj[yt],dy[yt+1],dj[yt+1])
+        if 0. < oy[yt] < dy[yt]:
+           res['durwet'][yt,k],res['totwet'][yt,k]=season(oy[yt],oj[yt],dy[yt],dj[yt])
+           if yt < nyrs-1 and oy[yt+1] > 0. and dj[yt] < oj[yt+1]:
+              res['durdry'][yt,k],res['totdry'][yt,k]=season(dy[yt],dj[yt],oy[yt+1],oj[yt+1])
+
+#========================================================================
+#  Subroutine that creates the synthetic inputs
+# seed --> seed of the random number generator
+#========================================================================
+def rainyseason_cases(seed=0):
+    rng=np.random.default_rng(seed)
+    def synthetic(y0,ntot,peaks,amp=1.):
+        day,month,year=dates_daily(y0,1,1,ntot,0)
+        doy=np.array([julian(int(day[tt]),int(month[tt]),int(year[tt]),0) for tt in range(0,ntot)])
+        prec=np.zeros((ntot,len(peaks)))
+        for pt in range(0,len(peaks)):
+            cycle=np.zeros((ntot))
+            for pk in np.atleast_1d(peaks[pt]):
+                cycle=np.maximum(cycle,0.5+0.5*amp*np.cos(2.*math.pi*(doy-pk)/365.25))
+            wet=rng.random(ntot) < 0.1+0.7*cycle**2
+            prec[:,pt]=np.where(wet,rng.gamma(0.8,1.+12.*cycle),0.)
+        return prec
+    def ndays(y0,y1):
+        return int(sum([366 if (yy % 4 == 0 and yy % 100 != 0) or yy % 400 == 0 else 365 for yy in range(y0,y1+1)]))
+    cases=[]
+    cases.append({'name':'season within the year','yr0':1981,
+                  'prec':synthetic(1981,ndays(1981,1990),[170,190,200,215,230,250])})
+    cases.append({'name':'season across the end of the year','yr0':1981,
+                  'prec':synthetic(1981,ndays(1981,1990),[1,15,30,340,355,365])})
+    cases.append({'name':'short final year','yr0':1985,
+                  'prec':synthetic(1985,ndays(1985,1992)+150,[20,120,200,300,350])})
+    cases.append({'name':'leap years','yr0':1996,
+                  'prec':synthetic(1996,ndays(1996,2004),[59,60,61,200,366])})
+    prec=synthetic(1981,ndays(1981,1990),[200,200,200,200,200,10,10])
+    prec[:,0]=-999.                                   # all missing
+    prec[rng.random(prec.shape[0]) < 0.4,1]=np.nan    # too many missing data
+    prec[365:1095,2]=-999.                            # two missing years
+    prec[rng.random(prec.shape[0]) < 0.1,3]=-999.     # scattered missing data
+    prec[-365:,4]=np.nan                              # missing final year
+    prec[0:400,5]=-1.                                 # negative values
+    cases.append({'name':'missing data','yr0':1981,'prec':prec})
+    prec=synthetic(1981,ndays(1981,1990),[(30,210),(90,270),200,320])
+    prec[:,2]=0.                                      # dry point
+    cases.append({'name':'two rainy seasons and dry point','yr0':1981,'prec':prec})
+    return cases
+
+#========================================================================
+#  Subroutine that runs the reference and the engine on all cases
+# Returns ok (True if all products of all cases agree) and the reports
+# {case:{product:report}} of rainyseason_compare
+#========================================================================
+def rainyseason_equivalence(engine,cases,tot=365,dper=25.,npass=50,dtype=np.float64,rtol=1.e-6,missval=-999.):
+    passed=True
+    reports={}
+    for case in cases:
+        prec=np.asarray(case['prec'],dtype=dtype)
+        ntot,npts=prec.shape
+        day,month,year,jday,leap=rainyseason_calendar(case['yr0'],1,1,ntot,0)
+        pprec,index=rainyseason_pack(prec[:,np.newaxis,:],np.ones((1,npts)))
+        out=[]
+        for run in [rainyseason_reference,engine]:
+            idx,res=run(pprec.copy(),index.copy(),day,month,year,jday,leap,case['yr0'],tot,dper,npass,dtype)
+            fields={}
+            for name,variables in products:
+                for vname,key,long_name in variables:
+                    data=rainyseason_unpack(np.asarray(rainyseason_field(res,key,(day,month,year,jday)),dtype=np.float64),idx,1,npts,np.nan)
+                    data[np.isnan(data)]=missval
+                    fields[key]=data
+            out.append(fields)
+        ok,reports[case['name']]=rainyseason_compare(out[0],out[1],missval,0.,rtol)
+        for key in reports[case['name']].keys():
+            nval=int(np.sum((out[0][key] != missval) | (out[1][key] != missval)))
+            reports[case['name']][key]['valid']=nval
+            ok=ok and nval > 0
+        passed=passed and ok
+    return passed, reports
+#========================================================================
+#                             End of subroutine
+#========================================================================
+
+if __name__ == "__main__":
+   from rainyseason_pipeline import rainyseason_pipeline
+   engine=rainyseason_pipeline
+   if len(sys.argv) > 1:
+      module,function=sys.argv[1].split(':')
+      engine=getattr(importlib.import_module(module),function)
+   dtype=np.float64
+   if len(sys.argv) > 3:
+      from rainyseason_read import rainyseason_read, rainyseason_subset
+      if len(sys.argv) > 4 and sys.argv[4] == 'f4':
+         dtype=np.float32
+      subset=rainyseason_subset(sys.argv[2])
+      prec=rainyseason_read(sys.argv[2],sys.argv[3],None,dtype,subset)
+      cases=[{'name':sys.argv[2],'yr0':subset['yr0'],'prec':prec.reshape(prec.shape[0],-1)}]
+   else:
+      cases=rainyseason_cases()
+   passed,reports=rainyseason_equivalence(engine,cases,dtype=dtype)
+   for name in reports.keys():
+       for key in reports[name].keys():
+           rr=reports[name][key]
+           print('%-36s %-13s valid %6d  different %6d  max. difference %g' % (name,key,rr['valid'],rr['bad'],rr['maxdiff']))
+   print('PASSED' if passed else 'FAILED')
+   sys.exit(0 if passed else 1)
@@ -0,0 +1,234 @@
+#!/usr/bin/python
+#========================================================================
+#  Season index: compact per-point index of the onset and demise dates
+# and of the accumulated precipitation, and the queries that use it
+# ("was day D in the wet season at point P?", "rain since the onset",
+# "wet days of a month") without reading the precipitation again
+# res     --> dictionary of packed results with the day indices of the
+#             dates and cumprec (see rainyseason_characteristics with
+#             cumulative=True)
+# index   --> positions of the packed points in the flattened (lat,lon) grid
+# yr0     --> first year of data
+# tot     --> total number of points for one year of data (365)
+# lats    --> array with latitude values of the grid
+# lons    --> array with longitude values of the grid
+#
+# Dates are day indices: positions in the record without Feb 29th that
+# starts on Jan 1st of yr0 (see rainyseason_daynum). The onsets and
+# demises of each point are sorted and stored one point after the other
+# with the key point*span+day (span = days of the record + 1), so the
+# keys of the whole grid are sorted and any number of (point, day)
+# queries are answered with one binary search (numpy.searchsorted). The
+# dates of all years are indexed, including the last two years that are
+# not saved in the output files (the wet season of the last saved year
+# may end in the next year).
+# A wet season goes from an onset to the first demise after it (the day
+# of the demise is dry); an onset followed by another onset (missing
+# demise) has no wet season. wetcum is the number of wet days of all
+# the seasons before each season, so the wet days of any period are a
+# difference of two lookups. The precipitation accumulated since the
+# beginning of the record (missing data count as zero, as in the totals)
+# before day index t is cumbase[k,t//tot]+cumprec[k,t] (see
+# rainyseason_cumulative): cumbase (points,years+1) holds the totals
+# before each Jan 1st in double precision and cumprec (points,days+1) the
+# totals since the last Jan 1st in single precision, so the rain of any
+# period is also a difference of two lookups. Totals from the index agree
+# with totwet and totdry to the rounding of single precision (about 1e-7
+# of an annual total).
+#
+# The index is saved as a NetCDF file (seasonindex.prefix.years.nc) by
+# rainyseason_seasonindex_save and read by rainyseason_seasonindex_load.
+# All queries take arrays of packed points (see rainyseason_seasonindex_point)
+# and of day indices and return arrays of the same shape.
+#
+# Command line use:
+#  python rainyseason_seasonindex.py seasonindex.nc lat lon YYYY-MM-DD
+#========================================================================
+import sys
+import numpy as np
+from netCDF4 import Dataset
+from rainyseason_calendar import julian
+def rainyseason_seasonindex(res,index,yr0,tot,lats,lons):
+    ntot=res['cumprec'].shape[1]-1
+    span=ntot+1
+    sidx={'index':np.asarray(index,dtype=np.int64),'yr0':int(yr0),'tot':int(tot),'ntot':ntot,'span':span,
+          'lat':np.asarray(lats),'lon':np.asarray(lons),'cumbase':res['cumbase'],'cumprec':res['cumprec']}
+    for name in ['onset','demise']:
+        t=res[name].T
+        pts,yts=np.nonzero(t >= 0)
+        sidx[name]=np.sort(pts.astype(np.int64)*span+t[pts,yts])
+#------------------------------------------------------------------------
+# Wet seasons: onset to the next demise of the same point, when there is
+# no other onset in between
+#------------------------------------------------------------------------
+    on=sidx['onset']
+    de=sidx['demise']
+    nxt=np.searchsorted(de,on,'right')
+    ok=nxt < len(de)
+    end=np.where(ok,de[np.minimum(nxt,len(de)-1)],-1)
+    ok=ok & (end//span == on//span)
+    nexton=np.append(on[1:],np.iinfo(np.int64).max)
+    ok=ok & (end <= nexton)
+    sidx['start']=on[ok]
+    sidx['end']=end[ok]
+    sidx['wetcum']=np.concatenate(([0],np.cumsum(sidx['end']-sidx['start'])))
+    return sidx
+
+#========================================================================
+#  Day index of dates (arrays of years, months and days). Feb 29th is not
+# in the record: it is taken as Feb 28th
+#========================================================================
+def rainyseason_daynum(sidx,year,month,day):
+    year=np.asarray(year,dtype=np.int64)
+    day=np.where((np.asarray(month) == 2) & (np.asarray(day) == 29),28,day)
+    jd=np.vectorize(julian)(day,month,year)
+    return (year-sidx['yr0'])*sidx['tot']+jd-1
+
+#========================================================================
+#  Packed point of the grid point nearest to (lat, lon). -1 if the grid
+# point has no results
+#========================================================================
+def rainyseason_seasonindex_point(sidx,lat,lon):
+    i=np.argmin(np.abs(sidx['lat']-lat))
+    j=np.argmin(np.abs(np.mod(sidx['lon']-lon+180.,360.)-180.))
+    pos=np.searchsorted(sidx['index'],i*len(sidx['lon'])+j)
+    if pos < len(sidx['index']) and sidx['index'][pos] == i*len(sidx['lon'])+j:
+       return int(pos)
+    return -1
+
+#========================================================================
+#  Packed points of a region (lat0,lat1,lon0,lon1). Regions that cross
+# the dateline have lon0 > lon1
+#========================================================================
+def rainyseason_seasonindex_region(sidx,bbox):
+    lat0,lat1,lon0,lon1=bbox
+    nlon=len(sidx['lon'])
+    lat=sidx['lat'][sidx['index']//nlon]
+    lon=np.mod(sidx['lon'][sidx['index'] % nlon],360.)
+    if np.mod(lon0,360.) <= np.mod(lon1,360.):
+       inlon=(lon >= np.mod(lon0,360.)) & (lon <= np.mod(lon1,360.))
+    else:
+       inlon=(lon >= np.mod(lon0,360.)) | (lon <= np.mod(lon1,360.))
+    return np.where((lat >= lat0) & (lat <= lat1) & inlon)[0]
+
+#========================================================================
+#  Queries. k: packed points, t, t0, t1: day indices
+#========================================================================
+#------------------------------------------------------------------------
+# Wet season that contains day t: its position in start/end, -1 if t is
+# in the dry season (or in a period without dates)
+#------------------------------------------------------------------------
+def rainyseason_season_of(sidx,k,t):
+    key=np.asarray(k,dtype=np.int64)*sidx['span']+np.asarray(t,dtype=np.int64)
+    i=np.searchsorted(sidx['start'],key,'right')-1
+    wet=(i >= 0) & (key < sidx['end'][np.maximum(i,0)])
+    return np.where(wet,i,-1)
+
+def rainyseason_in_season(sidx,k,t):
+    return rainyseason_season_of(sidx,k,t) >= 0
+
+#------------------------------------------------------------------------
+# Wet days in [t0,t1)
+#------------------------------------------------------------------------
+def rainyseason_wet_before(sidx,key):
+    i=np.searchsorted(sidx['start'],key,'right')
+    j=np.maximum(i-1,0)
+    part=np.where(i > 0,np.minimum(key,sidx['end'][j])-sidx['start'][j],0)
+    return sidx['wetcum'][j]+part
+
+def rainyseason_wet_days(sidx,k,t0,t1):
+    base=np.asarray(k,dtype=np.int64)*sidx['span']
+    return rainyseason_wet_before(sidx,base+np.asarray(t1,dtype=np.int64))-rainyseason_wet_before(sidx,base+np.asarray(t0,dtype=np.int64))
+
+#------------------------------------------------------------------------
+# Wet days of a month of a year
+#------------------------------------------------------------------------
+def rainyseason_wet_days_month(sidx,k,year,month):
+    month=np.asarray(month)
+    t0=rainyseason_daynum(sidx,year,month,1)
+    t1=rainyseason_daynum(sidx,np.asarray(year)+(month == 12),month % 12+1,1)
+    return rainyseason_wet_days(sidx,k,t0,t1)
+
+#------------------------------------------------------------------------
+# Precipitation [mm] accumulated in [t0,t1)
+#------------------------------------------------------------------------
+def rainyseason_cumprec(sidx,k,t):
+    t=np.clip(t,0,sidx['ntot'])
+    return sidx['cumbase'][k,t//sidx['tot']]+np.asarray(sidx['cumprec'][k,t],dtype=np.float64)
+
+def rainyseason_accumulated(sidx,k,t0,t1):
+    k=np.asarray(k,dtype=np.int64)
+    return rainyseason_cumprec(sidx,k,t1)-rainyseason_cumprec(sidx,k,t0)
+
+#------------------------------------------------------------------------
+# Precipitation [mm] accumulated from the onset of the wet season to day
+# t (included). NaN if t is not in a wet season
+#------------------------------------------------------------------------
+def rainyseason_since_onset(sidx,k,t):
+    i=rainyseason_season_of(sidx,k,t)
+    onset=sidx['start'][np.maximum(i,0)] % sidx['span']
+    return np.where(i >= 0,rainyseason_accumulated(sidx,k,onset,np.asarray(t)+1),np.nan)
+
+#========================================================================
+#  Subroutines that save and read the season index
+#========================================================================
+def rainyseason_seasonindex_save(outfile,sidx):
+    rootgrp=Dataset(outfile,"w",format="NETCDF4")
+    rootgrp.createDimension("lat",len(sidx['lat']))
+    rootgrp.createDimension("lon",len(sidx['lon']))
+    rootgrp.createDimension("point",len(sidx['index']))
+    rootgrp.createDimension("day1",sidx['ntot']+1)
+    rootgrp.createDimension("year1",sidx['cumbase'].shape[1])
+    for name,long_name in [('lat','Latitude'),('lon','Longitude')]:
+        var=rootgrp.createVariable(name,"f8",(name,))
+        var.long_name=long_name
+        var[:]=sidx[name]
+    var=rootgrp.createVariable("index","i8",("point",))
+    var.long_name='Position of the point in the flattened (lat,lon) grid'
+    var[:]=sidx['index']
+    for name,long_name in [('onset','Sorted keys (point*span+day index) of the wet season onsets'),
+                           ('demise','Sorted keys (point*span+day index) of the wet season demises'),
+                           ('start','Keys of the first day of the wet seasons'),
+                           ('end','Keys of the day after the last day of the wet seasons')]:
+        rootgrp.createDimension(name,len(sidx[name]))
+        var=rootgrp.createVariable(name,"i8",(name,))
+        var.long_name=long_name
+        var[:]=sidx[name]
+    var=rootgrp.createVariable("cumbase","f8",("point","year1"),zlib=True)
+    var.long_name='Precipitation accumulated before Jan 1st of each year of the record [mm]'
+    var[:]=sidx['cumbase']
+    var=rootgrp.createVariable("cumprec","f4",("point","day1"),zlib=True)
+    var.long_name='Precipitation accumulated since the last Jan 1st [mm]'
+    var[:]=sidx['cumprec']
+    rootgrp.yr0=sidx['yr0']
+    rootgrp.tot=sidx['tot']
+    rootgrp.ntot=sidx['ntot']
+    rootgrp.span=sidx['span']
+    rootgrp.close()
+    return outfile
+
+def rainyseason_seasonindex_load(filename):
+    rootgrp=Dataset(filename,"r")
+    sidx={}
+    for name in ['lat','lon','index','onset','demise','start','end','cumbase','cumprec']:
+        sidx[name]=np.asarray(rootgrp.variables[name][:])
+    for name in ['yr0','tot','ntot','span']:
+        sidx[name]=int(getattr(rootgrp,name))
+    rootgrp.close()
+    sidx['wetcum']=np.concatenate(([0],np.cumsum(sidx['end']-sidx['start'])))
+    return sidx
+#========================================================================
+#                             End of subroutine
+#========================================================================
+
+if __name__ == "__main__":
+   sidx=rainyseason_seasonindex_load(sys.argv[1])
+   k=rainyseason_seasonindex_point(sidx,float(sys.argv[2]),float(sys.argv[3]))
+   if k < 0:
+      print('No results at ',sys.argv[2],sys.argv[3])
+      sys.exit(1)
+   yy,mm,dd=[int(ss) for ss in sys.argv[4].split('-')]
+   t=rainyseason_daynum(sidx,yy,mm,dd)
+   print('Wet season:        ',bool(rainyseason_in_season(sidx,k,t)))
+   print('Rain since onset:  ',float(rainyseason_since_onset(sidx,k,t)),' mm')
+   print('Wet days of month: ',int(rainyseason_wet_days_month(sidx,k,yy,mm)))
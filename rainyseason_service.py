@@ -0,0 +1,219 @@
+#!/usr/bin/python
+#========================================================================
+#  Local point-query service: characteristics of the rainy and dry
+# seasons of single grid points of a NetCDF file, for interactive use
+# (e.g. a dashboard). Only the Python standard library is used for the
+# HTTP server.
+# filename --> name of the NetCDF file
+# varname  --> name of the precipitation variable
+# member   --> index of the ensemble member (None for no ensemble dimension)
+# years    --> (first year, last year) or None for the whole period
+# maxpoints, maxbytes --> size limits of the cache of point results
+# maxclim  --> size limit (points) of the cache of climatologies
+#
+# Each request reads the series of one grid point (the grid point
+# nearest to lat, lon) from the file and runs the calculation of
+# rainyseason_pipeline for that point, with the curves of accumulated
+# anomalies (wscurve, dscurve). The climatologies (rm, startwet) and the
+# results of the recent points are kept in LRU caches
+# (rainyseason_cache) with the key (file, variable, member, i, j): a point
+# in the cache is answered without reading the file, a point whose
+# results were evicted but whose climatology is still in the cache skips
+# the climatology, and a point without valid data is not read again
+# (the caches are looked up before the file is read). The file is opened
+# once by rainyseason_service and kept open (rainyseason_service_close
+# closes it); only the reads of the series are serialized by a lock (the
+# NetCDF library is not thread safe). The caches are shared by the
+# threads of the server.
+#
+# rainyseason_point returns the results of a point as a dictionary that
+# can be saved as JSON: lat, lon (of the grid point), years, onset and
+# demise ({'jday','day','month','year'}: lists with None for missing
+# years), durwet, durdry, totwet, totdry, rm, startwet and, with
+# curves=True, wscurve and dscurve (lists (years,tot/2)). The last two
+# years are not returned, as in the output files.
+#
+# HTTP requests (GET):
+#  /point?lat=-10.5&lon=300.&curves=1   results of a point (JSON)
+#  /stats                               sizes, hits and misses of the caches
+# Errors are answered with status 400 (bad request) or 404 (no data) and
+# a JSON object {'error': message}.
+#
+# Command line use:
+#  python rainyseason_service.py file.nc varname [port] [first year] [last year]
+#========================================================================
+import sys
+import json
+import threading
+import collections
+import numpy as np
+from urllib.parse import urlparse, parse_qs
+from netCDF4 import Dataset
+from rainyseason_read import rainyseason_subset, rainyseason_subset_tile, rainyseason_slab
+from rainyseason_calendar import rainyseason_calendar
+from rainyseason_pack import rainyseason_pack, rainyseason_valid, rainyseason_format
+from rainyseason_climatology import rainyseason_climatology
+from rainyseason_pipeline import rainyseason_seasons
+from rainyseason_output import rainyseason_field
+#------------------------------------------------------------------------
+# LRU cache with a limit of items and of bytes
+#------------------------------------------------------------------------
+def rainyseason_cache(maxitems,maxbytes=None):
+    return {'items':collections.OrderedDict(),'maxitems':maxitems,'maxbytes':maxbytes,'bytes':0,
+            'hits':0,'misses':0,'lock':threading.Lock()}
+
+def rainyseason_cache_get(cache,key):
+    with cache['lock']:
+         if key not in cache['items']:
+            cache['misses']=cache['misses']+1
+            return None
+         cache['hits']=cache['hits']+1
+         cache['items'].move_to_end(key)
+         return cache['items'][key][0]
+
+def rainyseason_cache_put(cache,key,value,nbytes=0):
+    with cache['lock']:
+         if key in cache['items']:
+            cache['bytes']=cache['bytes']-cache['items'].pop(key)[1]
+         cache['items'][key]=(value,nbytes)
+         cache['bytes']=cache['bytes']+nbytes
+         while len(cache['items']) > cache['maxitems'] or (cache['maxbytes'] is not None and cache['bytes'] > cache['maxbytes'] and len(cache['items']) > 1):
+             cache['bytes']=cache['bytes']-cache['items'].popitem(last=False)[1][1]
+
+def rainyseason_cache_stats(cache):
+    with cache['lock']:
+         return {'items':len(cache['items']),'bytes':cache['bytes'],'hits':cache['hits'],'misses':cache['misses']}
+
+#========================================================================
+#  Subroutine that opens the file: calendar, grid and caches of the service
+#========================================================================
+def rainyseason_service(filename,varname,member=None,years=None,tot=365,dper=25.,npass=50,dtype=np.float64,maxpoints=256,maxbytes=256*1024**2,maxclim=100000):
+    subset=rainyseason_subset(filename,None,years)
+    day,month,year,jday,leap=rainyseason_calendar(subset['yr0'],1,1,subset['ntot'],0)
+    rootgrp=Dataset(filename,"r")
+    return {'filename':filename,'varname':varname,'member':member,'subset':subset,'tot':tot,'dper':dper,'npass':npass,'dtype':dtype,
+            'yr0':subset['yr0'],'nyrs':int(year.max()-year.min())+1,'calendar':(day,month,year,jday,leap),
+            'rootgrp':rootgrp,'var':rootgrp.variables[varname],
+            'results':rainyseason_cache(maxpoints,maxbytes),'climatology':rainyseason_cache(maxclim),'lock':threading.Lock()}
+
+def rainyseason_service_close(service):
+    with service['lock']:
+         service['rootgrp'].close()
+
+#========================================================================
+#  Subroutine that calculates (or finds in the cache) the results of the
+# grid point nearest to (lat, lon). Raises ValueError if the point has
+# no valid data
+#========================================================================
+def rainyseason_point(service,lat,lon,curves=False):
+    subset=service['subset']
+    i=int(np.argmin(np.abs(subset['lat']-lat)))
+    j=int(np.argmin(np.abs(np.mod(subset['lon']-lon+180.,360.)-180.)))
+    key=rainyseason_point_key(service,i,j)
+    out=rainyseason_cache_get(service['results'],key)
+    if out is None:
+       out=rainyseason_point_calculate(service,i,j)
+       rainyseason_cache_put(service['results'],key,out,len(json.dumps(out)))
+    if not curves:
+       out=dict([(key,val) for key,val in out.items() if key not in ['wscurve','dscurve']])
+    return out
+
+def rainyseason_point_key(service,i,j):
+    return (service['filename'],service['varname'],service['member'],i,j)
+
+#------------------------------------------------------------------------
+# The climatology cache holds (None, None) for the points without valid
+# data
+#------------------------------------------------------------------------
+def rainyseason_point_calculate(service,i,j):
+    day,month,year,jday,leap=service['calendar']
+    tot=service['tot']
+    nyrs=service['nyrs']
+    dtype=service['dtype']
+    key=rainyseason_point_key(service,i,j)
+    clim=rainyseason_cache_get(service['climatology'],key)
+    if clim is not None and clim[0] is None:
+       raise ValueError('no valid data at the grid point ('+str(i)+','+str(j)+')')
+    part=rainyseason_subset_tile(service['subset'],(i,i+1,j,j+1))
+    with service['lock']:
+         prec=rainyseason_slab(service['var'],service['member'],part)
+    prec=np.ma.filled(np.ma.asarray(prec,dtype=dtype),np.nan)
+    pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+    pprec,index=rainyseason_format(pprec,index,leap,service['dper'])
+    if len(index) == 0:
+       rainyseason_cache_put(service['climatology'],key,(None,None))
+       raise ValueError('no valid data at the grid point ('+str(i)+','+str(j)+')')
+    if clim is None:
+       clim=rainyseason_climatology(pprec,jday,tot,dtype)
+       rainyseason_cache_put(service['climatology'],key,clim)
+    rm,startwet=clim
+    out={'lat':float(service['subset']['lat'][i]),'lon':float(service['subset']['lon'][j]),
+         'years':list(range(service['yr0'],service['yr0']+nyrs-2)),'rm':float(rm[0]),'startwet':float(startwet[0])}
+    index,res=rainyseason_seasons(pprec,index,rm,startwet,day,month,year,jday,service['yr0'],tot,service['npass'],dtype,None,True)
+    def values(arr):
+        return [None if np.isnan(vv) else float(vv) for vv in arr]
+    for name in ['onset','demise']:
+        out[name]={}
+        for dd in ['jday','day','month','year']:
+            out[name][dd]=values(rainyseason_field(res,name+'_'+dd,(day,month,year,jday))[0:nyrs-2,0]) if len(index) > 0 else [None]*(nyrs-2)
+    for key in ['durwet','durdry','totwet','totdry']:
+        out[key]=values(res[key][0:nyrs-2,0]) if len(index) > 0 else [None]*(nyrs-2)
+    for key in ['wscurve','dscurve']:
+        out[key]=np.asarray(res[key][0,0:nyrs-2,:],dtype=np.float64).tolist() if len(index) > 0 else []
+    return out
+
+#========================================================================
+#  HTTP server. rainyseason_server creates it (port 0 = any free port,
+# see server.server_address) and rainyseason_serve runs it until it is
+# interrupted
+#========================================================================
+def rainyseason_server(service,host='127.0.0.1',port=8765):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    class Handler(BaseHTTPRequestHandler):
+          def reply(self,status,body):
+              data=json.dumps(body).encode()
+              self.send_response(status)
+              self.send_header('Content-Type','application/json')
+              self.send_header('Content-Length',str(len(data)))
+              self.end_headers()
+              self.wfile.write(data)
+
+          def do_GET(self):
+              url=urlparse(self.path)
+              query=parse_qs(url.query)
+              if url.path == '/stats':
+                 return self.reply(200,{'results':rainyseason_cache_stats(service['results']),'climatology':rainyseason_cache_stats(service['climatology'])})
+              if url.path != '/point':
+                 return self.reply(404,{'error':'unknown path '+url.path})
+              try:
+                  lat=float(query['lat'][0])
+                  lon=float(query['lon'][0])
+                  curves=query.get('curves',['0'])[0] in ['1','true','yes']
+              except (KeyError,ValueError):
+                  return self.reply(400,{'error':'lat and lon are required numbers'})
+              try:
+                  return self.reply(200,rainyseason_point(service,lat,lon,curves))
+              except ValueError as err:
+                  return self.reply(404,{'error':str(err)})
+
+          def log_message(self,format,*args):
+              return
+    return ThreadingHTTPServer((host,port),Handler)
+
+def rainyseason_serve(service,host='127.0.0.1',port=8765):
+    server=rainyseason_server(service,host,port)
+    print('Serving ',service['filename'],' on http://'+host+':'+str(server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+#========================================================================
+#                             End of subroutine
+#========================================================================
+
+if __name__ == "__main__":
+   years=(int(sys.argv[4]),int(sys.argv[5])) if len(sys.argv) > 5 else None
+   service=rainyseason_service(sys.argv[1],sys.argv[2],years=years)
+   rainyseason_serve(service,port=int(sys.argv[3]) if len(sys.argv) > 3 else 8765)
+   rainyseason_service_close(service)
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that split a gridded job in N independent shards (e.g. the
+# tasks of a job array) and merge their outputs
+# shard  --> 'i/N': shard i (0, 1, ..., N-1) of N shards
+# index  --> positions of the valid points in the flattened (lat,lon) grid
+#            (see rainyseason_pack)
+#
+# The valid points are dealt to the shards in turn (point k goes to shard
+# k % N), so every shard gets the same number of valid points (plus or
+# minus one) and the same mix of regions (e.g. slow tropical land points
+# and fast dry points), whatever the layout of the grid. Each shard saves
+# the usual output files with the tag ".shard-i-of-N" after the prefix
+# and, once all its output files are closed, a coverage file with the
+# points it was given, so a shard that stopped before the end has no
+# coverage file and is reported as missing. rainyseason_merge
+# checks that the shards are complete and do not overlap and assembles
+# the standard files.
+#
+# Command line use (after all shards have finished):
+#  python rainyseason_shard.py pathout prefix N
+#========================================================================
+import os
+import sys
+import glob
+import shutil
+import numpy as np
+from netCDF4 import Dataset
+def rainyseason_shard_parse(shard):
+    i,n=[int(ss) for ss in str(shard).split('/')]
+    if n < 1 or i < 0 or i >= n:
+       raise ValueError('shard must be i/N with 0 <= i < N: '+str(shard))
+    return i, n
+
+def rainyseason_shard_tag(i,n):
+    return '.shard-'+str(i)+'-of-'+str(n)
+
+def rainyseason_shard_points(index,i,n):
+    return np.arange(i,len(index),n)
+
+#========================================================================
+#  Subroutine that saves the coverage file of a shard: assigned(lat,lon)
+# is 1 at the valid points of the shard. nvalid is the number of valid
+# points of the whole grid. The file is written under a temporary name
+# and renamed at the end, so it only exists when it is complete
+#========================================================================
+def rainyseason_shard_coverage(pathout,prefix,i,n,index,nvalid,lats,lons):
+    outfile=pathout+'coverage.'+prefix+rainyseason_shard_tag(i,n)+'.nc'
+    rootgrp=Dataset(outfile+'.tmp',"w",format="NETCDF4")
+    rootgrp.createDimension("lon",len(lons))
+    rootgrp.createDimension("lat",len(lats))
+    latitudes=rootgrp.createVariable("lat","f8",("lat",))
+    longitudes=rootgrp.createVariable("lon","f8",("lon",))
+    latitudes[:]=lats[:]
+    longitudes[:]=lons[:]
+    var=rootgrp.createVariable("assigned","i1",("lat","lon",))
+    var.long_name='Valid points calculated by the shard'
+    grid=np.zeros((len(lats)*len(lons)),dtype=np.int8)
+    grid[index]=1
+    var[:]=grid.reshape(len(lats),len(lons))
+    rootgrp.shard=i
+    rootgrp.nshard=n
+    rootgrp.nvalid=int(nvalid)
+    rootgrp.close()
+    os.replace(outfile+'.tmp',outfile)
+    return outfile
+
+#========================================================================
+#  Subroutine that merges the outputs of N shards. Raises ValueError if a
+# shard or one of its files is missing, if two shards calculated the same
+# point or if a valid point was not calculated. The variables with the
+# dimensions (...,lat,lon) are taken from the shard that calculated each
+# point; everything else is copied from shard 0. Returns the merged files
+#========================================================================
+def rainyseason_merge(pathout,prefix,n,remove=False):
+    covs=[pathout+'coverage.'+prefix+rainyseason_shard_tag(i,n)+'.nc' for i in range(0,n)]
+    missing=[ff for ff in covs if not os.path.exists(ff)]
+    if len(missing) > 0:
+       raise ValueError('missing shards: '+', '.join(missing))
+    assigned=[]
+    nvalid=[]
+    for ff in covs:
+        rootgrp=Dataset(ff,"r")
+        if int(rootgrp.nshard) != n:
+           raise ValueError(ff+' belongs to a job of '+str(rootgrp.nshard)+' shards')
+        assigned.append(np.asarray(rootgrp.variables['assigned'][:]) > 0)
+        nvalid.append(int(rootgrp.nvalid))
+        rootgrp.close()
+    assigned=np.array(assigned)
+    count=np.sum(assigned,axis=0)
+    if len(set(nvalid)) != 1:
+       raise ValueError('the shards do not come from the same input (valid points: '+str(sorted(set(nvalid)))+')')
+    if np.any(count > 1):
+       raise ValueError(str(int(np.sum(count > 1)))+' points were calculated by more than one shard')
+    if int(np.sum(count)) != nvalid[0]:
+       raise ValueError(str(nvalid[0]-int(np.sum(count)))+' valid points were not calculated')
+#------------------------------------------------------------------------
+# Output files of shard 0 and of the other shards
+#------------------------------------------------------------------------
+    tag0=rainyseason_shard_tag(0,n)
+    files=sorted(glob.glob(pathout+'*.'+prefix+tag0+'.*.nc'))
+    if len(files) == 0:
+       raise ValueError('no output files of '+prefix+tag0+' in '+pathout)
+    merged=[]
+    for f0 in files:
+        parts=[f0.replace(tag0,rainyseason_shard_tag(i,n)) for i in range(0,n)]
+        missing=[ff for ff in parts if not os.path.exists(ff)]
+        if len(missing) > 0:
+           raise ValueError('missing files: '+', '.join(missing))
+        outfile=f0.replace(tag0,'')
+        shutil.copyfile(f0,outfile)
+        rootgrp=Dataset(outfile,"a")
+        for vname,var in rootgrp.variables.items():
+            if var.dimensions[-2:] != ('lat','lon'):
+               continue
+            data=var[:]
+            for i in range(1,n):
+                part=Dataset(parts[i],"r")
+                if part.variables[vname].shape != var.shape:
+                   raise ValueError(parts[i]+': '+vname+' has shape '+str(part.variables[vname].shape))
+                data[...,assigned[i]]=part.variables[vname][:][...,assigned[i]]
+                part.close()
+            var[:]=data
+        rootgrp.close()
+        merged.append(outfile)
+    if remove:
+       for f0 in files:
+           for i in range(0,n):
+               os.remove(f0.replace(tag0,rainyseason_shard_tag(i,n)))
+       for ff in covs:
+           os.remove(ff)
+    return merged
+#========================================================================
+#                             End of subroutine
+#========================================================================
+
+if __name__ == "__main__":
+   try:
+       merged=rainyseason_merge(sys.argv[1],sys.argv[2],int(sys.argv[3]))
+   except ValueError as err:
+       print('Merge failed: ',err)
+       sys.exit(1)
+   for ff in merged:
+       print(ff,' saved')
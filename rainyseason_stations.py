@@ -0,0 +1,188 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that calculate the characteristics of the rainy and dry
+# seasons for station (rain gauge) records
+# filename --> name of the file of station records:
+#              .csv      long format, one row per station and day, with
+#                        columns station, date (YYYY-MM-DD), precip and,
+#                        optionally, lat and lon
+#              .parquet  same columns as the CSV files (requires pandas)
+#              .nc       NetCDF station file with a variable (station,time)
+#                        and the variables lat(station), lon(station) and,
+#                        optionally, station(station) with the station names
+# varname  --> name of the precipitation column (or variable)
+#
+# Missing data (empty values, masked values and negative values) are NaN.
+# Each station keeps its own record: the series is completed with missing
+# values to whole calendar years and the leading and trailing years
+# without valid data are removed. Stations with the same first year,
+# number of years and calendar (with or without Feb 29th) share the
+# calendar and are processed together as a packed array (points,time)
+# by rainyseason_pipeline. The results are written as a table with one
+# row per station and year (no grid is created).
+#========================================================================
+import csv
+import os
+import numpy as np
+from datetime import date
+from rainyseason_calendar import rainyseason_calendar, julian
+from rainyseason_pipeline import rainyseason_pipeline
+from rainyseason_output import rainyseason_field
+#------------------------------------------------------------------------
+# Station record: name, lat, lon, first date (year, month, day), noleap
+# flag (1 = no Feb 29th in the series) and daily values
+#------------------------------------------------------------------------
+def rainyseason_stations_read(filename,varname='precip',dtype=np.float64):
+    ext=os.path.splitext(filename)[1].lower()
+    if ext == '.nc':
+       return read_netcdf(filename,varname,dtype)
+    if ext in ['.parquet','.pq']:
+       try:
+           import pandas
+       except ImportError:
+           raise ImportError('pandas (with pyarrow or fastparquet) is required to read '+filename)
+       table=pandas.read_parquet(filename)
+       cols={name:[str(v) if name in ['station','date'] else v for v in table[name].tolist()] for name in table.columns}
+       return read_long(cols,varname,dtype)
+    with open(filename,'r',newline='') as ff:
+         reader=csv.DictReader(ff)
+         cols={name:[] for name in reader.fieldnames}
+         for row in reader:
+             for name in reader.fieldnames:
+                 cols[name].append(row[name])
+    return read_long(cols,varname,dtype)
+
+def read_long(cols,varname,dtype):
+    ids=np.asarray(cols['station'])
+    ordinal=np.array([date.fromisoformat(dd[0:10]).toordinal() for dd in cols['date']])
+    values=np.array([float(vv) if vv not in ['',None] else np.nan for vv in cols[varname]],dtype=np.float64)
+    stations=[]
+    for sid in dict.fromkeys(ids.tolist()):
+        pos=np.where(ids == sid)[0]
+        o0=ordinal[pos].min()
+        series=np.full((ordinal[pos].max()-o0+1),np.nan,dtype=dtype)
+        series[ordinal[pos]-o0]=values[pos]
+        lat=float(cols['lat'][pos[0]]) if 'lat' in cols else np.nan
+        lon=float(cols['lon'][pos[0]]) if 'lon' in cols else np.nan
+        d0=date.fromordinal(int(o0))
+        stations.append({'id':str(sid),'lat':lat,'lon':lon,'start':(d0.year,d0.month,d0.day),'noleap':0,'values':series})
+    return stations
+
+def read_netcdf(filename,varname,dtype):
+    import netCDF4 as nc
+    rootgrp=nc.Dataset(filename,"r")
+    time=rootgrp.variables['time']
+    calendar=getattr(time,'calendar','standard')
+    d0=nc.num2date(time[0],time.units,calendar)
+    noleap=1 if calendar in ['noleap','365_day'] else 0
+    var=rootgrp.variables[varname]
+    if var.dimensions[0] == 'time':
+       prec=np.ma.filled(np.ma.asarray(var[:,:],dtype=dtype),np.nan).T
+    else:
+       prec=np.ma.filled(np.ma.asarray(var[:,:],dtype=dtype),np.nan)
+    nsta=prec.shape[0]
+    lats=np.asarray(rootgrp.variables['lat'][:]) if 'lat' in rootgrp.variables else np.full((nsta),np.nan)
+    lons=np.asarray(rootgrp.variables['lon'][:]) if 'lon' in rootgrp.variables else np.full((nsta),np.nan)
+    if 'station' in rootgrp.variables:
+       ids=rootgrp.variables['station'][:]
+       if ids.ndim == 2:
+          ids=nc.chartostring(ids)
+       ids=[str(ss) for ss in ids]
+    else:
+       ids=[str(ss) for ss in range(0,nsta)]
+    rootgrp.close()
+    stations=[]
+    for st in range(0,nsta):
+        stations.append({'id':ids[st],'lat':float(lats[st]),'lon':float(lons[st]),'start':(d0.year,d0.month,d0.day),'noleap':noleap,'values':prec[st,:]})
+    return stations
+
+#========================================================================
+#  Subroutine that completes the records to whole years and groups the
+# stations that share the same calendar
+# Returns a list of groups (yr0, number of years, noleap, positions of
+# the stations in the list, packed array (stations,time))
+#========================================================================
+def rainyseason_stations_groups(stations):
+    groups={}
+    for st in range(0,len(stations)):
+        ss=stations[st]
+        y0,m0,d0=ss['start']
+        noleap=ss['noleap']
+        values=ss['values']
+        if noleap == 1:
+           lead=julian(d0,m0,y0)-1
+           nyrs=int(np.ceil((lead+len(values))/365.))
+           ylen=np.full((nyrs),365)
+        else:
+           lead=(date(y0,m0,d0)-date(y0,1,1)).days
+           y1=date.fromordinal(date(y0,m0,d0).toordinal()+len(values)-1).year
+           ylen=np.array([(date(yy+1,1,1)-date(yy,1,1)).days for yy in range(y0,y1+1)])
+        series=np.full((int(ylen.sum())),np.nan,dtype=values.dtype)
+        series[lead:lead+len(values)]=values
+        series[~(series >= 0.)]=np.nan
+#------------------------------------------------------------------------
+# Removing the leading and trailing years without valid data
+#------------------------------------------------------------------------
+        ends=np.cumsum(ylen)
+        valid=np.array([np.any(~np.isnan(series[ends[k]-ylen[k]:ends[k]])) for k in range(0,len(ylen))])
+        if not np.any(valid):
+           continue
+        k0=np.where(valid)[0][0]
+        k1=np.where(valid)[0][-1]
+        series=series[ends[k0]-ylen[k0]:ends[k1]]
+        key=(y0+k0,k1-k0+1,noleap)
+        groups.setdefault(key,([],[]))
+        groups[key][0].append(st)
+        groups[key][1].append(series)
+    out=[]
+    for key in sorted(groups.keys()):
+        out.append(key+(np.array(groups[key][0]),np.array(groups[key][1])))
+    return out
+
+#========================================================================
+#  Subroutine that calculates the characteristics of the rainy and dry
+# seasons of all stations. Yields (yr0, nyrs, positions, res) for each
+# group of stations: res holds the columns of the table (years,stations)
+# for the stations of the group (NaN where there are no results), with
+# the dates looked up in the calendar (see rainyseason_field). Groups with
+# less than three years of data are skipped.
+# progress --> progress of the job in stations (see rainyseason_progress)
+#========================================================================
+def rainyseason_stations(stations,tot,dper,npass,dtype=np.float64,progress=None):
+    for yr0,nyrs,noleap,pos,pprec in rainyseason_stations_groups(stations):
+        if nyrs < 3:
+           continue
+        day,month,year,jday,leap=rainyseason_calendar(yr0,1,1,pprec.shape[1],noleap)
+        index,res=rainyseason_pipeline(np.asarray(pprec,dtype=dtype),np.arange(0,len(pos)),day,month,year,jday,leap,yr0,tot,dper,npass,dtype,progress,False)
+        full={}
+        for key in columns:
+            field=rainyseason_field(res,key,(day,month,year,jday))
+            full[key]=np.full((nyrs,len(pos)),np.nan,dtype=field.dtype)
+            full[key][:,index]=field
+        yield yr0, nyrs, pos, full
+
+#========================================================================
+#  Subroutine that saves the results of the stations as a CSV table with
+# one row per station and year (the last two years are not saved)
+# outfile --> name of the output file
+# results --> list of (yr0, nyrs, positions, res) (see rainyseason_stations)
+#========================================================================
+columns=['onset_jday','onset_day','onset_month','onset_year','demise_jday','demise_day','demise_month','demise_year','durwet','durdry','totwet','totdry']
+def rainyseason_stations_write(outfile,stations,results,missval):
+    with open(outfile,'w',newline='') as ff:
+         writer=csv.writer(ff)
+         writer.writerow(['station','lat','lon','year']+columns)
+         for yr0,nyrs,pos,res in results:
+             for k in range(0,len(pos)):
+                 ss=stations[pos[k]]
+                 for yy in range(0,nyrs-2):
+                     row=[ss['id'],ss['lat'],ss['lon'],yr0+yy]
+                     for key in columns:
+                         val=float(res[key][yy,k])
+                         if np.isnan(val):
+                            val=missval
+                         row.append(int(val) if key not in ['totwet','totdry'] else round(val,3))
+                     writer.writerow(row)
+#========================================================================
+#                             End of subroutine
+#========================================================================
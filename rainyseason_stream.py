@@ -0,0 +1,126 @@
+#!/usr/bin/python
+#========================================================================
+#  Tiled driver with read-ahead and write-behind: the input is read from
+# a NetCDF file one tile at a time and each tile is saved as soon as it
+# has been calculated
+# filename --> name of the NetCDF file
+# varname  --> name of the precipitation variable
+# member   --> index of the ensemble member (None for no ensemble dimension)
+# subset   --> region and period of the file (see rainyseason_subset). The
+#              tiles are tiles of the grid of the subset
+# tiles    --> list of tiles (lat0,lat1,lon0,lon1) (see rainyseason_tiles)
+# files    --> output files (rainyseason_create) or stores (rainyseason_zarr_create)
+# backend  --> 'netcdf' or 'zarr'
+# prefetch --> number of tiles that can wait in each queue
+# progress --> progress of the job in tiles (see rainyseason_progress)
+# summary  --> accumulator of the summary (see rainyseason_summary), or None
+#
+# Three threads work at the same time: a reader reads and packs the next
+# tiles, the calling thread calculates the current tile and a writer saves
+# the finished tiles. The tiles go from one thread to the next through
+# queues of at most prefetch tiles, so no more than 2 x prefetch + 2 tiles
+# are in memory. The NetCDF (HDF5) library releases the GIL while it reads
+# and writes, but it is not thread safe: the calls to the library are
+# serialized by a lock (held by rainyseason_read only while it calls the
+# library), so reading and writing overlap with the calculation but not
+# with each other. Zarr stores are written without the lock.
+# An error in any thread (including the calculation) stops the job: the
+# reader and the writer are stopped and joined, and the first error is
+# raised by rainyseason_stream.
+#========================================================================
+import queue
+import threading
+import numpy as np
+from rainyseason_read import rainyseason_read, rainyseason_subset_tile
+from rainyseason_pack import rainyseason_pack, rainyseason_valid
+from rainyseason_pipeline import rainyseason_pipeline
+from rainyseason_calendar import rainyseason_starts
+from rainyseason_output import rainyseason_write
+from rainyseason_zarr import rainyseason_zarr_write
+from rainyseason_summary import rainyseason_summary_sums, rainyseason_summary_add
+from rainyseason_progress import rainyseason_stage, rainyseason_step, rainyseason_stage_end
+def rainyseason_stream(filename,varname,member,subset,tiles,files,backend,nlat,nlon,nyrs,day,month,year,jday,leap,yr0,tot,missval,dper,npass,dtype=np.float64,prefetch=2,progress=None,summary=None):
+    lock=threading.Lock()
+    inq=queue.Queue(maxsize=prefetch)
+    outq=queue.Queue(maxsize=prefetch)
+    errors=[]
+#------------------------------------------------------------------------
+# Reader: packed tiles, with the positions of the points in the whole grid
+#------------------------------------------------------------------------
+    def reader():
+        try:
+            for tt in tiles:
+                if len(errors) > 0:
+                   break
+                prec=rainyseason_read(filename,varname,member,dtype,rainyseason_subset_tile(subset,tt),lock)
+                pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+                prec=None
+                index=(tt[0]+index//(tt[3]-tt[2]))*nlon+tt[2]+index % (tt[3]-tt[2])
+                inq.put((tt,pprec,index))
+        except BaseException as err:
+            errors.append(err)
+        finally:
+            inq.put(None)
+#------------------------------------------------------------------------
+# Writer: after an error the remaining tiles are discarded
+#------------------------------------------------------------------------
+    def writer():
+        while True:
+            item=outq.get()
+            if item is None:
+               return
+            if len(errors) > 0:
+               continue
+            tt,res,index=item
+            try:
+                if backend == 'zarr':
+                   rainyseason_zarr_write(files,res,index,nlat,nlon,nyrs,missval,(day,month,year,jday),tt)
+                else:
+                   with lock:
+                        rainyseason_write(files,res,index,nlat,nlon,nyrs,missval,(day,month,year,jday),None,tt)
+            except BaseException as err:
+                errors.append(err)
+    rt=threading.Thread(target=reader,daemon=True)
+    wt=threading.Thread(target=writer,daemon=True)
+    rt.start()
+    wt.start()
+    npts=0
+    done=0
+    starts=rainyseason_starts(jday)     # shared by all tiles
+    rainyseason_stage(progress,'tiles')
+    try:
+        while True:
+            item=inq.get()
+            if item is None or len(errors) > 0:
+               break
+            tt,pprec,index=item
+            if len(index) > 0:
+               index,res=rainyseason_pipeline(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,dtype,curves=False,starts=starts)
+               outq.put((tt,res,index))
+               if summary is not None:
+                  rainyseason_summary_add(summary,rainyseason_summary_sums(res,(day,month,year,jday),nyrs,tot),index)
+               npts=npts+len(index)
+            done=done+1
+            rainyseason_step(progress,'tiles',done,len(tiles))
+    except BaseException as err:
+        errors.append(err)
+    finally:
+#------------------------------------------------------------------------
+# The reader stops at its next tile after an error: the input queue is
+# drained so that it is not blocked on a full queue
+#------------------------------------------------------------------------
+        outq.put(None)
+        while rt.is_alive():
+            try:
+                inq.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        rt.join()
+        wt.join()
+    if len(errors) > 0:
+       raise errors[0]
+    rainyseason_stage_end(progress,'tiles')
+    return npts
+#========================================================================
+#                             End of subroutine
+#========================================================================
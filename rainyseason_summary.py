@@ -0,0 +1,106 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that calculate climatological summaries of the
+# characteristics of the rainy and dry seasons while the results of each
+# tile are produced, so the output files do not have to be read again
+# nlat    --> number of latitudes
+# nlon    --> number of longitudes
+# res     --> dictionary of packed results of a tile (see rainyseason_characteristics)
+# index   --> positions of the packed points in the flattened (lat,lon) grid
+# cal     --> calendar (day, month, year, jday) of the dates (see rainyseason_field)
+# nyrs    --> number of years of the results (the last two years are not
+#             used, as in the output files)
+# tot     --> total number of points for one year of data (365)
+#
+# rainyseason_summary_sums reduces the results of a tile to sums over the
+# years of each point: number of years, sum and sum of squares (running
+# moments), sums of the year, of its square and of the year times the
+# value (regression sums) and, for the dates, sums of the cosine and sine
+# of the date (circular sums). The dates are unwrapped around their
+# circular mean date before the moments and the regression sums are
+# calculated (all the years of a point are in the same tile), as in
+# rainyseason_bootstrap. rainyseason_summary_add stores the sums of a
+# tile in the accumulator created by rainyseason_summary; only the sums
+# (a few arrays (points)) are kept, not the results.
+#
+# rainyseason_summary_write saves the summary file
+# (summary.wet.season.prefix.years.nc) with, for onset, demise, durwet,
+# durdry, totwet and totdry: mean (circular mean for the dates [Day of
+# Year]), std (sample standard deviation), trend [unit/year] (least
+# squares) and n (number of years with data). NaN (missval) where there
+# are not enough years.
+#========================================================================
+import math
+import numpy as np
+from rainyseason_output import rainyseason_field, rainyseason_fields
+variables=[('onset','onset_jday',True,'Wet season onset','Day of Year'),
+           ('demise','demise_jday',True,'Wet season demise','Day of Year'),
+           ('durwet','durwet',False,'Duration of the wet season','day'),
+           ('durdry','durdry',False,'Duration of the dry season','day'),
+           ('totwet','totwet',False,'Total precipitation during the wet season','mm'),
+           ('totdry','totdry',False,'Total precipitation during the dry season','mm')]
+sums=['n','sx','sxx','st','stt','stx']
+def rainyseason_summary(nlat,nlon):
+    summ={'filled':np.zeros((nlat*nlon),dtype=bool)}
+    for name,key,circ,long_name,units in variables:
+        for ss in sums+(['scos','ssin'] if circ else []):
+            summ[name+'_'+ss]=np.zeros((nlat*nlon))
+    return summ
+
+def rainyseason_summary_sums(res,cal,nyrs,tot):
+    out={}
+    tt=np.arange(0,nyrs-2,dtype=np.float64)[:,np.newaxis]
+    for name,key,circ,long_name,units in variables:
+        x=np.asarray(rainyseason_field(res,key,cal)[0:nyrs-2,:],dtype=np.float64)
+        ok=~np.isnan(x)
+        if circ:
+           ang=2.*math.pi*x/float(tot)
+           out[name+'_scos']=np.sum(np.where(ok,np.cos(ang),0.),axis=0)
+           out[name+'_ssin']=np.sum(np.where(ok,np.sin(ang),0.),axis=0)
+           ref=np.arctan2(out[name+'_ssin'],out[name+'_scos'])*float(tot)/(2.*math.pi)
+           x=x-ref[np.newaxis,:]
+           x=x-float(tot)*np.round(x/float(tot))     # unwrapped around ref
+        x=np.where(ok,x,0.)
+        t=np.where(ok,tt,0.)
+        out[name+'_n']=np.sum(ok,axis=0).astype(np.float64)
+        out[name+'_sx']=np.sum(x,axis=0)
+        out[name+'_sxx']=np.sum(x*x,axis=0)
+        out[name+'_st']=np.sum(t,axis=0)
+        out[name+'_stt']=np.sum(t*t,axis=0)
+        out[name+'_stx']=np.sum(t*x,axis=0)
+    return out
+
+def rainyseason_summary_add(summ,sums,index):
+    for key in sums.keys():
+        summ[key][index]=sums[key]
+    summ['filled'][index]=True
+
+#========================================================================
+#  Subroutine that saves the summary file
+# outfile --> name of the output file
+# lats    --> array with latitude values
+# lons    --> array with longitude values
+#========================================================================
+def rainyseason_summary_write(outfile,summ,nlat,nlon,lats,lons,tot,missval):
+    index=np.where(summ['filled'])[0]
+    fields=[]
+    for name,key,circ,long_name,units in variables:
+        s={ss:summ[name+'_'+ss][index] for ss in sums}
+        n=s['n']
+        with np.errstate(divide='ignore',invalid='ignore'):
+             mean=np.where(n > 0,s['sx']/n,np.nan)
+             std=np.where(n > 1,np.sqrt(np.maximum(s['sxx']-s['sx']*s['sx']/n,0.)/(n-1.)),np.nan)
+             den=n*s['stt']-s['st']*s['st']
+             trend=np.where((n > 2) & (den > 0.),(n*s['stx']-s['st']*s['sx'])/den,np.nan)
+        if circ:
+           ref=np.arctan2(summ[name+'_ssin'][index],summ[name+'_scos'][index])*float(tot)/(2.*math.pi)
+           mean=np.where(n > 0,np.mod(ref-1.,float(tot))+1.,np.nan)     # back to [1,tot]
+        fields.append((name+'_mean',long_name+', mean'+(' (circular)' if circ else '')+' ['+units+']',mean))
+        fields.append((name+'_std',long_name+', standard deviation ['+('day' if circ else units)+']',std))
+        fields.append((name+'_trend',long_name+', trend ['+('day' if circ else units)+'/year]',trend))
+        fields.append((name+'_n',long_name+', number of years',np.where(n > 0,n,np.nan)))
+    rainyseason_fields(outfile,fields,index,nlat,nlon,lats,lons,missval)
+    return outfile
+#========================================================================
+#                             End of subroutine
+#========================================================================
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that calculate the characteristics of the rainy and dry
+# seasons for a grid of parameter values (sensitivity studies)
+# sweep --> dictionary of lists of parameter values. Keys:
+#           'npass' : number of passes of the smoothing (50)
+#           'dper'  : minimum percentage of missing data tolerated (25.)
+#           'qc1'   : IQR factor of the quality control of the first pass (1.5)
+#           'qc2'   : IQR factor of the quality control of the second pass (3.)
+#           'mthres': maximum fraction of missing years (0.33)
+#           Parameters that are not given take the default values above.
+#
+# The stages shared by all combinations are calculated once: formatting
+# and climatology (dper only selects points afterwards) and the first
+# pass. The second pass is calculated once for each value of npass, for
+# the union of the years rejected by any value of qc1. Only the quality
+# control, the masking and the durations are calculated for each
+# combination of parameters.
+#
+# rainyseason_sweep yields (k, combination, index, res) for each
+# combination k (a dictionary of parameter values) in the order given by
+# rainyseason_combinations.
+#========================================================================
+import itertools
+import numpy as np
+from netCDF4 import Dataset
+from rainyseason_pack import rainyseason_format
+from rainyseason_climatology import rainyseason_climatology
+from rainyseason_calendar import rainyseason_starts
+from rainyseason_characteristics import rainyseason_firstpass, rainyseason_rejected, rainyseason_secondpass, rainyseason_combine, rainyseason_durations
+defaults={'npass':50,'dper':25.,'qc1':1.5,'qc2':3.,'mthres':0.33}
+names=['npass','dper','qc1','qc2','mthres']
+def rainyseason_combinations(sweep):
+    values=[list(sweep.get(name,[defaults[name]])) for name in names]
+    return [dict(zip(names,combo)) for combo in itertools.product(*values)]
+
+def rainyseason_sweep(pprec,index,day,month,year,jday,leap,yr0,tot,sweep,dtype=np.float64):
+    combos=rainyseason_combinations(sweep)
+#------------------------------------------------------------------------
+# Formatting with the most tolerant dper. The number of valid data of
+# each point is kept to apply the other values of dper
+#------------------------------------------------------------------------
+    dpers=sorted(set([cc['dper'] for cc in combos]))
+    pprec,index=rainyseason_format(pprec,index,leap,max(dpers))
+    ntot=pprec.shape[1]
+    nval=np.sum(~np.isnan(pprec),axis=1)
+    rm,startwet=rainyseason_climatology(pprec,jday,tot,dtype)
+    id=np.where(rm > 0.)
+    pprec=pprec[id[0],:]
+    index=index[id]
+    nval=nval[id]
+    rm=rm[id]
+    startwet=startwet[id]
+#------------------------------------------------------------------------
+# First pass: shared by all combinations
+#------------------------------------------------------------------------
+    starts=rainyseason_starts(jday)
+    first=rainyseason_firstpass(pprec,rm,startwet,jday,day,month,year,tot,dtype,starts=starts)
+    need_on=np.zeros(first['onset'].shape,dtype=bool)
+    need_de=np.zeros(first['demise'].shape,dtype=bool)
+    for qc1 in sorted(set([cc['qc1'] for cc in combos])):
+        non,nde=rainyseason_rejected(first,tot,qc1)
+        need_on=need_on | non
+        need_de=need_de | nde
+#------------------------------------------------------------------------
+# Second pass: one for each value of npass
+#------------------------------------------------------------------------
+    second={}
+    for npass in sorted(set([cc['npass'] for cc in combos])):
+        second[npass]=rainyseason_secondpass(pprec,rm,startwet,jday,day,month,year,tot,npass,need_on,need_de,dtype,starts)
+#------------------------------------------------------------------------
+# Quality control, masking and durations for each combination
+#------------------------------------------------------------------------
+    for k in range(0,len(combos)):
+        cc=combos[k]
+        res=rainyseason_combine(first,second[cc['npass']],tot,cc['qc1'],cc['qc2'])
+        res=rainyseason_durations(pprec,res,yr0,tot,cc['mthres'],dtype)
+        keep=np.where(nval >= (ntot-0.01*cc['dper']*ntot))[0]
+        for key in res.keys():
+            res[key]=res[key][:,keep]
+        yield k, cc, index[keep], res
+
+#========================================================================
+#  Subroutine that saves the values of the parameters along the "param"
+# dimension of the output files (see rainyseason_create)
+#========================================================================
+def rainyseason_sweep_params(files,combos):
+    for outfile in files:
+        rootgrp = Dataset(outfile, "a")
+        for name in names:
+            var = rootgrp.createVariable("param_"+name,"f8",("param",))
+            var.long_name = 'Value of '+name
+            var[:]=np.array([cc[name] for cc in combos],dtype=np.float64)
+        rootgrp.close()
+#========================================================================
+#                             End of subroutine
+#========================================================================
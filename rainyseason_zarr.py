@@ -0,0 +1,121 @@
+#!/usr/bin/python
+#========================================================================
+#  Subroutines that save the characteristics of the rainy and dry seasons
+# as Zarr stores (requires zarr >= 3) on the local file system. The stores
+# use the Zarr format 2 with consolidated metadata and the dimension names
+# of xarray (_ARRAY_DIMENSIONS), so they can be opened with xarray.open_zarr
+# pathout --> path of the directory to where the output will be saved
+# prefix  --> name of the dataset used in the name of the output stores
+# lats    --> array with latitude values
+# lons    --> array with longitude values
+# yr0     --> first year of data
+# nyrs    --> number of years of the results (the last two years are not saved)
+# missval --> value for missing values
+# tile    --> (number of latitudes, number of longitudes) of the processing
+#             tiles. The chunks of the stores have the size of one tile
+# members --> list of names of the extra dimension (see rainyseason_create)
+# dimname --> name of the extra dimension
+#
+# There is one store for each product of rainyseason_output, with the
+# same variables as the NetCDF files. Each tile (and each member) is a
+# separate set of chunks, so independent processes can write their own
+# tiles at the same time without locking. rainyseason_zarr_consolidate
+# saves the consolidated metadata once all tiles have been written.
+#========================================================================
+import numpy as np
+try:
+    import zarr
+except ImportError:
+    zarr=None
+from rainyseason_output import products, rainyseason_field
+from rainyseason_summary import rainyseason_summary_sums
+from rainyseason_pack import rainyseason_unpack
+from rainyseason_pipeline import rainyseason_pipeline, rainyseason_member
+def rainyseason_zarr_create(pathout,prefix,lats,lons,yr0,nyrs,missval,tile,members=None,dimname="member"):
+    if zarr is None:
+       raise ImportError('zarr is required to save the output as Zarr stores')
+    stores=[]
+    for name,variables in products:
+        store=pathout+name+"."+prefix+"."+str(int(yr0))+"-"+str(int(yr0)+nyrs-3)+".zarr"
+        root=zarr.open_group(store,mode="w",zarr_format=2)
+        dims=("time","lat","lon",)
+        shape=(nyrs-2,len(lats),len(lons),)
+        chunks=(nyrs-2,tile[0],tile[1],)
+        if members is not None:
+           dims=(dimname,)+dims
+           shape=(len(members),)+shape
+           chunks=(1,)+chunks
+           mems=root.create_array(dimname,shape=(len(members),),dtype="i4")
+           mems.attrs['_ARRAY_DIMENSIONS']=[dimname]
+           mems.attrs['long_name']={"member":'Dataset or ensemble member',"normal":'Reference period of the climatology'}.get(dimname,dimname)
+           mems.attrs['members']=', '.join([str(mm) for mm in members])
+           mems[:]=np.arange(0,len(members),1)
+        times=root.create_array("time",shape=(nyrs-2,),dtype="i4")
+        times.attrs['_ARRAY_DIMENSIONS']=["time"]
+        times.attrs['long_name']='Time'
+        times.attrs['units']='years since '+str(int(yr0))+'-01-01 00:00'
+        times[:]=np.arange(0,nyrs-2,1)
+        latitudes=root.create_array("lat",shape=(len(lats),),dtype="f8")
+        latitudes.attrs['_ARRAY_DIMENSIONS']=["lat"]
+        latitudes.attrs['units']='degrees_north'
+        latitudes.attrs['long_name']='Latitude'
+        latitudes[:]=lats[:]
+        longitudes=root.create_array("lon",shape=(len(lons),),dtype="f8")
+        longitudes.attrs['_ARRAY_DIMENSIONS']=["lon"]
+        longitudes.attrs['units']='degrees_east'
+        longitudes.attrs['long_name']='Longitude'
+        longitudes[:]=lons[:]
+        for vname,key,long_name in variables:
+            var=root.create_array(vname,shape=shape,chunks=chunks,dtype="f4",fill_value=missval)
+            var.attrs['_ARRAY_DIMENSIONS']=list(dims)
+            var.attrs['long_name']=long_name
+        stores.append(store)
+    return stores
+
+#========================================================================
+#  Subroutine that writes the results of one tile
+# res   --> dictionary of packed results (see rainyseason_characteristics)
+# index --> positions of the packed points in the flattened (lat,lon) grid.
+#           All points must fall in the tile
+# cal   --> calendar (day, month, year, jday) of the dates (see rainyseason_field)
+# tile  --> (lat0,lat1,lon0,lon1) of the tile (see rainyseason_tiles)
+#========================================================================
+def rainyseason_zarr_write(stores,res,index,nlat,nlon,nyrs,missval,cal,tile,member=None):
+    i0,i1,j0,j1=tile
+    local=(index//nlon-i0)*(j1-j0)+(index % nlon-j0)
+    for store,(name,variables) in zip(stores,products):
+        root=zarr.open_group(store,mode="r+")
+        for vname,key,long_name in variables:
+            data=rainyseason_unpack(rainyseason_field(res,key,cal)[0:nyrs-2,:],local,i1-i0,j1-j0,np.nan)
+            data[np.isnan(data)]=missval
+            if member is None:
+               root[vname][:,i0:i1,j0:j1]=data
+            else:
+               root[vname][member,:,i0:i1,j0:j1]=data
+
+def rainyseason_zarr_consolidate(stores):
+    for store in stores:
+        zarr.consolidate_metadata(store)
+
+#========================================================================
+#  Subroutines executed by the workers: they calculate and write one tile
+# (rainyseason_zarr_tile) or one member of a batch (rainyseason_zarr_member)
+# and return the number of points with results. progress (see
+# rainyseason_progress) is only used when the tiles run in the main process.
+# With summary=True, rainyseason_zarr_tile also returns the positions of
+# the points and their sums for the summary (see rainyseason_summary)
+#========================================================================
+def rainyseason_zarr_tile(stores,pprec,index,tile,nlat,nlon,nyrs,day,month,year,jday,leap,yr0,tot,missval,dper,npass,dtype=np.float64,progress=None,summary=False):
+    index,res=rainyseason_pipeline(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,dtype,progress,False)
+    rainyseason_zarr_write(stores,res,index,nlat,nlon,nyrs,missval,(day,month,year,jday),tile)
+    if summary:
+       return len(index), index, rainyseason_summary_sums(res,(day,month,year,jday),nyrs,tot)
+    return len(index)
+
+def rainyseason_zarr_member(stores,filename,member,k,varname,nlat,nlon,nyrs,day,month,year,jday,leap,yr0,tot,missval,dper,npass,dtype=np.float64,subset=None):
+    index,res=rainyseason_member(filename,member,varname,day,month,year,jday,leap,yr0,tot,dper,npass,dtype,subset)
+    rainyseason_zarr_write(stores,res,index,nlat,nlon,nyrs,missval,(day,month,year,jday),(0,nlat,0,nlon),k)
+    return len(index)
+#========================================================================
+#                             End of subroutine
+#========================================================================
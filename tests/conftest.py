@@ -0,0 +1,95 @@
+#========================================================================
+#  Shared inputs and helpers of the tests. The modules of the package are
+# in the directory above the tests.
+#
+#  dataset --> small synthetic grid (1981-1990, 3 x 4 points) saved as a
+#              NetCDF file: the points of two cases of rainyseason_cases,
+#              with one point without data
+#  full    --> outputs of rainyseason_pipeline on the whole grid of
+#              dataset, {file:{variable:array}} (see read_outputs)
+#========================================================================
+import os
+import sys
+import glob
+import numpy as np
+import netCDF4 as nc
+import pytest
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rainyseason_reference import rainyseason_cases
+from rainyseason_read import rainyseason_read, rainyseason_subset
+from rainyseason_calendar import rainyseason_calendar
+from rainyseason_pack import rainyseason_pack, rainyseason_valid
+from rainyseason_pipeline import rainyseason_pipeline
+from rainyseason_output import rainyseason_create, rainyseason_write
+tot=365
+dper=25.
+npass=50
+missval=-999.
+nlat=3
+nlon=4
+lats=np.array([-10.,-9.,-8.])
+lons=np.array([300.,301.,302.,303.])
+
+#------------------------------------------------------------------------
+# NetCDF file of prec (time,lat,lon) with time steps of step hours from
+# offset hours after start (YYYY-MM-DD)
+#------------------------------------------------------------------------
+def write_netcdf(filename,prec,start='1981-01-01',step=24.,lat=lats,lon=lons,varname='precip',offset=0.):
+    rootgrp=nc.Dataset(filename,"w",format="NETCDF4")
+    rootgrp.createDimension("time",prec.shape[0])
+    rootgrp.createDimension("lat",prec.shape[1])
+    rootgrp.createDimension("lon",prec.shape[2])
+    times=rootgrp.createVariable("time","f8",("time",))
+    times.units='hours since '+start+' 00:00'
+    times.calendar='standard'
+    times[:]=offset+np.arange(0,prec.shape[0])*step
+    rootgrp.createVariable("lat","f8",("lat",))[:]=lat
+    rootgrp.createVariable("lon","f8",("lon",))[:]=lon
+    rootgrp.createVariable(varname,"f4",("time","lat","lon",))[:]=prec
+    rootgrp.close()
+    return filename
+
+def synthetic_grid():
+    cases=rainyseason_cases()
+    prec=np.concatenate([cases[0]['prec'],cases[1]['prec']],axis=1).reshape(-1,nlat,nlon)
+    prec[:,1,2]=missval
+    return prec
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    return write_netcdf(str(tmp_path_factory.mktemp('input')/'prec.nc'),synthetic_grid())
+
+def calendar(subset):
+    day,month,year,jday,leap=rainyseason_calendar(subset['yr0'],1,1,subset['ntot'],0)
+    return day,month,year,jday,leap,int(year.max()-year.min())+1
+
+def run_grid(prec,subset,pathout,prefix='test'):
+    day,month,year,jday,leap,nyrs=calendar(subset)
+    pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+    index,res=rainyseason_pipeline(pprec,index,day,month,year,jday,leap,subset['yr0'],tot,dper,npass)
+    files=rainyseason_create(pathout,prefix,subset['lat'],subset['lon'],subset['yr0'],nyrs,missval)
+    rainyseason_write(files,res,index,prec.shape[1],prec.shape[2],nyrs,missval,(day,month,year,jday))
+    return files
+
+@pytest.fixture(scope='session')
+def full(dataset,tmp_path_factory):
+    subset=rainyseason_subset(dataset)
+    pathout=str(tmp_path_factory.mktemp('full'))+'/'
+    run_grid(rainyseason_read(dataset,'precip',subset=subset),subset,pathout)
+    return read_outputs(pathout)
+
+def read_outputs(pathout):
+    out={}
+    for ff in sorted(glob.glob(pathout+'*.nc')):
+        rootgrp=nc.Dataset(ff)
+        out[os.path.basename(ff)]={v:np.ma.filled(rootgrp.variables[v][:],missval) for v in rootgrp.variables if rootgrp.variables[v].ndim >= 3}
+        rootgrp.close()
+    return out
+
+def assert_same(out,ref,member=None):
+    assert sorted(out.keys()) == sorted(ref.keys())
+    for name in ref.keys():
+        for vname in ref[name].keys():
+            data=out[name][vname] if member is None else out[name][vname][member]
+            np.testing.assert_array_equal(data,ref[name][vname],err_msg=name+' '+vname)
+            assert np.any(ref[name][vname] != missval)
@@ -0,0 +1,47 @@
+#========================================================================
+#  Percentiles of the bootstrap (rainyseason_bootstrap): reproducible for
+# a given seed, ordered, and of zero width when all years are the same
+#========================================================================
+import numpy as np
+from conftest import tot
+from rainyseason_bootstrap import rainyseason_bootstrap
+
+perc=[2.5,50.,97.5]
+
+def dates(noff=2,nyrs=30,npts=5):
+    rng=np.random.default_rng(1)
+    onset=100.+rng.normal(0.,10.,(noff,nyrs,npts))+np.arange(nyrs)[np.newaxis,:,np.newaxis]
+    durwet=150.+rng.normal(0.,15.,(noff,nyrs,npts))
+    onset[0,3,1]=np.nan                         # missing years
+    durwet[0,3,1]=np.nan
+    return onset,onset+durwet,durwet
+
+def test_seed():
+    onset,demise,durwet=dates()
+    out=rainyseason_bootstrap(onset,demise,durwet,tot,200,perc,seed=7)
+    again=rainyseason_bootstrap(onset,demise,durwet,tot,200,perc,seed=7)
+    other=rainyseason_bootstrap(onset,demise,durwet,tot,200,perc,seed=8)
+    assert sorted(out.keys()) == ['demise','demise_trend','durwet','durwet_trend','onset','onset_trend']
+    for name in out.keys():
+        assert out[name].shape == (len(perc),onset.shape[2])
+        np.testing.assert_array_equal(out[name],again[name])
+        assert not np.array_equal(out[name],other[name])
+
+def test_ordering():
+    onset,demise,durwet=dates()
+    out=rainyseason_bootstrap(onset,demise,durwet,tot,500,perc,seed=0)
+    for name in out.keys():
+        assert np.all(np.isfinite(out[name]))
+        assert np.all(out[name][0,:] <= out[name][1,:]) and np.all(out[name][1,:] <= out[name][2,:])
+        assert np.all(out[name][2,:] > out[name][0,:])
+    assert np.all(out['onset'][0,:] < 114.5) and np.all(out['onset'][2,:] > 114.5)
+    assert np.all(out['onset_trend'][0,:] < 1.) and np.all(out['onset_trend'][2,:] > 1.)
+
+def test_constant():
+    onset=np.full((1,20,3),360.)                # season across the end of the year
+    durwet=np.full((1,20,3),120.)
+    demise=np.mod(onset+durwet-1.,tot)+1.
+    out=rainyseason_bootstrap(onset,demise,durwet,tot,100,perc,seed=0)
+    for name,value in [('onset',360.),('demise',demise[0,0,0]),('durwet',120.)]:
+        np.testing.assert_allclose(out[name],value,atol=1.e-9)
+        np.testing.assert_allclose(out[name+'_trend'],0.,atol=1.e-9)
@@ -0,0 +1,24 @@
+#========================================================================
+#  Climatologies of sliding reference periods (rainyseason_climatology_windows,
+# calculated incrementally) against the climatology of each period alone
+#========================================================================
+import numpy as np
+from conftest import tot, dper, synthetic_grid
+from rainyseason_calendar import rainyseason_calendar
+from rainyseason_pack import rainyseason_pack, rainyseason_valid, rainyseason_format
+from rainyseason_climatology import rainyseason_climatology, rainyseason_climatology_windows
+
+def test_windows():
+    prec=synthetic_grid()
+    prec[400:800,0,0]=np.nan                    # missing data in some windows
+    day,month,year,jday,leap=rainyseason_calendar(1981,1,1,prec.shape[0],0)
+    pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+    pprec,index=rainyseason_format(pprec,index,leap,dper)
+    windows=[(1981,1985),(1982,1986),(1984,1990),(1981,1990),(1986,1987)]
+    rm,startwet=rainyseason_climatology_windows(pprec,jday,year,tot,windows)
+    for k,(y0,y1) in enumerate(windows):
+        sel=(year >= y0) & (year <= y1)
+        rm1,startwet1=rainyseason_climatology(pprec[:,sel],jday[sel],tot)
+        np.testing.assert_allclose(rm[k,:],rm1,rtol=1.e-12,atol=1.e-12)
+        np.testing.assert_array_equal(startwet[k,:],startwet1)
+    assert np.any(rm > 0.)
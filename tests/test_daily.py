@@ -0,0 +1,56 @@
+#========================================================================
+#  Daily totals of 3-hourly files, with days split between two files,
+# against the sums of the samples of each day
+#========================================================================
+import numpy as np
+import pytest
+from conftest import nlat, nlon, write_netcdf
+from rainyseason_read import rainyseason_read, rainyseason_subset_tile
+from rainyseason_daily import rainyseason_daily_subset, rainyseason_daily_read
+
+#------------------------------------------------------------------------
+# 3-hourly samples from 1980-12-30 00:00 to 1981-02-14 21:00 in three
+# files that end and begin in the middle of a day (given out of order)
+#------------------------------------------------------------------------
+@pytest.fixture(scope='module')
+def samples(tmp_path_factory):
+    rng=np.random.default_rng(0)
+    prec=rng.gamma(0.3,2.,(376,nlat,nlon)).astype(np.float32)
+    prec[rng.random(prec.shape) < 0.05]=-999.
+    prec[40:44,0,0]=np.nan                          # 4 missing samples
+    prec[92:106,1,1]=-1.                            # missing day, across two files
+    prec[:,1,2]=-999.
+    path=tmp_path_factory.mktemp('subdaily')
+    files=[]
+    for k,(a,b) in enumerate([(250,376),(0,101),(101,250)]):
+        files.append(write_netcdf(str(path/('prec3h.'+str(k)+'.nc')),prec[a:b],start='1980-12-30',step=3.,offset=3.*a))
+    return prec, files
+
+#------------------------------------------------------------------------
+# Mean of the valid samples of each day times scale; days with less than
+# half of the samples valid are missing
+#------------------------------------------------------------------------
+def direct(prec,first,scale):
+    days=np.full((45*8,nlat,nlon),np.nan)
+    n=min(45*8,prec.shape[0]-first)
+    days[0:n]=prec[first:first+n]
+    days=days.reshape(45,8,nlat,nlon)
+    ok=days >= 0.
+    count=np.sum(ok,axis=1)
+    with np.errstate(divide='ignore',invalid='ignore'):
+         return np.where(count >= 4,np.sum(np.where(ok,days,0.),axis=1)/count*scale,np.nan)
+
+@pytest.mark.parametrize('scale,shift',[(None,0.),(24.,0.),(8.,3.)])
+def test_daily(samples,scale,shift):
+    prec,files=samples
+    subset=rainyseason_daily_subset(files,years=(1981,1981),scale=scale,shift=shift)
+    assert (subset['yr0'],subset['ntot'],subset['nper']) == (1981,45,8)
+    assert [ff[0] for ff in subset['files']] == [files[1],files[2],files[0]]
+    daily=rainyseason_read('','precip',subset=subset)
+    ref=direct(prec,16+int(shift/3.),8. if scale is None else scale)
+    assert np.isnan(ref[10,1,1]) and np.all(np.isnan(ref[:,1,2]))
+    np.testing.assert_allclose(daily,ref,rtol=1.e-12)
+    for nchunk in [1,5,1000]:
+        np.testing.assert_allclose(rainyseason_daily_read('precip',subset=subset,nchunk=nchunk),daily,rtol=1.e-12)
+    tile=rainyseason_read('','precip',subset=rainyseason_subset_tile(subset,(1,3,1,3)))
+    np.testing.assert_array_equal(tile,daily[:,1:3,1:3])
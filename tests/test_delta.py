@@ -0,0 +1,41 @@
+#========================================================================
+#  Delta mode: only the points whose series changed are calculated again
+# and patched into the files of the previous run
+#========================================================================
+import os
+import numpy as np
+from conftest import tot, dper, npass, missval, nlat, nlon, calendar, run_grid, read_outputs, assert_same
+from rainyseason_read import rainyseason_read, rainyseason_subset
+from rainyseason_pack import rainyseason_pack, rainyseason_valid
+from rainyseason_pipeline import rainyseason_pipeline
+from rainyseason_output import rainyseason_files, rainyseason_patch
+from rainyseason_delta import rainyseason_fingerprint, rainyseason_delta_points
+
+def test_delta(dataset,tmp_path):
+    subset=rainyseason_subset(dataset)
+    day,month,year,jday,leap,nyrs=calendar(subset)
+    prec=rainyseason_read(dataset,'precip',subset=subset)
+    new=prec.copy()
+    new[:,0,0]=prec[:,2,3]     # changed series
+    new[:,2,1]=missval         # no longer valid
+    new[:,1,2]=prec[:,0,1]     # new valid point
+    ref=str(tmp_path/'ref')+'/'
+    os.mkdir(ref)
+    run_grid(new,subset,ref)
+#------------------------------------------------------------------------
+# Previous run with the old series, then only the changed points
+#------------------------------------------------------------------------
+    pathout=str(tmp_path/'delta')+'/'
+    os.mkdir(pathout)
+    run_grid(prec,subset,pathout)
+    pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+    old=np.zeros((nlat*nlon),dtype=np.uint64)
+    old[index]=rainyseason_fingerprint(pprec)
+    pprec,index=rainyseason_pack(new,rainyseason_valid(new))
+    grid=np.zeros((nlat*nlon),dtype=np.uint64)
+    grid[index]=rainyseason_fingerprint(pprec)
+    points,sel=rainyseason_delta_points(old,grid,index)
+    assert sorted(points) == [0*nlon+0,1*nlon+2,2*nlon+1]
+    idx,res=rainyseason_pipeline(pprec[sel,:],index[sel],day,month,year,jday,leap,subset['yr0'],tot,dper,npass)
+    rainyseason_patch(rainyseason_files(pathout,'test',subset['yr0'],nyrs),res,idx,points,nlat,nlon,nyrs,missval,(day,month,year,jday))
+    assert_same(read_outputs(pathout),read_outputs(ref))
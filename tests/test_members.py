@@ -0,0 +1,34 @@
+#========================================================================
+#  Batch mode: each member of an ensemble file (member,time,lat,lon) gets
+# the output of a run on the full grid of that member alone
+#========================================================================
+import numpy as np
+import netCDF4 as nc
+from conftest import tot, dper, npass, missval, nlat, nlon, lats, lons, synthetic_grid, write_netcdf, calendar, run_grid, read_outputs, assert_same
+from rainyseason_read import rainyseason_subset
+from rainyseason_pipeline import rainyseason_member
+from rainyseason_output import rainyseason_create, rainyseason_write
+
+def test_members(tmp_path):
+    prec=synthetic_grid()
+    ens=np.array([prec,np.where(prec >= 0.,np.roll(prec,40,axis=0)*1.5,prec)],dtype=np.float32)
+    filename=str(tmp_path/'ens.nc')
+    write_netcdf(filename,prec)
+    rootgrp=nc.Dataset(filename,"a")
+    rootgrp.createDimension("member",2)
+    rootgrp.createVariable("ens","f4",("member","time","lat","lon",))[:]=ens
+    rootgrp.close()
+    subset=rainyseason_subset(filename)
+    day,month,year,jday,leap,nyrs=calendar(subset)
+    pathout=str(tmp_path)+'/batch/'
+    (tmp_path/'batch').mkdir()
+    members=[(filename,0),(filename,1)]
+    files=rainyseason_create(pathout,'test',lats,lons,subset['yr0'],nyrs,missval,members)
+    for mt in range(0,len(members)):
+        index,res=rainyseason_member(members[mt][0],members[mt][1],'ens',day,month,year,jday,leap,subset['yr0'],tot,dper,npass,np.float64,subset)
+        rainyseason_write(files,res,index,nlat,nlon,nyrs,missval,(day,month,year,jday),mt)
+    out=read_outputs(pathout)
+    for mt in range(0,len(members)):
+        (tmp_path/('m'+str(mt))).mkdir()
+        run_grid(ens[mt],subset,str(tmp_path/('m'+str(mt)))+'/')
+        assert_same(out,read_outputs(str(tmp_path/('m'+str(mt)))+'/'),mt)
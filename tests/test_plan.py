@@ -0,0 +1,45 @@
+#========================================================================
+#  Memory planner: order in which the options are given up to fit the
+# budget, and the stop of jobs that do not fit
+#========================================================================
+import pytest
+import rainyseason_plan as planner
+from rainyseason_plan import rainyseason_plan, rainyseason_plan_check
+
+#------------------------------------------------------------------------
+# Memory model where each option matters: 100 bytes per grid point in
+# double precision with the curves, 75 without them, half as much in
+# single precision, in proportion to the size of the tiles
+#------------------------------------------------------------------------
+def memory(ntot,nlat,nlon,tot=365,itemsize=8,fvalid=1.,mode='grid',tile=None,nworkers=1,curves=True,fileitem=None,frej=0.15,nblock=4096,prefetch=2):
+    cells=nlat*nlon if tile is None else min(tile[0],nlat)*min(tile[1],nlon)
+    return [('read',1.),('firstpass',cells*(100. if curves else 75.)*itemsize/8.)]
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(planner,'rainyseason_memory',memory)
+
+def test_grid(model):
+    options=[(plan['precision'],plan['curves']) for plan in [rainyseason_plan(365,10,10,budget) for budget in [1.e4,7500.,7499.,3750.]]]
+    assert options == [('f8',True),('f8',False),('f4',True),('f4',False)]
+    plan=rainyseason_plan(365,10,10,3749.)
+    assert not plan['fits'] and plan['precision'] == 'f4' and not plan['curves']
+    assert plan['peak'] == 3750.
+    assert any(['tiled output' in note for note in plan['notes']])
+
+def test_tiles(model):
+    plan=rainyseason_plan(365,10,10,7500.,mode='tiles',tile=(10,10))
+    assert plan['fits'] and plan['tile'] == (10,10) and plan['precision'] == 'f8' and not plan['curves']
+    plan=rainyseason_plan(365,10,10,3750.,mode='tiles',tile=(10,10))
+    assert plan['fits'] and plan['tile'] == (5,10) and plan['precision'] == 'f8'
+    plan=rainyseason_plan(365,10,10,60.,mode='tiles',tile=(10,10))
+    assert plan['fits'] and plan['tile'] == (1,1) and plan['precision'] == 'f4'
+
+def test_check():
+    plan=rainyseason_plan(14610,120,160,1.e6)
+    assert not plan['fits']
+    with pytest.raises(ValueError):
+         rainyseason_plan_check(plan)
+    assert rainyseason_plan_check(plan,overbudget=True) is plan
+    plan=rainyseason_plan(14610,120,160,1.e12)
+    assert rainyseason_plan_check(plan) is plan
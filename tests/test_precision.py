@@ -0,0 +1,35 @@
+#========================================================================
+#  Single precision (precision='f4') against double precision within the
+# tolerances of rainyseason_compare, on the synthetic cases and on the
+# synthetic grid
+#========================================================================
+import numpy as np
+from conftest import tot, dper, npass, missval, synthetic_grid
+from rainyseason_reference import rainyseason_cases
+from rainyseason_calendar import rainyseason_calendar
+from rainyseason_pack import rainyseason_pack, rainyseason_valid, rainyseason_unpack
+from rainyseason_pipeline import rainyseason_pipeline
+from rainyseason_output import products, rainyseason_field
+from rainyseason_compare import rainyseason_compare
+
+def fields(prec,yr0,dtype):
+    ntot,nl,nx=prec.shape
+    day,month,year,jday,leap=rainyseason_calendar(yr0,1,1,ntot,0)
+    prec=np.asarray(prec,dtype=dtype)
+    pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+    index,res=rainyseason_pipeline(pprec,index,day,month,year,jday,leap,yr0,tot,dper,npass,dtype)
+    if dtype == np.float32:
+       assert res['totwet'].dtype == np.float32
+    out={}
+    for name,variables in products:
+        for vname,key,long_name in variables:
+            data=rainyseason_unpack(np.asarray(rainyseason_field(res,key,(day,month,year,jday)),dtype=np.float64),index,nl,nx,np.nan)
+            data[np.isnan(data)]=missval
+            out[key]=data
+    return out
+
+def test_f4_against_f8():
+    inputs=[(case['prec'][:,np.newaxis,:],case['yr0']) for case in rainyseason_cases()]+[(synthetic_grid(),1981)]
+    for prec,yr0 in inputs:
+        ok,report=rainyseason_compare(fields(prec,yr0,np.float64),fields(prec,yr0,np.float32),missval)
+        assert ok, report
@@ -0,0 +1,50 @@
+#========================================================================
+#  Preview mode: coarsening of the grid, choice of the factor for a
+# runtime budget and attribute of the output files
+#========================================================================
+import numpy as np
+import netCDF4 as nc
+from conftest import missval, lats, lons, synthetic_grid
+from rainyseason_output import rainyseason_create
+from rainyseason_preview import rainyseason_preview, rainyseason_coarsen, rainyseason_coarsen_coords, rainyseason_preview_factor, rainyseason_preview_tag
+
+def test_coarsen():
+    band=np.arange(1.,31.).reshape(2,3,5)           # (time,lat,lon): 5 longitudes, blocks of 2
+    band[0,0,0]=np.nan
+    band[0,1,0]=-1.                                 # missing
+    band[1,:,4]=missval                             # edge block without valid values
+    out=rainyseason_coarsen(band,2)
+    assert out.shape == (2,3)
+    np.testing.assert_allclose(out[0,:],[np.mean([2.,7.,11.,12.]),np.mean([3.,4.,8.,9.,13.,14.]),np.mean([5.,10.,15.])])
+    np.testing.assert_allclose(out[1,0:2],[np.mean([16.,17.,21.,22.,26.,27.]),np.mean([18.,19.,23.,24.,28.,29.])])
+    assert np.isnan(out[1,2])
+    np.testing.assert_allclose(rainyseason_coarsen_coords([0.,1.,2.,3.,4.],2),[0.5,2.5,4.])
+
+def test_preview():
+    prec=synthetic_grid()                          # 3 x 4 points, one without data
+    out,clats,clons,yr0,ntot,factor=rainyseason_preview(prec,'','precip',None,lats,lons,1981,{'factor':2,'years':(1983,1985)})
+    assert (yr0,ntot,factor) == (1983,1096,2)
+    assert out.shape == (1096,2,2)
+    np.testing.assert_allclose(clats,[-9.5,-8.])      # partial block at the edge
+    np.testing.assert_allclose(clons,[300.5,302.5])
+    part=prec[730:1826,:,:]
+    np.testing.assert_allclose(out[:,1,1],part[:,2,2:4].mean(axis=1))
+    np.testing.assert_allclose(out[:,0,1],(part[:,0,2]+part[:,0,3]+part[:,1,3])/3.)
+
+def test_factor():
+    prec=np.ones((730,10,10))
+    prec[:,0:5,:]=missval                          # half of the grid without data
+    for budget,factor in [(50.,1),(49.,2),(12.5,2),(12.4,3),(0.1,10)]:
+        found,estimate=rainyseason_preview_factor(prec,'','precip',None,10,10,1981,budget,rate=1.)
+        assert found == factor
+        assert estimate == 0.5*np.ceil(10./factor)**2
+
+def test_tag(tmp_path):
+    pathout=str(tmp_path)+'/'
+    files=rainyseason_create(pathout,'test.preview-x2',lats,lons,1981,10,missval)
+    other=rainyseason_create(pathout,'test',lats,lons,1981,10,missval)
+    assert rainyseason_preview_tag(pathout,'test.preview-x2',2) == sorted(files)
+    for outfile in files+other:
+        rootgrp=nc.Dataset(outfile)
+        assert getattr(rootgrp,'preview_factor',None) == (2 if outfile in files else None)
+        rootgrp.close()
@@ -0,0 +1,45 @@
+#========================================================================
+#  Subsets of NetCDF files (rainyseason_subset, rainyseason_read): the
+# period starts on the first Jan 1st and keeps the days after the last
+# Dec 31st (a short final year)
+#========================================================================
+import numpy as np
+import pytest
+from conftest import write_netcdf, synthetic_grid, lats, lons
+from rainyseason_read import rainyseason_read, rainyseason_subset
+
+def ndays(d0,d1):
+    return int((np.datetime64(d1)-np.datetime64(d0)).astype(np.int64))
+
+def test_start_mid_year(tmp_path):
+    prec=synthetic_grid()
+    filename=write_netcdf(str(tmp_path/'mid.nc'),prec,'1980-07-01')
+    subset=rainyseason_subset(filename)
+    skip=ndays('1980-07-01','1981-01-01')
+    assert subset['yr0'] == 1981
+    assert subset['ntot'] == prec.shape[0]-skip
+    np.testing.assert_array_equal(rainyseason_read(filename,'precip',subset=subset),prec[skip:].astype(np.float32))
+
+def test_end_mid_year(tmp_path):
+    prec=synthetic_grid()[0:ndays('1981-01-01','1985-06-16')]
+    filename=write_netcdf(str(tmp_path/'short.nc'),prec)
+    subset=rainyseason_subset(filename)
+    assert subset['yr0'] == 1981
+    assert subset['ntot'] == prec.shape[0]      # the final days are kept
+    subset=rainyseason_subset(filename,None,(1982,1990))
+    assert subset['yr0'] == 1982
+    assert subset['ntot'] == ndays('1982-01-01','1985-06-16')
+
+def test_no_jan1(tmp_path):
+    filename=write_netcdf(str(tmp_path/'part.nc'),synthetic_grid()[0:200],'1981-03-01')
+    with pytest.raises(ValueError):
+         rainyseason_subset(filename)
+    assert rainyseason_subset(filename,jan1=False)['ntot'] == 200
+
+def test_region(tmp_path):
+    filename=write_netcdf(str(tmp_path/'grid.nc'),synthetic_grid())
+    subset=rainyseason_subset(filename,(-9.5,-7.,302.5,301.))    # crosses the edge of the longitudes
+    np.testing.assert_array_equal(subset['lat'],lats[1:])
+    assert len(subset['lon']) == len(lons)-1
+    prec=rainyseason_read(filename,'precip',subset=subset)
+    assert prec.shape == (subset['ntot'],2,3)
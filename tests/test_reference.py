@@ -0,0 +1,13 @@
+#========================================================================
+#  Engine (rainyseason_pipeline) against the reference engine on the
+# synthetic cases (see rainyseason_reference)
+#========================================================================
+from rainyseason_reference import rainyseason_cases, rainyseason_equivalence
+from rainyseason_pipeline import rainyseason_pipeline
+def test_equivalence():
+    passed,reports=rainyseason_equivalence(rainyseason_pipeline,rainyseason_cases())
+    for name in reports.keys():
+        for key in reports[name].keys():
+            assert reports[name][key]['valid'] > 0, name+' '+key
+            assert reports[name][key]['bad'] == 0, name+' '+key
+    assert passed
@@ -0,0 +1,70 @@
+#========================================================================
+#  Season index: the queries against the durations and totals of the
+# seasons, and the accumulated precipitation of a long record
+#========================================================================
+import numpy as np
+from conftest import tot, dper, npass, nlat, nlon, lats, lons, synthetic_grid
+from rainyseason_calendar import rainyseason_calendar
+from rainyseason_pack import rainyseason_pack, rainyseason_valid
+from rainyseason_pipeline import rainyseason_pipeline
+from rainyseason_characteristics import rainyseason_cumulative
+from rainyseason_seasonindex import rainyseason_seasonindex, rainyseason_seasonindex_save, rainyseason_seasonindex_load, rainyseason_seasonindex_point
+from rainyseason_seasonindex import rainyseason_in_season, rainyseason_wet_days, rainyseason_accumulated, rainyseason_since_onset, rainyseason_cumprec
+
+def test_queries(tmp_path):
+    prec=synthetic_grid()
+    day,month,year,jday,leap=rainyseason_calendar(1981,1,1,prec.shape[0],0)
+    pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+    index,res=rainyseason_pipeline(pprec,index,day,month,year,jday,leap,1981,tot,dper,npass,curves=False,cumulative=True)
+    sidx=rainyseason_seasonindex_load(rainyseason_seasonindex_save(str(tmp_path/'seasonindex.nc'),rainyseason_seasonindex(res,index,1981,tot,lats,lons)))
+    for name in ['start','end','wetcum','cumbase','cumprec']:
+        np.testing.assert_array_equal(sidx[name],rainyseason_seasonindex(res,index,1981,tot,lats,lons)[name])
+#------------------------------------------------------------------------
+# Wet seasons that begin with an onset of the same year (the others
+# begin on the onset of the following year, see rainyseason_durations)
+#------------------------------------------------------------------------
+    nseason=0
+    for k in range(0,len(index)):
+        assert rainyseason_seasonindex_point(sidx,lats[index[k]//nlon],lons[index[k] % nlon]) == k
+        for yt in range(0,res['onset'].shape[0]):
+            on=res['onset'][yt,k]
+            dur=res['durwet'][yt,k]
+            if on < 0 or np.isnan(dur) or on//tot != yt:
+               continue
+            dur=int(dur)
+            np.testing.assert_allclose(rainyseason_accumulated(sidx,k,on,on+dur),res['totwet'][yt,k],rtol=1.e-6)
+            np.testing.assert_allclose(rainyseason_since_onset(sidx,k,on+dur-1),res['totwet'][yt,k],rtol=1.e-6)
+            assert rainyseason_wet_days(sidx,k,on,on+dur) == dur
+            assert rainyseason_in_season(sidx,k,on) and rainyseason_in_season(sidx,k,on+dur-1)
+            assert not rainyseason_in_season(sidx,k,on+dur)
+            assert np.isnan(rainyseason_since_onset(sidx,k,on+dur))
+            nseason=nseason+1
+    assert nseason > 5*len(index)
+
+#------------------------------------------------------------------------
+# 300 years of data: the totals of the last year from the index agree
+# with double precision sums, while a single precision cumulative sum of
+# the whole record has drifted
+#------------------------------------------------------------------------
+def test_long_record():
+    rng=np.random.default_rng(0)
+    nyrs=300
+    pprec=rng.gamma(0.5,6.,(2,nyrs*tot))
+    pprec[1,1000:1300]=np.nan
+    cumbase,cumprec=rainyseason_cumulative(pprec,tot)
+    assert cumbase.dtype == np.float64 and cumprec.dtype == np.float32
+    sidx={'tot':tot,'ntot':pprec.shape[1],'cumbase':cumbase,'cumprec':cumprec}
+    exact=np.concatenate((np.zeros((2,1)),np.cumsum(np.nan_to_num(pprec),axis=1)),axis=1)
+    single=np.concatenate((np.zeros((2,1),dtype=np.float32),np.cumsum(np.nan_to_num(pprec).astype(np.float32),axis=1,dtype=np.float32)),axis=1)
+    t=np.arange(0,pprec.shape[1]+1)
+    annual=np.nansum(pprec[:,0:tot],axis=1)[:,np.newaxis]
+    for k in range(0,2):
+        np.testing.assert_allclose(rainyseason_cumprec(sidx,k,t),exact[k,:],rtol=1.e-12,atol=1.e-6*annual[k,0])
+    t0=np.arange(0,nyrs)*tot+17
+    t1=t0+200
+    k=np.zeros(nyrs,dtype=np.int64)
+    wet=rainyseason_accumulated(sidx,k,t0,t1)
+    err=np.max(np.abs(wet-(exact[0,t1]-exact[0,t0])))
+    drift=np.max(np.abs((single[0,t1].astype(np.float64)-single[0,t0])-(exact[0,t1]-exact[0,t0])))
+    assert err < 1.e-6*annual[0,0]
+    assert drift > 100.*err
@@ -0,0 +1,90 @@
+#========================================================================
+#  Point service against a run on the full grid (see conftest), its
+# caches and its HTTP server
+#========================================================================
+import json
+import threading
+import urllib.request
+import urllib.error
+import numpy as np
+import pytest
+from conftest import missval, nlat, nlon
+from rainyseason_service import rainyseason_service, rainyseason_service_close, rainyseason_point, rainyseason_server, rainyseason_cache_stats
+
+def test_service(dataset,full):
+    service=rainyseason_service(dataset,'precip')
+    subset=service['subset']
+    def grid(product,vname,i,j):
+        name=[ff for ff in full.keys() if ff.startswith(product+'.')][0]
+        return full[name][vname][:,i,j]
+    def values(vals):
+        return np.array([missval if vv is None else vv for vv in vals],dtype=np.float32)
+    nchecked=0
+    for i in range(0,nlat):
+        for j in range(0,nlon):
+            if np.all(grid('onset.wet.season','DOY',i,j) == missval):
+               continue
+            out=rainyseason_point(service,subset['lat'][i],subset['lon'][j])
+            for name,product in [('onset','onset.wet.season'),('demise','demise.wet.season')]:
+                for dd,vname in [('jday','DOY'),('day','day'),('month','month'),('year','year')]:
+                    np.testing.assert_array_equal(values(out[name][dd]),grid(product,vname,i,j))
+            for key,product in [('durwet','duration.wet.season'),('durdry','duration.dry.season'),
+                                ('totwet','total.precip.wet.season'),('totdry','total.precip.dry.season')]:
+                np.testing.assert_array_equal(values(out[key]),grid(product,key,i,j))
+            nchecked=nchecked+1
+    assert nchecked > 0
+    with pytest.raises(ValueError):
+         rainyseason_point(service,-9.,302.)
+    rainyseason_service_close(service)
+
+#========================================================================
+#  Caches: climatology of an evicted point, points without valid data
+#========================================================================
+def test_cache(dataset):
+    service=rainyseason_service(dataset,'precip',maxpoints=1)
+    subset=service['subset']
+    first=rainyseason_point(service,subset['lat'][0],subset['lon'][0])
+    rainyseason_point(service,subset['lat'][0],subset['lon'][1])      # evicts the first point
+    assert rainyseason_cache_stats(service['results'])['items'] == 1
+    assert rainyseason_point(service,subset['lat'][0],subset['lon'][0]) == first
+    assert rainyseason_cache_stats(service['climatology'])['hits'] == 1
+    with pytest.raises(ValueError):
+         rainyseason_point(service,-9.,302.)
+    service['var']=None                                                # the file is not read again
+    with pytest.raises(ValueError):
+         rainyseason_point(service,-9.,302.)
+    rainyseason_service_close(service)
+
+#========================================================================
+#  Requests through the HTTP server on a free port
+#========================================================================
+def test_http(dataset):
+    service=rainyseason_service(dataset,'precip')
+    subset=service['subset']
+    server=rainyseason_server(service,'127.0.0.1',0)
+    thread=threading.Thread(target=server.serve_forever)
+    thread.start()
+    url='http://127.0.0.1:'+str(server.server_address[1])
+    def get(path):
+        try:
+            with urllib.request.urlopen(url+path) as resp:
+                 return resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as err:
+            return err.code, json.loads(err.read())
+    try:
+        status,out=get('/point?lat='+str(subset['lat'][0])+'&lon='+str(subset['lon'][0])+'&curves=1')
+        assert status == 200
+        assert out == json.loads(json.dumps(rainyseason_point(service,subset['lat'][0],subset['lon'][0],True)))
+        assert len(out['wscurve']) == len(out['years'])
+        status,out=get('/point?lat='+str(subset['lat'][0])+'&lon='+str(subset['lon'][0]))
+        assert status == 200 and 'wscurve' not in out
+        assert get('/point?lat=-9.&lon=302.')[0] == 404
+        assert get('/point?lat=north&lon=302.')[0] == 400
+        assert get('/other')[0] == 404
+        status,out=get('/stats')
+        assert status == 200 and out['results']['items'] == 1 and out['results']['hits'] >= 2
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+        rainyseason_service_close(service)
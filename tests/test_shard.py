@@ -0,0 +1,26 @@
+#========================================================================
+#  Shards of the valid points, merged, against a run on the full grid
+# (see conftest)
+#========================================================================
+from conftest import tot, dper, npass, missval, nlat, nlon, calendar, read_outputs, assert_same
+from rainyseason_read import rainyseason_read, rainyseason_subset
+from rainyseason_pack import rainyseason_pack, rainyseason_valid
+from rainyseason_pipeline import rainyseason_pipeline
+from rainyseason_output import rainyseason_create, rainyseason_write
+from rainyseason_shard import rainyseason_shard_tag, rainyseason_shard_points, rainyseason_shard_coverage, rainyseason_merge
+
+def test_shards(dataset,full,tmp_path):
+    subset=rainyseason_subset(dataset)
+    day,month,year,jday,leap,nyrs=calendar(subset)
+    pathout=str(tmp_path)+'/'
+    prec=rainyseason_read(dataset,'precip',subset=subset)
+    nshard=3
+    for ishard in range(0,nshard):
+        pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+        sel=rainyseason_shard_points(index,ishard,nshard)
+        idx,res=rainyseason_pipeline(pprec[sel,:],index[sel],day,month,year,jday,leap,subset['yr0'],tot,dper,npass)
+        files=rainyseason_create(pathout,'test'+rainyseason_shard_tag(ishard,nshard),subset['lat'],subset['lon'],subset['yr0'],nyrs,missval)
+        rainyseason_write(files,res,idx,nlat,nlon,nyrs,missval,(day,month,year,jday))
+        rainyseason_shard_coverage(pathout,'test',ishard,nshard,index[sel],len(index),subset['lat'],subset['lon'])
+    rainyseason_merge(pathout,'test',nshard,True)
+    assert_same(read_outputs(pathout),full)
@@ -0,0 +1,75 @@
+#========================================================================
+#  Station mode: a CSV file of stations with gaps and different, irregular
+# periods of record against the gridded engine run on the same series
+#========================================================================
+import csv
+import numpy as np
+from datetime import date, timedelta
+from conftest import tot, dper, npass, missval, synthetic_grid, run_grid, read_outputs
+from rainyseason_output import products
+from rainyseason_stations import rainyseason_stations_read, rainyseason_stations, rainyseason_stations_write
+
+# station: point of the synthetic grid (1981-1990), first and last dates
+stations={'A':((0,0),date(1981,1,1),date(1990,12,31)),
+          'B':((0,1),date(1982,3,15),date(1990,12,31)),
+          'C':((2,3),date(1980,7,1),date(1989,6,30))}
+
+#------------------------------------------------------------------------
+# Rows of the CSV file {date:value} of a station: days without rows,
+# empty values and negative values
+#------------------------------------------------------------------------
+def records(sid,point,d0,d1):
+    prec=synthetic_grid()[:,point[0],point[1]].astype(np.float64)
+    rows={}
+    for k in range(0,(d1-d0).days+1):
+        dd=d0+timedelta(days=k)
+        pos=(dd-date(1981,1,1)).days
+        if sid == 'A' and 700 <= k < 760:
+           continue
+        if pos < 0 or (sid == 'B' and k % 97 == 0):
+           rows[dd]=''
+        elif sid == 'A' and k % 131 == 0:
+           rows[dd]='-999.'
+        else:
+           rows[dd]=repr(float(prec[pos]))
+    return rows
+
+def test_stations(tmp_path):
+    data={sid:records(sid,*ss) for sid,ss in stations.items()}
+    infile=str(tmp_path/'gauges.csv')
+    with open(infile,'w',newline='') as ff:
+         writer=csv.writer(ff)
+         writer.writerow(['station','date','precip','lat','lon'])
+         for sid,(point,d0,d1) in stations.items():
+             for dd,vv in data[sid].items():
+                 writer.writerow([sid,dd.isoformat(),vv,-10.+point[0],300.+point[1]])
+    stlist=rainyseason_stations_read(infile)
+    results=list(rainyseason_stations(stlist,tot,dper,npass))
+    assert len(results) == 3                         # one calendar per station
+    outfile=str(tmp_path/'stations.csv')
+    rainyseason_stations_write(outfile,stlist,results,missval)
+    with open(outfile,'r',newline='') as ff:
+         table=list(csv.DictReader(ff))
+#------------------------------------------------------------------------
+# Gridded engine on whole years of the same series (1980 of station C
+# has no data)
+#------------------------------------------------------------------------
+    for sid,(point,d0,d1) in stations.items():
+        y0=max(d0.year,1981)
+        prec=np.full(((date(d1.year+1,1,1)-date(y0,1,1)).days),np.nan)
+        for dd,vv in data[sid].items():
+            if dd.year >= y0 and len(vv) > 0 and float(vv) >= 0.:
+               prec[(dd-date(y0,1,1)).days]=float(vv)
+        subset={'yr0':y0,'ntot':len(prec),'lat':np.array([-10.+point[0]]),'lon':np.array([300.+point[1]])}
+        pathout=str(tmp_path/sid)+'/'
+        (tmp_path/sid).mkdir()
+        run_grid(prec.reshape(-1,1,1),subset,pathout)
+        grid=read_outputs(pathout)
+        rows=[rr for rr in table if rr['station'] == sid]
+        assert [int(rr['year']) for rr in rows] == list(range(y0,d1.year-1))
+        for name,variables in products:
+            ff=[gg for gg in grid.keys() if gg.startswith(name+'.')][0]
+            for vname,key,long_name in variables:
+                got=np.array([float(rr[key]) for rr in rows])
+                np.testing.assert_allclose(got,grid[ff][vname][:,0,0],rtol=1.e-6,atol=1.e-3,err_msg=sid+' '+key)
+                assert np.any(got != missval)
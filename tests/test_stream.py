@@ -0,0 +1,18 @@
+#========================================================================
+#  Tiled streaming of a NetCDF file against a run on the full grid (see
+# conftest)
+#========================================================================
+from conftest import tot, dper, npass, missval, nlat, nlon, calendar, read_outputs, assert_same
+from rainyseason_read import rainyseason_subset
+from rainyseason_pack import rainyseason_tiles
+from rainyseason_output import rainyseason_create
+from rainyseason_stream import rainyseason_stream
+
+def test_stream(dataset,full,tmp_path):
+    subset=rainyseason_subset(dataset)
+    day,month,year,jday,leap,nyrs=calendar(subset)
+    pathout=str(tmp_path)+'/'
+    files=rainyseason_create(pathout,'test',subset['lat'],subset['lon'],subset['yr0'],nyrs,missval)
+    tiles=rainyseason_tiles(nlat,nlon,(2,3))
+    rainyseason_stream(dataset,'precip',None,subset,tiles,files,'netcdf',nlat,nlon,nyrs,day,month,year,jday,leap,subset['yr0'],tot,missval,dper,npass,prefetch=1)
+    assert_same(read_outputs(pathout),full)
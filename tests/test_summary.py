@@ -0,0 +1,59 @@
+#========================================================================
+#  Summary file, accumulated tile by tile, against the mean, standard
+# deviation and trend of the saved output files (see conftest)
+#========================================================================
+import math
+import numpy as np
+import netCDF4 as nc
+from conftest import tot, dper, npass, missval, nlat, nlon, calendar
+from rainyseason_read import rainyseason_read, rainyseason_subset
+from rainyseason_pack import rainyseason_pack, rainyseason_valid
+from rainyseason_pipeline import rainyseason_pipeline
+from rainyseason_summary import rainyseason_summary, rainyseason_summary_sums, rainyseason_summary_add, rainyseason_summary_write
+
+products=[('onset','onset.wet.season','DOY',True),('demise','demise.wet.season','DOY',True),
+          ('durwet','duration.wet.season','durwet',False),('durdry','duration.dry.season','durdry',False),
+          ('totwet','total.precip.wet.season','totwet',False),('totdry','total.precip.dry.season','totdry',False)]
+
+#------------------------------------------------------------------------
+# Mean (circular mean for the dates), std and trend of the years of one
+# point; the dates are unwrapped around their circular mean
+#------------------------------------------------------------------------
+def statistics(x,circ):
+    t=np.where(x != missval)[0].astype(np.float64)
+    x=np.asarray(x[x != missval],dtype=np.float64)
+    if circ:
+       ang=2.*math.pi*x/float(tot)
+       ref=math.atan2(np.sum(np.sin(ang)),np.sum(np.cos(ang)))*float(tot)/(2.*math.pi)
+       x=x-ref
+       x=x-float(tot)*np.round(x/float(tot))
+       mean=np.mod(ref-1.,float(tot))+1.
+    else:
+       mean=np.mean(x)
+    return mean, np.std(x,ddof=1), np.polyfit(t,x,1)[0], len(x)
+
+def test_summary(dataset,full,tmp_path):
+    subset=rainyseason_subset(dataset)
+    day,month,year,jday,leap,nyrs=calendar(subset)
+    prec=rainyseason_read(dataset,'precip',subset=subset)
+    pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))
+    summ=rainyseason_summary(nlat,nlon)
+    for sel in [slice(0,5),slice(5,len(index))]:          # two tiles
+        idx,res=rainyseason_pipeline(pprec[sel,:].copy(),index[sel],day,month,year,jday,leap,subset['yr0'],tot,dper,npass)
+        rainyseason_summary_add(summ,rainyseason_summary_sums(res,(day,month,year,jday),nyrs,tot),idx)
+    outfile=rainyseason_summary_write(str(tmp_path/'summary.wet.season.nc'),summ,nlat,nlon,subset['lat'],subset['lon'],tot,missval)
+    rootgrp=nc.Dataset(outfile)
+    summary={vname:np.ma.filled(rootgrp.variables[vname][:],missval) for vname in rootgrp.variables if rootgrp.variables[vname].ndim == 2}
+    rootgrp.close()
+    nchecked=0
+    for name,product,vname,circ in products:
+        data=full[[ff for ff in full.keys() if ff.startswith(product+'.')][0]][vname]
+        for i in range(0,nlat):
+            for j in range(0,nlon):
+                if np.sum(data[:,i,j] != missval) < 3:
+                   assert summary[name+'_trend'][i,j] == missval
+                   continue
+                mean,std,trend,n=statistics(data[:,i,j],circ)
+                np.testing.assert_allclose([summary[name+'_'+ss][i,j] for ss in ['mean','std','trend','n']],[mean,std,trend,n],rtol=1.e-5,atol=1.e-4,err_msg=name)
+                nchecked=nchecked+1
+    assert nchecked > 6*5
@@ -0,0 +1,38 @@
+#========================================================================
+#  Each combination of parameters of rainyseason_sweep against a single
+# run with the same parameters
+#========================================================================
+import numpy as np
+from conftest import tot, synthetic_grid
+from rainyseason_calendar import rainyseason_calendar
+from rainyseason_pack import rainyseason_pack, rainyseason_valid, rainyseason_format
+from rainyseason_climatology import rainyseason_climatology
+from rainyseason_characteristics import rainyseason_characteristics
+from rainyseason_pipeline import rainyseason_pipeline
+from rainyseason_sweep import rainyseason_sweep, rainyseason_combinations, defaults
+
+def test_sweep():
+    prec=synthetic_grid()
+    prec[400:1200,0,1]=np.nan                   # point kept by one dper only
+    day,month,year,jday,leap=rainyseason_calendar(1981,1,1,prec.shape[0],0)
+    pprec,index=rainyseason_pack(prec,rainyseason_valid(prec))   # copied for each run: formatting changes its input
+    sweep={'npass':[20,50],'dper':[10.,25.],'qc1':[1.5,2.],'qc2':[3.,2.5]}
+    combos=rainyseason_combinations(sweep)
+    assert len(combos) == 16
+    done=0
+    for k,cc,kindex,kres in rainyseason_sweep(pprec.copy(),index,day,month,year,jday,leap,1981,tot,sweep):
+        assert cc == combos[k]
+        if cc['qc1'] == defaults['qc1'] and cc['qc2'] == defaults['qc2']:
+           rindex,res=rainyseason_pipeline(pprec.copy(),index,day,month,year,jday,leap,1981,tot,cc['dper'],cc['npass'])
+        else:
+           fprec,rindex=rainyseason_format(pprec.copy(),index,leap,cc['dper'])
+           rm,startwet=rainyseason_climatology(fprec,jday,tot)
+           id=np.where(rm > 0.)[0]
+           rindex=rindex[id]
+           res=rainyseason_characteristics(fprec[id,:],rm[id],startwet[id],jday,day,month,year,1981,tot,cc['npass'],qc1=cc['qc1'],qc2=cc['qc2'])
+        np.testing.assert_array_equal(kindex,rindex)
+        assert set(kres.keys()) <= set(res.keys())   # no curves in the sweep
+        for key in kres.keys():
+            np.testing.assert_array_equal(kres[key],res[key],err_msg=str(cc)+' '+key)
+        done=done+1
+    assert done == len(combos)